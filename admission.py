@@ -0,0 +1,197 @@
+"""
+Admission control for expensive endpoints.
+
+Each guarded endpoint has a budget of cost units that may be in flight
+at once. A request costs one unit plus one per ``atoms_per_unit`` atoms
+of its structure, taken from the structure store (or estimated from the
+file size before the first parse), so a few large structures fill the
+budget as a burst of small ones would. Requests that do not fit wait in
+a bounded FIFO queue for up to ``max_wait`` seconds; when the queue is
+full or the wait runs out they are shed with OverloadedError, which the
+app answers with ``503`` and ``Retry-After``. Admitted requests thus
+never compete for more memory and CPU than the budget allows, and their
+latency stays bounded however large the burst.
+"""
+import os
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from instrumentation import Counter, record
+
+ATOMS_PER_UNIT = 10000
+# Rough size of one atom record in PDB and mmCIF files
+BYTES_PER_ATOM = 80
+
+ADMISSIONS = Counter(
+    "protein_explorer_admission_requests_total",
+    "Requests to guarded endpoints by outcome (admitted, queue_full, "
+    "timeout).",
+    ("endpoint", "result"),
+)
+
+
+class OverloadedError(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+    def __init__(self, endpoint: str, reason: str, retry_after: int):
+        super().__init__(
+            f"{endpoint} is overloaded ({reason}); retry in {retry_after}s"
+        )
+        self.endpoint = endpoint
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_limits(text: str) -> dict:
+    """"analyze=4,mutation=8" -> {"analyze": 4, "mutation": 8}."""
+    limits = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, sep, value = part.partition("=")
+        if not sep or not value.strip().isdigit():
+            raise ValueError(f"expected endpoint=units, got {part!r}")
+        limits[name.strip()] = int(value)
+    return limits
+
+
+def estimate_atoms(path: str, store=None) -> Optional[int]:
+    """Atom count of the structure file at ``path``, None if absent."""
+    from io_utils import file_checksum
+
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return None
+    if store is not None:
+        stored = store.load(file_checksum(path))
+        if stored is not None:
+            return int(stored.meta["n_atoms"])
+    return size // BYTES_PER_ATOM
+
+
+def structure_cost(n_atoms: Optional[int],
+                   atoms_per_unit: int = ATOMS_PER_UNIT) -> int:
+    return 1 + (n_atoms or 0) // atoms_per_unit
+
+
+class Gate:
+    """Budget of ``capacity`` cost units with a FIFO wait queue."""
+
+    def __init__(self, endpoint: str, capacity: int, max_queue: int,
+                 max_wait: float):
+        self.endpoint = endpoint
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def _shed(self, reason: str) -> OverloadedError:
+        ADMISSIONS.inc(self.endpoint, reason)
+        return OverloadedError(self.endpoint, reason,
+                               max(1, math.ceil(self.max_wait)))
+
+    def acquire(self, cost: int = 1) -> int:
+        """
+        Wait for ``cost`` units (at most the whole budget) and return
+        the units taken, to be passed to ``release``. Raises
+        OverloadedError if the queue is full or the wait times out.
+        """
+        cost = min(max(cost, 1), self.capacity)
+        started = time.perf_counter()
+        with self._cond:
+            if self._queue or self.in_flight + cost > self.capacity:
+                if len(self._queue) >= self.max_queue:
+                    raise self._shed("queue_full")
+                ticket = object()
+                self._queue.append(ticket)
+                deadline = time.monotonic() + self.max_wait
+                try:
+                    while (self._queue[0] is not ticket
+                           or self.in_flight + cost > self.capacity):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._shed("timeout")
+                        self._cond.wait(remaining)
+                finally:
+                    self._queue.remove(ticket)
+                    self._cond.notify_all()
+            self.in_flight += cost
+        ADMISSIONS.inc(self.endpoint, "admitted")
+        record("admission_wait", time.perf_counter() - started)
+        return cost
+
+    def release(self, cost: int) -> None:
+        with self._cond:
+            self.in_flight -= cost
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, cost: int = 1) -> Iterator[None]:
+        taken = self.acquire(cost)
+        try:
+            yield
+        finally:
+            self.release(taken)
+
+
+class AdmissionController:
+    """
+    One Gate per endpoint in ``limits`` ({endpoint: capacity}); endpoints
+    without a positive limit are not guarded.
+    """
+
+    def __init__(self, limits: dict, max_queue: int = 16,
+                 max_wait: float = 10.0,
+                 atoms_per_unit: int = ATOMS_PER_UNIT):
+        self.atoms_per_unit = atoms_per_unit
+        self.gates = {
+            endpoint: Gate(endpoint, capacity, max_queue, max_wait)
+            for endpoint, capacity in limits.items() if capacity > 0
+        }
+
+    def cost(self, n_atoms: Optional[int]) -> int:
+        return structure_cost(n_atoms, self.atoms_per_unit)
+
+    def acquire(self, endpoint: str, cost: int = 1) -> tuple:
+        """Token for ``release``; raises OverloadedError when shedding."""
+        gate = self.gates.get(endpoint)
+        return (gate, gate.acquire(cost) if gate is not None else 0)
+
+    @staticmethod
+    def release(token: tuple) -> None:
+        gate, taken = token
+        if gate is not None:
+            gate.release(taken)
+
+    @contextmanager
+    def admit(self, endpoint: str, cost: int = 1) -> Iterator[None]:
+        token = self.acquire(endpoint, cost)
+        try:
+            yield
+        finally:
+            self.release(token)
+
+    def render_metrics(self) -> list[str]:
+        """Queue depth and in-flight cost gauges plus admission counts."""
+        lines = []
+        for name, attribute, help_text in (
+                ("queue_depth", "queue_depth",
+                 "Requests waiting for admission."),
+                ("in_flight_cost", "in_flight",
+                 "Cost units of admitted requests in flight.")):
+            metric = f"protein_explorer_admission_{name}"
+            lines += [f"# HELP {metric} {help_text}",
+                      f"# TYPE {metric} gauge"]
+            lines += [f'{metric}{{endpoint="{endpoint}"}} '
+                      f"{getattr(gate, attribute)}"
+                      for endpoint, gate in sorted(self.gates.items())]
+        return lines + ADMISSIONS.render()
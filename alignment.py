@@ -0,0 +1,267 @@
+"""
+Residue correspondence between two structures by sequence alignment.
+
+Chains are aligned with a banded global alignment (BLOSUM62, linear gap
+penalty, free end gaps) whose band follows the diagonal most supported
+by shared k-mers, so homologs and entries with different residue
+numbering still pair up. Aligned columns are turned into pairs of Cα
+coordinates for superposition.
+
+Alignments are cached on disk as ``.npy`` files keyed by a hash of the
+sequence pair and the scoring parameters; (a, b) and (b, a) share one
+entry, so repeated and all-vs-all comparisons align each pair once.
+"""
+import os
+import hashlib
+import threading
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+
+import config
+from instrumentation import count_cache
+from structure_store import StructureArrays
+
+GAP = -4
+BAND = 32
+SEED_LENGTH = 3
+# Chains pair up only above this identity over aligned columns
+MIN_IDENTITY = 0.3
+# Bump when the alignment changes so old cache entries are ignored
+ALIGNMENT_VERSION = "1"
+
+_blosum: Optional[tuple] = None
+
+
+def _scoring() -> tuple:
+    """(alphabet index of each letter, BLOSUM62 as an int array)."""
+    global _blosum
+    if _blosum is None:
+        from Bio.Align import substitution_matrices
+
+        matrix = substitution_matrices.load("BLOSUM62")
+        letters = matrix.alphabet
+        codes = np.full(128, letters.index("X"), dtype=np.intp)
+        for i, letter in enumerate(letters):
+            codes[ord(letter)] = i
+        _blosum = codes, np.array(matrix, dtype=np.int32)
+    return _blosum
+
+
+def _encode(sequence: str, codes: np.ndarray) -> np.ndarray:
+    raw = np.frombuffer(sequence.upper().encode("ascii", "replace"),
+                        dtype=np.uint8)
+    return codes[np.minimum(raw, 127)]
+
+
+def _diagonal(seq1: str, seq2: str, k: int = SEED_LENGTH) -> Optional[int]:
+    """Most common ``j - i`` among exact k-mer matches, if any."""
+    seeds: dict = {}
+    for j in range(len(seq2) - k + 1):
+        seeds.setdefault(seq2[j:j + k], []).append(j)
+    votes: Counter = Counter()
+    for i in range(len(seq1) - k + 1):
+        for j in seeds.get(seq1[i:i + k], ()):
+            votes[j - i] += 1
+    return votes.most_common(1)[0][0] if votes else None
+
+
+def align(seq1: str, seq2: str, band: int = BAND,
+          gap: int = GAP) -> np.ndarray:
+    """
+    (N, 2) array of the (i, j) sequence indices aligned to each other.
+
+    Only cells within ``band`` of the seeded diagonal are scored; without
+    a seed the whole matrix is. Each row is filled with numpy: the left
+    neighbour dependency of a linear gap penalty is a running maximum.
+    """
+    n, m = len(seq1), len(seq2)
+    if not n or not m:
+        return np.empty((0, 2), dtype=np.int32)
+    codes, blosum = _scoring()
+    a, b = _encode(seq1, codes), _encode(seq2, codes)
+    shift = _diagonal(seq1, seq2)
+    if shift is None:
+        shift, band = 0, max(n, m)
+    width = 2 * band + 1
+    offsets = np.arange(width)
+    # H[i, k] scores prefixes seq1[:i] and seq2[:lo + i + k]
+    lo = shift - band
+    H = np.full((n + 1, width + 1), -np.inf)
+    cols = lo + offsets
+    H[0, :width][(cols >= 0) & (cols <= m)] = 0
+    gap_ramp = gap * offsets
+    for i in range(1, n + 1):
+        cols = lo + i + offsets
+        valid = (cols >= 0) & (cols <= m)
+        prev = H[i - 1]
+        # diagonal from (i-1, j-1) has the same band offset, up is k + 1
+        diag = prev[:width] + blosum[a[i - 1],
+                                     b[np.clip(cols - 1, 0, m - 1)]]
+        diag[cols < 1] = -np.inf
+        best = np.maximum(diag, prev[1:width + 1] + gap)
+        best[cols == 0] = 0  # free leading gap in seq2
+        best[~valid] = -np.inf
+        # left neighbours: max over k' <= k of best[k'] + gap * (k - k')
+        row = np.maximum.accumulate(best - gap_ramp) + gap_ramp
+        row[~valid] = -np.inf
+        H[i, :width] = row
+
+    # free trailing gaps: best cell of the last row or last column
+    end_row = int(np.argmax(H[n]))
+    end_i, end_k = n, end_row
+    last_col = m - lo - np.arange(n + 1)
+    inside = (last_col >= 0) & (last_col < width)
+    if inside.any():
+        rows = np.flatnonzero(inside)
+        scores = H[rows, last_col[rows]]
+        if scores.max() > H[n, end_row]:
+            end_i = int(rows[np.argmax(scores)])
+            end_k = int(last_col[end_i])
+    if not np.isfinite(H[end_i, end_k]):
+        return np.empty((0, 2), dtype=np.int32)
+
+    pairs = []
+    i, k = end_i, end_k
+    while i > 0:
+        j = lo + i + k
+        if j <= 0:
+            break
+        score = H[i, k]
+        if score == H[i - 1, k] + blosum[a[i - 1], b[j - 1]]:
+            pairs.append((i - 1, j - 1))
+            i -= 1
+        elif k + 1 <= width and score == H[i - 1, k + 1] + gap:
+            i -= 1
+            k += 1
+        else:
+            k -= 1
+    return np.array(pairs[::-1], dtype=np.int32).reshape(-1, 2)
+
+
+def identity(seq1: str, seq2: str, pairs: np.ndarray) -> float:
+    if not len(pairs):
+        return 0.0
+    same = sum(seq1[i] == seq2[j] for i, j in pairs)
+    return same / len(pairs)
+
+
+class AlignmentCache:
+    """Alignments on disk, one ``.npy`` file per sequence pair."""
+
+    def __init__(self, root: Optional[str] = None, band: int = BAND,
+                 gap: int = GAP):
+        self.root = root or config.ALIGNMENT_CACHE_DIR
+        self.band = band
+        self.gap = gap
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, seq1: str, seq2: str) -> str:
+        key = hashlib.sha256(
+            f"{ALIGNMENT_VERSION}:{self.band}:{self.gap}:{seq1}:{seq2}"
+            .encode("ascii", "replace")
+        ).hexdigest()
+        return os.path.join(self.root, key[:2], f"{key}.npy")
+
+    def align(self, seq1: str, seq2: str) -> np.ndarray:
+        """``align(seq1, seq2)``, computed at most once per pair."""
+        swap = seq2 < seq1
+        if swap:
+            seq1, seq2 = seq2, seq1
+        path = self._path(seq1, seq2)
+        try:
+            pairs = np.load(path)
+            count_cache("alignment", True)
+        except (OSError, ValueError):
+            count_cache("alignment", False)
+            pairs = align(seq1, seq2, self.band, self.gap)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+            with open(tmp_path, "wb") as f:
+                np.save(f, pairs)
+            os.replace(tmp_path, path)
+        return pairs[:, ::-1] if swap else pairs
+
+
+def chain_ca(structure) -> dict:
+    """
+    ``{chain: (sequence, Cα coordinates)}`` of the first model of a
+    parsed structure or of StructureArrays from the structure store.
+    """
+    if isinstance(structure, StructureArrays):
+        return _chain_ca_arrays(structure)
+
+    from Bio.PDB import is_aa
+    from Bio.SeqUtils import seq1
+
+    chains = {}
+    model = next(structure.get_models())
+    for chain in model:
+        residues = [res for res in chain if is_aa(res) and "CA" in res]
+        if residues:
+            sequence = "".join(seq1(res.get_resname()) or "X"
+                               for res in residues)
+            coords = np.array([res["CA"].get_coord() for res in residues],
+                              dtype=np.float64)
+            chains[chain.id] = (sequence, coords)
+    return chains
+
+
+def _chain_ca_arrays(arrays: StructureArrays) -> dict:
+    residue = arrays.atom_residue
+    ca = ((arrays.atom_names == "CA") & arrays.res_is_aa[residue]
+          & (arrays.res_model[residue] == 0))
+    ca_residue = residue[ca]
+    ca_chain = arrays.res_chain[ca_residue]
+    coords = arrays.coords[ca].astype(np.float64)
+    letters = arrays.res_letter[ca_residue]
+    chains = {}
+    for chain_id in dict.fromkeys(ca_chain.tolist()):
+        in_chain = ca_chain == chain_id
+        chains[chain_id] = ("".join(letters[in_chain]), coords[in_chain])
+    return chains
+
+
+def residue_correspondence(structure1, structure2,
+                           cache: Optional[AlignmentCache] = None,
+                           min_identity: float = MIN_IDENTITY) -> tuple:
+    """
+    Paired Cα coordinates ``(coords1, coords2)`` of two structures.
+
+    Chains with the same ID are paired first, then the remaining chains
+    greedily by alignment identity; pairs below ``min_identity`` are
+    left out.
+    """
+    cache = cache or AlignmentCache()
+    chains1, chains2 = chain_ca(structure1), chain_ca(structure2)
+
+    def aligned(id1, id2):
+        pairs = cache.align(chains1[id1][0], chains2[id2][0])
+        return identity(chains1[id1][0], chains2[id2][0], pairs), pairs
+
+    matched = []
+    for chain_id in chains1:
+        if chain_id in chains2:
+            score, pairs = aligned(chain_id, chain_id)
+            if score >= min_identity:
+                matched.append((chain_id, chain_id, pairs))
+    left1 = [c for c in chains1 if c not in {m[0] for m in matched}]
+    left2 = [c for c in chains2 if c not in {m[1] for m in matched}]
+    candidates = sorted(
+        ((*aligned(id1, id2), id1, id2) for id1 in left1 for id2 in left2),
+        key=lambda c: (-c[0], c[2], c[3]),
+    )
+    for score, pairs, id1, id2 in candidates:
+        if score < min_identity:
+            break
+        if id1 in left1 and id2 in left2:
+            matched.append((id1, id2, pairs))
+            left1.remove(id1)
+            left2.remove(id2)
+
+    coords1 = [chains1[id1][1][pairs[:, 0]] for id1, _, pairs in matched]
+    coords2 = [chains2[id2][1][pairs[:, 1]] for _, id2, pairs in matched]
+    if not coords1:
+        return np.empty((0, 3)), np.empty((0, 3))
+    return np.concatenate(coords1), np.concatenate(coords2)
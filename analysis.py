@@ -0,0 +1,217 @@
+"""Structure analysis pipeline shared by the web views and the job queue."""
+import os
+import gzip
+import shutil
+from typing import Optional
+
+import numpy as np
+
+from io_utils import (
+    download_cif,
+    download_pdb,
+    file_checksum,
+    parse_structure,
+)
+from explorer import (
+    count_residues,
+    get_chain_sequences,
+    get_ca_coordinates,
+    get_phi_psi,
+)
+from metrics import compute_center_of_mass, compare_structures
+from plotting import render_ca_scatter, plot_ramachandran
+
+
+class DownloadError(Exception):
+    """Raised when neither mmCIF nor PDB coordinates can be fetched."""
+
+    def __init__(self, pdb_id: str, cause: Exception):
+        super().__init__(f"Failed to download PDB {pdb_id}: {cause}")
+        self.pdb_id = pdb_id
+        self.cause = cause
+
+
+def prepare_structure(pdb_id: str, out_dir: str) -> tuple[str, str, str]:
+    """
+    Download a structure into ``out_dir`` and return
+    (file name to serve, viewer format, file name to parse).
+
+    mmCIF files are served as ``.cif``; a ``.cif.gz`` copy is kept next
+    to it so serve_file can send it gzip-encoded to clients that accept
+    it, and the browser decompresses transparently.
+    """
+    pdb_id = pdb_id.upper()
+    try:
+        cif_path = download_cif(pdb_id, out_dir)
+        basename = os.path.basename(cif_path)
+        local_cif = os.path.join(out_dir, basename)
+        if not os.path.exists(local_cif):
+            # cache hit: the served/parsed copy lives in out_dir
+            shutil.copyfile(cif_path, local_cif)
+        gz_path = local_cif + ".gz"
+        if not os.path.exists(gz_path):
+            with open(cif_path, "rb") as f_in, \
+                    gzip.open(gz_path, "wb") as f_out:
+                f_out.writelines(f_in)
+        return basename, "mmcif", basename
+    except Exception:
+        pdb_path = download_pdb(pdb_id, out_dir)
+        basename = os.path.basename(pdb_path)
+        return basename, "pdb", basename
+
+
+def arrays_path(output_dir: str, pdb_id: str) -> str:
+    return os.path.join(output_dir, pdb_id, f"{pdb_id}_arrays.npz")
+
+
+def save_arrays(output_dir: str, pdb_id: str, checksum: str,
+                ca_coords, angles) -> dict:
+    """Store Cα coordinates and phi/psi angles as float32 arrays."""
+    arrays: dict = {
+        "checksum": checksum,
+        "ca": np.asarray(ca_coords, dtype=np.float32).reshape(-1, 3),
+        "dihedrals": np.asarray(angles, dtype=np.float32).reshape(-1, 2),
+    }
+    path = arrays_path(output_dir, pdb_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, checksum=np.array(checksum), ca=arrays["ca"],
+             dihedrals=arrays["dihedrals"])
+    os.replace(tmp_path, path)
+    return arrays
+
+
+def load_arrays(output_dir: str, pdb_id: str) -> Optional[dict]:
+    """Arrays saved by save_arrays, or None if there are none yet."""
+    try:
+        with np.load(arrays_path(output_dir, pdb_id)) as data:
+            return {
+                "checksum": str(data["checksum"]),
+                "ca": data["ca"],
+                "dihedrals": data["dihedrals"],
+            }
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def structure_arrays(pdb_id: str, output_dir: str) -> dict:
+    """
+    Plot arrays for a structure: loaded from the saved .npz, or computed
+    (downloading and parsing the structure) and saved on first use.
+    """
+    arrays = load_arrays(output_dir, pdb_id)
+    if arrays is not None:
+        return arrays
+    out_dir = os.path.join(output_dir, pdb_id)
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        _, _, parse = prepare_structure(pdb_id, out_dir)
+    except Exception as e:
+        raise DownloadError(pdb_id, e) from e
+    path = os.path.join(out_dir, parse)
+    struct = parse_structure(path)
+    return save_arrays(output_dir, pdb_id, file_checksum(path),
+                       get_ca_coordinates(struct), get_phi_psi(struct))
+
+
+def read_pdb_list(path: str) -> list[str]:
+    """PDB IDs listed one per line in ``path``; ``#`` starts a comment."""
+    pdb_ids = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            token = line.split("#", 1)[0].strip()
+            if token:
+                pdb_ids.append(token.upper())
+    return pdb_ids
+
+
+def preload_structures(pdb_ids, output_dir: str) -> dict:
+    """
+    Download and parse structures ahead of time. Returns
+    ``{absolute parse path: (checksum, structure)}``; IDs that cannot be
+    fetched or parsed are left out.
+    """
+    structures = {}
+    for pdb_id in pdb_ids:
+        out_dir = os.path.join(output_dir, pdb_id)
+        os.makedirs(out_dir, exist_ok=True)
+        try:
+            _, _, parse = prepare_structure(pdb_id, out_dir)
+            path = os.path.abspath(os.path.join(out_dir, parse))
+            structures[path] = (file_checksum(path), parse_structure(path))
+        except Exception:
+            continue
+    return structures
+
+
+def analyze_structure(pdb_id: str, output_dir: str, suffix: str,
+                      renderer=None, store=None) -> dict:
+    """
+    Download, parse and analyse one structure and return template fields
+    named ``<field><suffix>`` (e.g. ``total1``). Plots are handed to
+    ``renderer`` (a plotting.PlotRenderer) when given, otherwise drawn
+    inline; both skip images that are already up to date. With a
+    structure_store.StructureStore the metrics run on its shared arrays.
+    """
+    out_dir = os.path.join(output_dir, pdb_id)
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        serve, fmt, parse = prepare_structure(pdb_id, out_dir)
+    except Exception as e:
+        raise DownloadError(pdb_id, e) from e
+
+    path = os.path.join(out_dir, parse)
+    if store is not None:
+        struct = store.get(path, pdb_id)
+    else:
+        struct = parse_structure(path)
+
+    total, chains = count_residues(struct)
+    angles = get_phi_psi(struct)
+    ca_coords = get_ca_coordinates(struct)
+
+    ca_png = os.path.join(out_dir, f"{pdb_id}_ca_scatter.png")
+    rama_png = os.path.join(out_dir, f"{pdb_id}_ramachandran.png")
+    if renderer is not None:
+        renderer.ca_scatter(ca_coords, ca_png)
+        renderer.ramachandran(angles, rama_png)
+    else:
+        render_ca_scatter(ca_coords, ca_png)
+        plot_ramachandran(angles, rama_png)
+    # served to the result page by the /api/structure endpoints
+    save_arrays(output_dir, pdb_id, file_checksum(path), ca_coords, angles)
+
+    fields = {
+        "pdb": pdb_id,
+        "serve": serve,
+        "fmt": fmt,
+        "path": path,
+        "total": total,
+        "chains": chains,
+        "seqs": get_chain_sequences(struct),
+        "center": compute_center_of_mass(struct).tolist(),
+        "n_ca": len(ca_coords),
+        "n_angles": len(angles),
+        "filename": serve,
+    }
+    return {f"{key}{suffix}": value for key, value in fields.items()}
+
+
+def analyze(pdb1: str, pdb2: str, output_dir: str, renderer=None,
+            store=None, alignments=None) -> dict:
+    """
+    Full analysis behind the result page: one or two structures plus
+    their RMSD, aligned through ``alignments`` (an
+    alignment.AlignmentCache) when given. Returns JSON-serialisable
+    template data without URLs.
+    """
+    result = analyze_structure(pdb1, output_dir, "1", renderer, store)
+    result.update({"rmsd": None, "pdb2": None})
+    if pdb2:
+        result.update(
+            analyze_structure(pdb2, output_dir, "2", renderer, store)
+        )
+        result["rmsd"] = compare_structures(
+            result["path1"], result["path2"], output_dir, alignments, store
+        )
+    return result
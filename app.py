@@ -1,225 +1,473 @@
+import gc
 import os
 import re
 import gzip
+import json
+import time
+import hashlib
+import logging
+import mimetypes
+import shutil
+import tempfile
 
 from flask import (
     Flask,
+    Response,
+    abort,
+    g,
     request,
     render_template,
     redirect,
     url_for,
     flash,
     send_from_directory,
+    stream_with_context,
 )
+from werkzeug.security import safe_join
 
 import config
-from io_utils import download_cif, download_pdb, parse_structure
-from explorer import (
-    count_residues,
-    get_chain_sequences,
-    get_ca_coordinates,
-    get_phi_psi,
+import instrumentation
+from alignment import AlignmentCache
+from corpus import Corpus
+from admission import (
+    AdmissionController,
+    OverloadedError,
+    estimate_atoms,
+    parse_limits,
 )
-from metrics import (
-    compute_center_of_mass,
-    compare_structures,
-    compute_mutation_rmsd,
-    compute_center_of_mass_difference,
-)
-from plotting import plot_ca_scatter, plot_ramachandran
-from mutation import model_mutation
+from io_utils import file_checksum, parse_structure
+from plotting import PlotRenderer, downsample
+from jobs import JobQueue, QueueFullError
+from result_cache import ResultCache
+from sequence_index import SequenceIndex
+from structure_store import StructureStore
+
+# The analysis modules (Biopython, matplotlib) are imported inside the
+# views that need them, so workers that only serve files or cached
+# results never pay for them; PRELOAD_STRUCTURES imports them up front.
+
+# One JSON line per request with its stage timings (see instrumentation)
+REQUEST_LOG = logging.getLogger("protein_explorer.requests")
 
 PDB_PATTERN = re.compile(r"^[0-9A-Za-z]{4}$")
 
+# Cache lifetime for /outputs URLs carrying a matching ?v=<content hash>
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Column names of the arrays served by /api/structure/<pdb_id>/<kind>
+DATA_COLUMNS = {
+    "ca": ("x", "y", "z"),
+    "dihedrals": ("phi", "psi"),
+}
+
 
 def validate_pdb_id(pdb_id: str) -> bool:
     return bool(PDB_PATTERN.match(pdb_id))
 
 
-def create_app() -> Flask:
+def create_app(test_config=None) -> Flask:
     app = Flask(__name__)
     app.config.from_mapping(
         SECRET_KEY=config.SECRET_KEY,
         OUTPUT_DIR=config.OUTPUT_DIR,
         CACHE_DIR=config.CACHE_DIR,
+        JOB_WORKERS=config.JOB_WORKERS,
+        JOB_MAX_PENDING=config.JOB_MAX_PENDING,
+        RESULT_CACHE_PATH=config.RESULT_CACHE_PATH,
+        RESULT_CACHE_SIZE=config.RESULT_CACHE_SIZE,
+        BULK_BATCH_SIZE=config.BULK_BATCH_SIZE,
+        PLOT_WORKERS=config.PLOT_WORKERS,
+        PLOT_MAX_POINTS=config.PLOT_MAX_POINTS,
+        PLOT_WAIT_SECONDS=config.PLOT_WAIT_SECONDS,
+        STRUCTURE_STORE_DIR=config.STRUCTURE_STORE_DIR,
+        SEQUENCE_INDEX_PATH=config.SEQUENCE_INDEX_PATH,
+        CORPUS_DIR=config.CORPUS_DIR,
+        ALIGNMENT_CACHE_DIR=config.ALIGNMENT_CACHE_DIR,
+        PRELOAD_STRUCTURES=config.PRELOAD_STRUCTURES,
+        PDB_LIST_PATH=config.PDB_LIST_PATH,
+        INSTRUMENTATION=config.INSTRUMENTATION,
+        ADMISSION_LIMITS=config.ADMISSION_LIMITS,
+        ADMISSION_MAX_QUEUE=config.ADMISSION_MAX_QUEUE,
+        ADMISSION_MAX_WAIT=config.ADMISSION_MAX_WAIT,
+        ADMISSION_ATOMS_PER_UNIT=config.ADMISSION_ATOMS_PER_UNIT,
     )
+    if test_config:
+        app.config.from_mapping(test_config)
+    instrumentation.enabled = app.config["INSTRUMENTATION"]
 
-    def _download_structure(pdb_id: str, out_dir: str):
-        pdb_id = pdb_id.upper()
-        try:
-            cif_path = download_cif(pdb_id, out_dir)
-            basename = os.path.basename(cif_path)
-            gz_path = cif_path + ".gz"
-            if not os.path.exists(gz_path):
-                with open(cif_path, "rb") as f_in, \
-                        gzip.open(gz_path, "wb") as f_out:
-                    f_out.writelines(f_in)
-            return basename + ".gz", "mmcif_gz", basename
-        except Exception:
-            pdb_path = download_pdb(pdb_id, out_dir)
-            basename = os.path.basename(pdb_path)
-            return basename, "pdb", basename
+    results = ResultCache(
+        app.config["RESULT_CACHE_PATH"],
+        maxsize=app.config["RESULT_CACHE_SIZE"],
+    )
+    app.extensions["result_cache"] = results
 
-    @app.route("/", methods=["GET", "POST"])
-    def index():
-        output_dir = app.config["OUTPUT_DIR"]
+    plots = PlotRenderer(
+        max_workers=app.config["PLOT_WORKERS"],
+        max_points=app.config["PLOT_MAX_POINTS"] or None,
+    )
+    app.extensions["plots"] = plots
 
-        if request.method == "POST":
-            pdb1 = request.form.get("pdb_id1", "").strip().upper()
-            pdb2 = request.form.get("pdb_id2", "").strip().upper()
-
-            if not validate_pdb_id(pdb1):
-                flash(
-                    (
-                        "Please enter a valid 4-character PDB ID #1 "
-                        "or leave blank."
-                    ),
-                    "error",
-                )
-                return redirect(url_for("index"))
+    # newly stored structures are added to the sequence index and corpus
+    seq_index = SequenceIndex(app.config["SEQUENCE_INDEX_PATH"])
+    app.extensions["sequence_index"] = seq_index
+    corpus = Corpus(app.config["CORPUS_DIR"])
+    app.extensions["corpus"] = corpus
 
-            if pdb2 and not validate_pdb_id(pdb2):
-                flash(
-                    (
-                        "Please enter a valid 4-character PDB ID #2 "
-                        "or leave blank."
-                    ),
-                    "error",
-                )
-                return redirect(url_for("index"))
+    def on_add(arrays):
+        seq_index.add_arrays(arrays)
+        corpus.add_arrays(arrays)
 
-            # --- process first structure ---
-            dir1 = os.path.join(output_dir, pdb1)
-            os.makedirs(dir1, exist_ok=True)
+    store = StructureStore(app.config["STRUCTURE_STORE_DIR"], on_add=on_add)
+    app.extensions["structure_store"] = store
 
-            try:
-                serve1, fmt1, parse1 = _download_structure(pdb1, dir1)
-            except Exception as e:
-                flash(f"Failed to download PDB {pdb1}: {e}", "error")
-                return redirect(url_for("index"))
+    alignments = AlignmentCache(app.config["ALIGNMENT_CACHE_DIR"])
+    app.extensions["alignments"] = alignments
 
-            path1 = os.path.join(dir1, parse1)
-            struct1 = parse_structure(path1)
-
-            total1, chains1 = count_residues(struct1)
-            seqs1 = get_chain_sequences(struct1)
-            center1 = compute_center_of_mass(struct1)
-            angles1 = get_phi_psi(struct1)
-            ca_coords1 = get_ca_coordinates(struct1)
-
-            ca1_png = os.path.join(dir1, f"{pdb1}_ca_scatter.png")
-            plot_ca_scatter(struct1, ca1_png)
-            rama1_png = os.path.join(dir1, f"{pdb1}_ramachandran.png")
-            plot_ramachandran(angles1, rama1_png)
-
-            result_data = {
-                "pdb1": pdb1,
-                "serve1": serve1,
-                "fmt1": fmt1,
-                "url1": url_for(
-                    "serve_file", pdb_id=pdb1, filename=serve1
+    admission = AdmissionController(
+        parse_limits(app.config["ADMISSION_LIMITS"]),
+        max_queue=app.config["ADMISSION_MAX_QUEUE"],
+        max_wait=app.config["ADMISSION_MAX_WAIT"],
+        atoms_per_unit=app.config["ADMISSION_ATOMS_PER_UNIT"],
+    )
+    app.extensions["admission"] = admission
+
+    # {absolute path: (checksum, parsed structure)}, read-only once built
+    structures: dict = {}
+    app.extensions["structures"] = structures
+    if app.config["PRELOAD_STRUCTURES"]:
+        from analysis import preload_structures, read_pdb_list
+        import bulk_mutation  # noqa: F401
+
+        pdb_ids = read_pdb_list(app.config["PDB_LIST_PATH"])
+        structures.update(
+            preload_structures(pdb_ids, app.config["OUTPUT_DIR"])
+        )
+        for path, (checksum, structure) in structures.items():
+            pdb_id = os.path.basename(os.path.dirname(path))
+            store.add(structure, checksum, pdb_id)
+        # keep preloaded objects out of later collections, whose
+        # refcount writes would un-share the pages after fork
+        gc.freeze()
+        app.logger.info("Preloaded %d of %d structures",
+                        len(structures), len(pdb_ids))
+
+    def _parsed(path: str):
+        """Preloaded structure for ``path`` if still current, else parse."""
+        entry = structures.get(os.path.abspath(path))
+        if entry is not None and entry[0] == file_checksum(path):
+            return entry[1]
+        return parse_structure(path)
+
+    def _run_analysis(pdb1: str, pdb2: str) -> dict:
+        from analysis import analyze
+
+        return analyze(pdb1, pdb2, app.config["OUTPUT_DIR"], plots, store,
+                       alignments)
+
+    jobs = JobQueue(
+        _run_analysis,
+        os.path.join(app.config["OUTPUT_DIR"], "_jobs"),
+        max_workers=app.config["JOB_WORKERS"],
+        max_pending=app.config["JOB_MAX_PENDING"],
+    )
+    app.extensions["jobs"] = jobs
+
+    @app.before_request
+    def _start_timing():
+        if instrumentation.enabled:
+            g.timing_token = instrumentation.start_request()
+            g.started = time.perf_counter()
+
+    @app.after_request
+    def _report_timing(response):
+        token = g.pop("timing_token", None)
+        if token is None:
+            return response
+        total = time.perf_counter() - g.pop("started")
+        timings = instrumentation.end_request(token)
+        endpoint = request.endpoint or "unmatched"
+        instrumentation.REQUEST_SECONDS.observe(endpoint, total)
+        response.headers["Server-Timing"] = instrumentation.server_timing(
+            timings, total
+        )
+        REQUEST_LOG.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "endpoint": endpoint,
+            "status": response.status_code,
+            "duration_ms": round(total * 1000, 2),
+            "stages_ms": {stage: round(seconds * 1000, 2)
+                          for stage, (seconds, _) in timings.items()},
+        }))
+        return response
+
+    def _read_pdb_ids():
+        """Return (pdb1, pdb2, error message or None) from the form."""
+        pdb1 = request.form.get("pdb_id1", "").strip().upper()
+        pdb2 = request.form.get("pdb_id2", "").strip().upper()
+        if not validate_pdb_id(pdb1):
+            return pdb1, pdb2, (
+                "Please enter a valid 4-character PDB ID #1 "
+                "or leave blank."
+            )
+        if pdb2 and not validate_pdb_id(pdb2):
+            return pdb1, pdb2, (
+                "Please enter a valid 4-character PDB ID #2 "
+                "or leave blank."
+            )
+        return pdb1, pdb2, None
+
+    def _cost(*paths: str) -> int:
+        """Admission cost of the structure files at ``paths``."""
+        return sum(admission.cost(estimate_atoms(path, store))
+                   for path in paths)
+
+    def _cached_file(pdb_id: str) -> str:
+        """Downloaded coordinate file of ``pdb_id`` (may not exist yet)."""
+        cache_dir = app.config["CACHE_DIR"]
+        for ext in (".cif", ".pdb"):
+            path = os.path.join(cache_dir, f"{pdb_id}{ext}")
+            if os.path.exists(path):
+                return path
+        return os.path.join(cache_dir, f"{pdb_id}.cif")
+
+    def _overloaded(e: OverloadedError):
+        return ({"error": str(e)}, 503,
+                {"Retry-After": str(e.retry_after)})
+
+    def _file_version(pdb_id: str, filename: str):
+        """Short content hash used as ?v= in cacheable /outputs URLs."""
+        path = os.path.join(app.config["OUTPUT_DIR"], pdb_id, filename)
+        try:
+            return file_checksum(path)[:16]
+        except OSError:
+            return None
+
+    def _render_result(data: dict):
+        result_data = dict(data)
+        for i in ("1", "2"):
+            pdb = result_data.get(f"pdb{i}")
+            if not pdb:
+                continue
+            serve = result_data[f"serve{i}"]
+            result_data.update({
+                f"url{i}": url_for(
+                    "serve_file", pdb_id=pdb, filename=serve,
+                    v=_file_version(pdb, serve),
                 ),
-                "total1": total1,
-                "chains1": chains1,
-                "seqs1": seqs1,
-                "center1": center1,
-                "ca1_url": url_for(
+                f"ca{i}_url": url_for(
                     "serve_file",
-                    pdb_id=pdb1,
-                    filename=f"{pdb1}_ca_scatter.png",
+                    pdb_id=pdb,
+                    filename=f"{pdb}_ca_scatter.png",
                 ),
-                "rama1_url": url_for(
+                f"rama{i}_url": url_for(
                     "serve_file",
-                    pdb_id=pdb1,
-                    filename=f"{pdb1}_ramachandran.png",
+                    pdb_id=pdb,
+                    filename=f"{pdb}_ramachandran.png",
                 ),
-                "angles1": angles1,
-                "ca_coords1": ca_coords1,
-                "rmsd": None,
-                "pdb2": None,
-                "filename1": serve1,  # FIX: Added for template
-            }
+                f"ca{i}_data_url": url_for(
+                    "api_structure_data", pdb_id=pdb, kind="ca",
+                    lod=app.config["PLOT_MAX_POINTS"] or None,
+                ),
+                f"rama{i}_data_url": url_for(
+                    "api_structure_data", pdb_id=pdb, kind="dihedrals",
+                    lod=app.config["PLOT_MAX_POINTS"] or None,
+                ),
+            })
+        with instrumentation.timer("template"):
+            return render_template("result.html", **result_data)
 
-            # --- process second structure (optional) ---
-            if pdb2:
-                dir2 = os.path.join(output_dir, pdb2)
-                os.makedirs(dir2, exist_ok=True)
-
-                try:
-                    serve2, fmt2, parse2 = _download_structure(pdb2, dir2)
-                except Exception as e:
-                    flash(f"Failed to download PDB {pdb2}: {e}", "error")
-                    return redirect(url_for("index"))
-
-                path2 = os.path.join(dir2, parse2)
-                struct2 = parse_structure(path2)
-
-                total2, chains2 = count_residues(struct2)
-                seqs2 = get_chain_sequences(struct2)
-                center2 = compute_center_of_mass(struct2)
-                angles2 = get_phi_psi(struct2)
-                ca_coords2 = get_ca_coordinates(struct2)
-
-                ca2_png = os.path.join(dir2, f"{pdb2}_ca_scatter.png")
-                plot_ca_scatter(struct2, ca2_png)
-                rama2_png = os.path.join(dir2, f"{pdb2}_ramachandran.png")
-                plot_ramachandran(angles2, rama2_png)
-
-                # FIX: compare_structures now uses copies internally
-                rmsd_value = compare_structures(path1, path2, output_dir)
-
-                result_data.update({
-                    "pdb2": pdb2,
-                    "serve2": serve2,
-                    "fmt2": fmt2,
-                    "url2": url_for(
-                        "serve_file", pdb_id=pdb2, filename=serve2
-                    ),
-                    "total2": total2,
-                    "chains2": chains2,
-                    "seqs2": seqs2,
-                    "center2": center2,
-                    "ca2_url": url_for(
-                        "serve_file",
-                        pdb_id=pdb2,
-                        filename=f"{pdb2}_ca_scatter.png",
-                    ),
-                    "rama2_url": url_for(
-                        "serve_file",
-                        pdb_id=pdb2,
-                        filename=f"{pdb2}_ramachandran.png",
-                    ),
-                    "angles2": angles2,
-                    "ca_coords2": ca_coords2,
-                    "rmsd": rmsd_value,
-                    "filename2": serve2,  # FIX: Added for template
-                })
+    def _job_payload(job) -> dict:
+        payload = job.to_dict()
+        payload["status_url"] = url_for("job_status", job_id=job.id)
+        if job.status == "done":
+            payload["result_url"] = url_for("job_result", job_id=job.id)
+        return payload
 
-            return render_template("result.html", **result_data)
+    @app.route("/", methods=["GET", "POST"])
+    def index():
+        if request.method == "POST":
+            # Synchronous fallback for clients without JavaScript;
+            # the page script submits through /api/jobs instead.
+            pdb1, pdb2, error = _read_pdb_ids()
+            if error:
+                flash(error, "error")
+                return redirect(url_for("index"))
+
+            from analysis import DownloadError, analyze
+
+            cost = _cost(*(_cached_file(p) for p in (pdb1, pdb2) if p))
+            try:
+                with admission.admit("analyze", cost):
+                    data = analyze(
+                        pdb1, pdb2, app.config["OUTPUT_DIR"], plots, store,
+                        alignments,
+                    )
+            except OverloadedError as e:
+                flash("The server is busy, please retry in "
+                      f"{e.retry_after} seconds.", "error")
+                with instrumentation.timer("template"):
+                    return (render_template("index.html"), 503,
+                            {"Retry-After": str(e.retry_after)})
+            except DownloadError as e:
+                flash(str(e), "error")
+                return redirect(url_for("index"))
+
+            return _render_result(data)
 
         # GET
-        return render_template("index.html")
+        with instrumentation.timer("template"):
+            return render_template("index.html")
+
+    @app.route("/api/jobs", methods=["POST"])
+    def submit_job():
+        pdb1, pdb2, error = _read_pdb_ids()
+        if error:
+            return {"error": error}, 400
+        try:
+            job = jobs.submit(pdb1, pdb2)
+        except QueueFullError as e:
+            return {"error": str(e)}, 503, {"Retry-After": "5"}
+        return _job_payload(job), 202
+
+    @app.route("/api/jobs/<job_id>")
+    def job_status(job_id: str):
+        job = jobs.get(job_id)
+        if job is None:
+            return {"error": "unknown job"}, 404
+        return _job_payload(job)
+
+    @app.route("/jobs/<job_id>")
+    def job_result(job_id: str):
+        job = jobs.get(job_id)
+        if job is None or job.status == "failed":
+            message = job.error if job else None
+            flash(message or "Unknown analysis job.", "error")
+            return redirect(url_for("index"))
+        if job.pending:
+            flash("Analysis is still running, please retry shortly.",
+                  "error")
+            return redirect(url_for("index"))
+        return _render_result(job.result or {})
 
     @app.route("/outputs/<pdb_id>/<filename>")
     def serve_file(pdb_id: str, filename: str):
-        return send_from_directory(
-            os.path.join(app.config["OUTPUT_DIR"], pdb_id),
-            filename,
+        """
+        Serve an output file with a content-hash ETag, Last-Modified and
+        Range support. ``.cif`` files go out gzip-encoded from the stored
+        ``.cif.gz`` when the client accepts it, and URLs whose ``?v=``
+        matches the content hash are cacheable forever.
+        """
+        directory = os.path.join(app.config["OUTPUT_DIR"], pdb_id)
+        path = safe_join(directory, filename)
+        # plots are drawn in the background; hold the request until ready
+        if filename.endswith(".png") and path and not plots.wait(
+                path, timeout=app.config["PLOT_WAIT_SECONDS"]):
+            return {"error": "plot is still rendering"}, 503, \
+                {"Retry-After": "2"}
+        if path is None or not os.path.isfile(path):
+            abort(404)
+
+        serve_name = filename
+        has_gzip = filename.endswith(".cif") and os.path.isfile(path + ".gz")
+        if has_gzip and "gzip" in request.accept_encodings:
+            serve_name = filename + ".gz"
+        checksum = file_checksum(os.path.join(directory, serve_name))
+        immutable = request.args.get("v") == file_checksum(path)[:16]
+
+        response = send_from_directory(
+            directory,
+            serve_name,
+            mimetype=mimetypes.guess_type(filename)[0]
+            or "application/octet-stream",
+            etag=checksum,
+            conditional=True,
+            max_age=IMMUTABLE_MAX_AGE if immutable else None,
         )
+        if serve_name != filename:
+            response.headers["Content-Encoding"] = "gzip"
+        if has_gzip:
+            response.vary.add("Accept-Encoding")
+        if immutable:
+            response.cache_control.immutable = True
+        return response
+
+    @app.route("/api/structure/<pdb_id>/<kind>")
+    def api_structure_data(pdb_id: str, kind: str):
+        """
+        Cα coordinates (``ca``: x, y, z) or backbone dihedrals
+        (``dihedrals``: phi, psi) for plotting. Default payload is
+        little-endian float32 rows with the shape in X-Array-Shape;
+        ``?format=json`` gives columnar JSON, gzip-compressed when the
+        client accepts it. ``?lod=N`` downsamples to at most N points.
+        """
+        if not validate_pdb_id(pdb_id):
+            return {"error": "invalid pdb id"}, 400
+        if kind not in DATA_COLUMNS:
+            return {"error": f"unknown data kind {kind!r}"}, 404
+        fmt = request.args.get("format", "f32")
+        if fmt not in ("f32", "json"):
+            return {"error": "format must be f32 or json"}, 400
+        lod_text = request.args.get("lod", "0")
+        if not re.fullmatch(r"[0-9]+", lod_text):
+            return {"error": "lod must be a non-negative integer"}, 400
+        lod = int(lod_text)
+
+        from analysis import DownloadError, structure_arrays
+
+        pdb_id = pdb_id.upper()
+        try:
+            arrays = structure_arrays(pdb_id, app.config["OUTPUT_DIR"])
+        except DownloadError as e:
+            return {"error": str(e)}, 404
+
+        use_gzip = fmt == "json" and "gzip" in request.accept_encodings
+        etag = hashlib.sha1(
+            f"{arrays['checksum']}:{kind}:{fmt}:{lod}:{use_gzip}".encode()
+        ).hexdigest()[:20]
+        headers = {
+            "ETag": f'"{etag}"',
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if etag in request.if_none_match:
+            return Response(status=304, headers=headers)
+
+        points = downsample(arrays[kind], lod or None).astype("<f4")
+        columns = DATA_COLUMNS[kind]
+        headers["X-Array-Columns"] = ",".join(columns)
+        if fmt == "f32":
+            headers["X-Array-Shape"] = f"{len(points)},{len(columns)}"
+            return Response(points.tobytes(), headers=headers,
+                            mimetype="application/octet-stream")
+
+        body = json.dumps({
+            "columns": columns,
+            **{name: points[:, j].astype(float).round(3).tolist()
+               for j, name in enumerate(columns)},
+        }, separators=(",", ":")).encode()
+        if use_gzip:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        return Response(body, headers=headers, mimetype="application/json")
 
     @app.route("/api/metrics/<pdb_id>")
     def api_metrics(pdb_id: str):
         if not validate_pdb_id(pdb_id):
             return {"error": "invalid pdb id"}, 400
+        from analysis import prepare_structure
+        from explorer import count_residues
+        from metrics import compute_center_of_mass
 
         try:
             # FIX: Parse fresh structure for API call
             dir_path = os.path.join(app.config["OUTPUT_DIR"], pdb_id)
             os.makedirs(dir_path, exist_ok=True)
 
-            serve, fmt, parse = _download_structure(pdb_id, dir_path)
+            serve, fmt, parse = prepare_structure(pdb_id, dir_path)
             path = os.path.join(dir_path, parse)
-            struct = parse_structure(path)
+            # shared arrays: no parse once any worker has stored them
+            struct = store.get(path, pdb_id, parse=_parsed)
 
             total, chains = count_residues(struct)
             center = compute_center_of_mass(struct).tolist()
@@ -237,26 +485,41 @@ def create_app() -> Flask:
     def api_mutation_metrics(pdb_id: str, mutation: str):
         if not validate_pdb_id(pdb_id):
             return {"error": "invalid pdb id"}, 400
+        from analysis import prepare_structure
 
         try:
             # FIX: Parse fresh structures for each mutation analysis
             dir_path = os.path.join(app.config["OUTPUT_DIR"], pdb_id)
             os.makedirs(dir_path, exist_ok=True)
 
-            serve, fmt, parse = _download_structure(pdb_id, dir_path)
+            serve, fmt, parse = prepare_structure(pdb_id, dir_path)
             path = os.path.join(dir_path, parse)
 
-            # FIX: Fresh parse for wild-type
-            wt_struct = parse_structure(path)
-            # FIX: model_mutation creates its own fresh parse internally
-            mut_struct = model_mutation(path, mutation)
-
-            rmsd_val = compute_mutation_rmsd(
-                wt_struct, mut_struct, mutation
-            )
-            com_diff = compute_center_of_mass_difference(
-                wt_struct, mut_struct
-            )
+            checksum = file_checksum(path)
+            cached = results.get(pdb_id, checksum, mutation)
+            if cached is not None:
+                rmsd_val, com_diff = cached
+            else:
+                from metrics import (
+                    compute_mutation_rmsd,
+                    compute_center_of_mass_difference,
+                )
+                from mutation import model_mutation
+
+                with admission.admit("mutation", _cost(path)):
+                    # FIX: Fresh parse for wild-type; the superposition
+                    # only moves the mutant, so a preloaded WT is safe
+                    wt_struct = _parsed(path)
+                    # FIX: model_mutation creates its own fresh parse
+                    mut_struct = model_mutation(path, mutation)
+
+                    rmsd_val = compute_mutation_rmsd(
+                        wt_struct, mut_struct, mutation
+                    )
+                    com_diff = compute_center_of_mass_difference(
+                        wt_struct, mut_struct
+                    )
+                results.put(pdb_id, checksum, mutation, rmsd_val, com_diff)
 
             return {
                 "pdb_id": pdb_id,
@@ -264,10 +527,127 @@ def create_app() -> Flask:
                 "rmsd": round(rmsd_val, 3),
                 "center_of_mass_diff": round(com_diff, 3),
             }
+        except OverloadedError as e:
+            return _overloaded(e)
         except Exception as e:
             app.logger.exception("Mutation analysis failed")
             return {"error": str(e)}, 500
 
+    @app.route("/api/mutation_metrics/<pdb_id>", methods=["POST"])
+    def api_bulk_mutation_metrics(pdb_id: str):
+        """
+        Evaluate many mutations for one structure. Accepts a JSON list
+        (or {"mutations": [...]}) of mutation strings/objects, or a CSV in
+        the mutations_1AKE.csv layout (``file`` upload or text/csv body),
+        and streams one NDJSON record per input row.
+        """
+        if not validate_pdb_id(pdb_id):
+            return {"error": "invalid pdb id"}, 400
+        from analysis import prepare_structure
+        from bulk_mutation import (
+            MutationEvaluator,
+            evaluate_batches,
+            mutations_from_csv,
+            mutations_from_json,
+        )
+
+        if "file" in request.files:
+            # uploads are closed with the request, before streaming starts
+            upload = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+            shutil.copyfileobj(request.files["file"].stream, upload)
+            upload.seek(0)
+            rows = mutations_from_csv(upload)
+        elif request.mimetype == "text/csv":
+            rows = mutations_from_csv(request.stream)
+        else:
+            payload = request.get_json(silent=True)
+            if isinstance(payload, dict):
+                payload = payload.get("mutations")
+            if not isinstance(payload, list):
+                return {
+                    "error": "expected a JSON list of mutations "
+                             "or a CSV upload"
+                }, 400
+            rows = mutations_from_json(payload)
+
+        try:
+            dir_path = os.path.join(app.config["OUTPUT_DIR"], pdb_id)
+            os.makedirs(dir_path, exist_ok=True)
+            serve, fmt, parse = prepare_structure(pdb_id, dir_path)
+            path = os.path.join(dir_path, parse)
+            checksum = file_checksum(path)
+        except Exception as e:
+            return {"error": str(e)}, 500
+        try:
+            # held until the whole stream has been sent
+            token = admission.acquire("bulk_mutation", _cost(path))
+        except OverloadedError as e:
+            return _overloaded(e)
+
+        evaluator = None
+
+        def evaluator_factory() -> MutationEvaluator:
+            # WT is parsed at most once, and only if something is uncached
+            nonlocal evaluator
+            if evaluator is None:
+                evaluator = MutationEvaluator(_parsed(path))
+            return evaluator
+
+        def generate():
+            try:
+                # one chunk per batch: every record in it is ready together
+                for records in evaluate_batches(
+                        rows, evaluator_factory, results, pdb_id, checksum,
+                        batch_size=app.config["BULK_BATCH_SIZE"]):
+                    yield "".join(json.dumps(r) + "\n" for r in records)
+            except Exception as e:
+                app.logger.exception("Bulk mutation analysis failed")
+                yield json.dumps({"error": str(e)}) + "\n"
+
+        response = Response(
+            stream_with_context(generate()),
+            mimetype="application/x-ndjson",
+        )
+        response.call_on_close(lambda: admission.release(token))
+        return response
+
+    @app.route("/api/search")
+    def api_search():
+        """
+        Cached chains containing ``seq`` exactly (``matches``) and chains
+        ranked by shared k-mers with it (``similar``).
+        """
+        query = request.args.get("seq", "").strip().upper()
+        if not query or len(query) > 5000 or not query.isalpha():
+            return {"error": "seq must be 1-5000 one-letter residues"}, 400
+        limit = min(request.args.get("limit", 20, type=int), 500)
+        return {
+            "query": query,
+            "matches": seq_index.search_motif(query, limit),
+            "similar": seq_index.search_similar(query, limit),
+            "index": seq_index.stats(),
+        }
+
+    @app.route("/api/cache_stats")
+    def api_cache_stats():
+        return {"mutation_metrics": results.stats()}
+
+    @app.route("/metrics")
+    def prometheus_metrics():
+        """Latency histograms and cache counters of this process."""
+        stats = results.stats()
+        name = "protein_explorer_result_cache_lookups_total"
+        extra = [
+            f"# HELP {name} Mutation result cache lookups by outcome.",
+            f"# TYPE {name} counter",
+        ] + [f'{name}{{result="{key}"}} {stats[key]}'
+             for key in ("memory_hits", "disk_hits", "misses")]
+        extra += admission.render_metrics()
+        return Response(
+            instrumentation.render_metrics(extra),
+            mimetype="text/plain; version=0.0.4",
+        )
+
     return app
 
 
@@ -0,0 +1,176 @@
+"""
+ASGI serving mode: the Flask app with non-blocking structure downloads.
+
+    uvicorn --factory asgi:create_asgi_app --host 0.0.0.0 --port 8000
+
+Under synchronous WSGI workers a cold PDB ID holds a worker for the whole
+RCSB download, retries included, so a few slow upstream fetches starve
+the pool. Here the structures named by a request (the PDB ID in
+``/api/metrics``, ``/api/mutation_metrics`` and ``/api/structure`` paths,
+or the ``pdb_id1``/``pdb_id2`` fields posted to ``/``) are downloaded on
+the event loop with one shared ``httpx.AsyncClient``, so any number of
+downloads overlap. Only then does the request reach the Flask app, on a
+pool of ``ASYNC_CPU_WORKERS`` threads, where parsing and metrics find the
+file cached and never wait on the network.
+"""
+import asyncio
+import inspect
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+
+import config
+from analysis import DownloadError
+from app import create_app, validate_pdb_id
+from io_utils import fetch_structure_async
+
+PREFETCH_PATH = re.compile(
+    r"^/api/(?:metrics|mutation_metrics|structure)/([^/]+)"
+)
+FORM_FIELDS = ("pdb_id1", "pdb_id2")
+
+# asgiref runs every WSGI call on one shared thread; keep the plain
+# method to run it on our own pool instead
+_run_wsgi_app = inspect.unwrap(WsgiToAsgiInstance.run_wsgi_app)
+
+
+class _PooledWsgiInstance(WsgiToAsgiInstance):
+    def __init__(self, wsgi_application, executor: ThreadPoolExecutor):
+        super().__init__(wsgi_application)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(_run_wsgi_app, thread_sensitive=False,
+                            executor=self.executor)(self, body)
+
+
+async def _send_json(send, status: int, payload: dict) -> None:
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _error_status(error: Exception) -> int:
+    response = getattr(error, "response", None)
+    return 404 if getattr(response, "status_code", None) == 404 else 502
+
+
+class AsyncApp:
+    """ASGI application around a Flask app; see the module docstring."""
+
+    def __init__(self, flask_app, cpu_workers: Optional[int] = None,
+                 max_downloads: Optional[int] = None,
+                 retry_backoff: float = 1.0):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(
+            cpu_workers or config.ASYNC_CPU_WORKERS,
+            thread_name_prefix="views",
+        )
+        self.max_downloads = max_downloads or config.ASYNC_MAX_DOWNLOADS
+        self.retry_backoff = retry_backoff
+        self._client = None
+        # one download per PDB ID, shared by concurrent requests
+        self._downloads: dict[str, asyncio.Future] = {}
+
+    def _http(self):
+        import httpx
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=30,
+                limits=httpx.Limits(max_connections=self.max_downloads),
+            )
+        return self._client
+
+    async def prefetch(self, pdb_id: str) -> str:
+        """Download ``pdb_id`` into the cache unless it is there."""
+        pdb_id = pdb_id.upper()
+        download = self._downloads.get(pdb_id)
+        if download is None:
+            download = asyncio.ensure_future(fetch_structure_async(
+                pdb_id, self._http(), self.retry_backoff))
+            self._downloads[pdb_id] = download
+            download.add_done_callback(
+                lambda _: self._downloads.pop(pdb_id, None))
+        # a disconnecting client must not cancel the shared download
+        return await asyncio.shield(download)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self.executor.shutdown(wait=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise ValueError(f"unsupported ASGI scope {scope['type']!r}")
+
+        path = scope["path"]
+        match = PREFETCH_PATH.match(path)
+        pdb_ids = [match.group(1)] if match else []
+        if path == "/" and scope["method"] == "POST":
+            body, receive = await self._buffer(receive)
+            form = parse_qs(body.decode("latin1"))
+            pdb_ids = [form[name][0].strip() for name in FORM_FIELDS
+                       if form.get(name, [""])[0].strip()]
+        pdb_ids = [p for p in pdb_ids if validate_pdb_id(p)]
+        if pdb_ids:
+            outcomes = await asyncio.gather(
+                *(self.prefetch(p) for p in pdb_ids), return_exceptions=True
+            )
+            for pdb_id, outcome in zip(pdb_ids, outcomes):
+                if isinstance(outcome, asyncio.CancelledError):
+                    raise outcome
+                # the form view reports failures itself, as it always has
+                if isinstance(outcome, Exception) \
+                        and path.startswith("/api/"):
+                    await _send_json(send, _error_status(outcome), {
+                        "error": str(DownloadError(pdb_id.upper(), outcome))
+                    })
+                    return
+        await _PooledWsgiInstance(self.flask_app, self.executor)(
+            scope, receive, send)
+
+    @staticmethod
+    async def _buffer(receive) -> tuple:
+        """Read the whole request body; returns (body, replaying receive)."""
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+
+        async def replay():
+            return {"type": "http.request", "body": body,
+                    "more_body": False}
+        return body, replay
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(test_config=None, **kwargs) -> AsyncApp:
+    """``create_app(test_config)`` served by ``AsyncApp(**kwargs)``."""
+    return AsyncApp(create_app(test_config), **kwargs)
@@ -0,0 +1,69 @@
+"""
+Compare the vectorized phi/psi pass against PPBuilder on a synthetic
+multi-chain structure.
+
+    python -m benchmarks.bench_phi_psi --atoms 50000 --chains 8
+"""
+import argparse
+import os
+import tempfile
+import time
+from math import degrees
+
+from Bio.PDB import PPBuilder
+
+from benchmarks.synthetic import write_synthetic
+from explorer import get_phi_psi
+from io_utils import parse_structure
+
+
+def ppbuilder_phi_psi(structure) -> list:
+    """Reference implementation: PPBuilder + Polypeptide.get_phi_psi_list."""
+    angles = []
+    ppb = PPBuilder()
+    for model in structure:
+        for chain in model:
+            for pp in ppb.build_peptides(chain):
+                for phi, psi in pp.get_phi_psi_list():
+                    if phi is not None and psi is not None:
+                        angles.append((degrees(phi), degrees(psi)))
+    return angles
+
+
+def best_of(func, arg, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--atoms", type=int, default=50000)
+    p.add_argument("--chains", type=int, default=8)
+    p.add_argument("--repeat", type=int, default=3)
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_synthetic(
+            os.path.join(tmp, "bench.pdb"),
+            n_atoms=args.atoms, n_chains=args.chains, break_every=50,
+        )
+        structure = parse_structure(path)
+
+    ref = ppbuilder_phi_psi(structure)
+    new = get_phi_psi(structure)
+    assert len(ref) == len(new), "angle count mismatch"
+
+    t_ref = best_of(ppbuilder_phi_psi, structure, args.repeat)
+    t_new = best_of(get_phi_psi, structure, args.repeat)
+    print(f"atoms={args.atoms} chains={args.chains} angles={len(new)}")
+    print(f"PPBuilder:  {t_ref * 1000:9.2f} ms")
+    print(f"vectorized: {t_new * 1000:9.2f} ms")
+    print(f"speed-up:   {t_ref / t_new:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
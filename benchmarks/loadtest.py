@@ -0,0 +1,308 @@
+"""
+Load test for the web app against a local RCSB stand-in.
+
+    python -m benchmarks.loadtest --requests 500 --concurrency 8 \\
+        --cold-fraction 0.2 --latency 0.05 --failure-rate 0.02
+    python -m benchmarks.loadtest --target http://127.0.0.1:8000 ...
+
+Starts benchmarks.rcsb_standin and, unless ``--target`` names a running
+server, the app itself in this process (with downloads pointed at the
+stand-in and fresh cache/output directories), under werkzeug's threaded
+server or, with ``--server asgi``, the ASGI mode of asgi.py. Then drives
+``/``, ``/api/metrics`` and ``/api/mutation_metrics`` from
+``--concurrency`` closed-loop clients. Warm IDs are fetched once before
+measuring; cold IDs are new for every request. Reports p50/p95/p99
+latency and requests/sec. An external ``--target`` must itself use the
+printed stand-in URL as RCSB_BASE_URL.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from benchmarks.rcsb_standin import StandInServer
+
+ENDPOINTS = ("index", "analyze", "metrics", "mutation")
+DEFAULT_MIX = "index=1,analyze=1,metrics=4,mutation=4"
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+_ID_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def parse_mix(text: str) -> dict:
+    """"metrics=4,mutation=4" -> {"metrics": 4.0, "mutation": 4.0}."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint {name!r}; use {ENDPOINTS}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def pdb_ids(prefix: str, count: int) -> list[str]:
+    """``count`` distinct 4-character IDs starting with ``prefix``."""
+    ids = []
+    for n in range(count):
+        suffix = ""
+        for _ in range(4 - len(prefix)):
+            n, digit = divmod(n, len(_ID_CHARS))
+            suffix = _ID_CHARS[digit] + suffix
+        ids.append(prefix + suffix)
+    return ids
+
+
+class Workload:
+    """Thread-safe source of (endpoint, method, path, form) requests."""
+
+    def __init__(self, mix: dict, warm_ids: list, cold_fraction: float,
+                 seed: int = 0):
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.warm_ids = warm_ids
+        self.cold_fraction = cold_fraction
+        self._cold = iter(pdb_ids("9", 36 ** 3))
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next(self) -> tuple:
+        with self._lock:
+            endpoint = self._random.choices(self.names, self.weights)[0]
+            if self._random.random() < self.cold_fraction:
+                pdb_id = next(self._cold)
+            else:
+                pdb_id = self._random.choice(self.warm_ids)
+            mutation = (f"A{self._random.randint(2, 8)}"
+                        f"{self._random.choice(AMINO_ACIDS)}")
+        if endpoint == "index":
+            return endpoint, "GET", "/", None
+        if endpoint == "analyze":
+            return endpoint, "POST", "/", {"pdb_id1": pdb_id}
+        if endpoint == "metrics":
+            return endpoint, "GET", f"/api/metrics/{pdb_id}", None
+        return (endpoint, "GET",
+                f"/api/mutation_metrics/{pdb_id}/{mutation}", None)
+
+
+def run_load(base_url: str, workload: Workload, n_requests: int,
+             concurrency: int, timeout: float = 120.0) -> dict:
+    """Issue ``n_requests`` requests; returns per-request samples."""
+    import requests
+
+    samples: list = []
+    lock = threading.Lock()
+    remaining = iter(range(n_requests))
+    local = threading.local()
+
+    def client() -> None:
+        local.session = requests.Session()
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            endpoint, method, path, form = workload.next()
+            start = time.perf_counter()
+            try:
+                resp = local.session.request(
+                    method, base_url + path, data=form, timeout=timeout,
+                    allow_redirects=False,
+                )
+                ok = resp.status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append((endpoint, elapsed, ok))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(client) for _ in range(concurrency)]:
+            future.result()
+    return {"samples": samples, "wall": time.perf_counter() - started}
+
+
+def warm_up(base_url: str, warm_ids: list, timeout: float = 120.0) -> None:
+    """Fetch and analyse every warm ID once, before measuring."""
+    import requests
+
+    with requests.Session() as session:
+        for pdb_id in warm_ids:
+            session.get(f"{base_url}/api/metrics/{pdb_id}", timeout=timeout)
+
+
+def summarize(run: dict) -> dict:
+    """Latency percentiles (ms) and throughput, overall and per endpoint."""
+    def stats(samples) -> dict:
+        latencies = np.array([s[1] for s in samples]) * 1000
+        p50, p95, p99 = (np.percentile(latencies, [50, 95, 99])
+                         if len(latencies) else (0.0, 0.0, 0.0))
+        return {
+            "requests": len(samples),
+            "errors": sum(1 for s in samples if not s[2]),
+            "p50_ms": float(p50), "p95_ms": float(p95),
+            "p99_ms": float(p99),
+        }
+
+    samples = run["samples"]
+    report = {"overall": stats(samples)}
+    report["overall"]["requests_per_sec"] = (
+        len(samples) / run["wall"] if run["wall"] else 0.0
+    )
+    for endpoint in ENDPOINTS:
+        selected = [s for s in samples if s[0] == endpoint]
+        if selected:
+            report[endpoint] = stats(selected)
+    return report
+
+
+class AsgiServer:
+    """uvicorn serving an ASGI app from a background thread."""
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0):
+        import uvicorn
+
+        self._server = uvicorn.Server(uvicorn.Config(
+            app, host=host, port=port, log_level="warning", lifespan="on",
+        ))
+        self._thread = threading.Thread(target=self._server.run,
+                                        daemon=True)
+
+    def start(self, timeout: float = 30.0) -> "AsgiServer":
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("uvicorn did not start")
+            time.sleep(0.01)
+        return self
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def shutdown(self) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+
+def _start_app(base_url: str, workdir: str, server: str = "threaded",
+               cpu_workers: Optional[int] = None) -> tuple:
+    """
+    Run the app in a background thread, under werkzeug's threaded server
+    or (``server="asgi"``) asgi.py on uvicorn; returns (url, server).
+    """
+    os.environ.update({
+        "RCSB_BASE_URL": base_url,
+        "CACHE_DIR": os.path.join(workdir, "cifs"),
+        "OUTPUT_DIR": os.path.join(workdir, "outputs"),
+        "RESULT_CACHE_PATH": os.path.join(workdir, "results.sqlite"),
+        "SEQUENCE_INDEX_PATH": os.path.join(workdir, "sequences.sqlite"),
+        "CORPUS_DIR": os.path.join(workdir, "corpus"),
+        "ALIGNMENT_CACHE_DIR": os.path.join(workdir, "alignments"),
+    })
+    if "config" in sys.modules:
+        raise RuntimeError("config was imported before the load test "
+                           "could point it at the stand-in")
+    if server == "asgi":
+        from asgi import create_asgi_app
+
+        asgi_server = AsgiServer(
+            create_asgi_app(cpu_workers=cpu_workers)).start()
+        return asgi_server.url, asgi_server
+
+    from werkzeug.serving import make_server
+
+    from app import create_app
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    wsgi_server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    threading.Thread(target=wsgi_server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{wsgi_server.server_port}", wsgi_server
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", help="URL of an already running app")
+    parser.add_argument("--server", choices=("threaded", "asgi"),
+                        default="threaded",
+                        help="how to serve the in-process app: werkzeug "
+                             "threads or asgi.py on uvicorn")
+    parser.add_argument("--cpu-workers", type=int,
+                        help="view threads of --server asgi "
+                             "(default: ASYNC_CPU_WORKERS)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help=f"endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument("--warm-ids", type=int, default=5)
+    parser.add_argument("--cold-fraction", type=float, default=0.1,
+                        help="share of requests using a never-seen ID")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="stand-in response delay in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="share of stand-in responses that are 503")
+    parser.add_argument("--atoms", type=int, default=2000,
+                        help="typical synthetic structure size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    standin = StandInServer(latency=args.latency,
+                            failure_rate=args.failure_rate,
+                            n_atoms=args.atoms, seed=args.seed).start()
+    print(f"RCSB stand-in at {standin.base_url}")
+    app_server = None
+    workdir: Optional[tempfile.TemporaryDirectory] = None
+    try:
+        base_url = args.target
+        if not base_url:
+            workdir = tempfile.TemporaryDirectory(prefix="loadtest-")
+            base_url, app_server = _start_app(
+                standin.base_url, workdir.name, args.server,
+                args.cpu_workers)
+        base_url = base_url.rstrip("/")
+
+        warm_ids = pdb_ids("8", args.warm_ids)
+        workload = Workload(parse_mix(args.mix), warm_ids,
+                            args.cold_fraction, args.seed)
+        warm_up(base_url, warm_ids)
+
+        report = summarize(
+            run_load(base_url, workload, args.requests, args.concurrency)
+        )
+        report["standin"] = dict(standin.stats)
+    finally:
+        if app_server is not None:
+            app_server.shutdown()
+        standin.stop()
+        if workdir is not None:
+            workdir.cleanup()
+
+    print(f"\n{'endpoint':<10} {'requests':>8} {'errors':>7} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name in ("overall",) + ENDPOINTS:
+        if name in report:
+            row = report[name]
+            print(f"{name:<10} {row['requests']:>8} {row['errors']:>7} "
+                  f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+                  f"{row['p99_ms']:>9.1f}")
+    print(f"\n{report['overall']['requests_per_sec']:.1f} requests/sec; "
+          f"stand-in served {report['standin']['requests']} downloads, "
+          f"{report['standin']['failures']} injected failures")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
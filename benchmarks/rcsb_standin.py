@@ -0,0 +1,197 @@
+"""
+Local stand-in for files.rcsb.org serving synthetic structures.
+
+    python -m benchmarks.rcsb_standin --port 8089 --latency 0.05 \\
+        --failure-rate 0.05
+    RCSB_BASE_URL=http://127.0.0.1:8089/download gunicorn "app:create_app()"
+
+``GET /download/<ID>.cif`` and ``/download/<ID>.pdb`` return a synthetic
+structure whose size is derived from the ID, so different IDs have
+different content. Injected failures answer 503, which the download
+session's Retry policy retries. Responses carry an ETag and
+Last-Modified; conditional requests for an unchanged entry answer 304,
+and ``revise()`` publishes a new version of an entry.
+"""
+import argparse
+import random
+import re
+import threading
+import time
+import zlib
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from benchmarks.synthetic import synthetic_cif, synthetic_pdb
+
+PATH_PATTERN = re.compile(r"^/download/([0-9A-Za-z]{4})\.(cif|pdb)$")
+
+
+@lru_cache(maxsize=256)
+def structure_text(pdb_id: str, fmt: str, n_atoms: int,
+                   revision: int = 0) -> bytes:
+    """
+    Synthetic file for ``pdb_id``: ``n_atoms`` ± 50%, set by the ID;
+    each revision adds 50 atoms.
+    """
+    spread = zlib.crc32(pdb_id.upper().encode()) % 1000
+    atoms = max(100, int(n_atoms * (0.5 + spread / 1000))) + 50 * revision
+    chains = 1 + spread % 3
+    if fmt == "pdb":
+        return synthetic_pdb(n_atoms=atoms, n_chains=chains).encode()
+    return synthetic_cif(n_atoms=atoms, n_chains=chains).encode()
+
+
+class StandInServer:
+    """
+    Threaded HTTP server in a background thread.
+
+    ``latency`` seconds are added to every response; ``failure_rate``
+    of requests (and the first ``fail_first`` requests for each path)
+    answer 503 instead. Without ``validators`` no ETag or Last-Modified
+    is sent and every request gets the full body. ``stats`` counts
+    requests, injected failures and 304 answers.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, failure_rate: float = 0.0,
+                 fail_first: int = 0, n_atoms: int = 2000,
+                 seed: Optional[int] = None, validators: bool = True):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.fail_first = fail_first
+        self.n_atoms = n_atoms
+        self.validators = validators
+        self.host = host
+        self.stats = {"requests": 0, "failures": 0, "not_found": 0,
+                      "not_modified": 0}
+        self._seen: dict[str, int] = {}
+        self._revisions: dict[str, int] = {}
+        # revision r was last modified r seconds after this
+        self._published = int(time.time()) - 86400
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self._server.server_port}/download"
+
+    def revise(self, pdb_id: str) -> int:
+        """Publish a new version of ``pdb_id``; returns its revision."""
+        with self._lock:
+            revision = self._revisions.get(pdb_id.upper(), 0) + 1
+            self._revisions[pdb_id.upper()] = revision
+            return revision
+
+    def _not_modified(self, headers, etag: str, modified: int) -> bool:
+        if "If-None-Match" in headers:
+            return etag in headers["If-None-Match"].split(", ")
+        since = headers.get("If-Modified-Since")
+        if since is None:
+            return False
+        try:
+            return parsedate_to_datetime(since).timestamp() >= modified
+        except (TypeError, ValueError):
+            return False
+
+    def _should_fail(self, path: str) -> bool:
+        with self._lock:
+            self.stats["requests"] += 1
+            seen = self._seen.get(path, 0)
+            self._seen[path] = seen + 1
+            fail = (seen < self.fail_first
+                    or self._random.random() < self.failure_rate)
+            if fail:
+                self.stats["failures"] += 1
+            return fail
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                match = PATH_PATTERN.match(self.path)
+                if server.latency:
+                    time.sleep(server.latency)
+                if match is None:
+                    with server._lock:
+                        server.stats["not_found"] += 1
+                    self.send_error(404)
+                    return
+                if server._should_fail(self.path):
+                    self.send_error(503)
+                    return
+                pdb_id, fmt = match.group(1).upper(), match.group(2)
+                with server._lock:
+                    revision = server._revisions.get(pdb_id, 0)
+                body = structure_text(pdb_id, fmt, server.n_atoms, revision)
+                etag = f'"{zlib.crc32(body):08x}"'
+                modified = server._published + revision
+                if server.validators and server._not_modified(
+                        self.headers, etag, modified):
+                    with server._lock:
+                        server.stats["not_modified"] += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                if server.validators:
+                    self.send_header("ETag", etag)
+                    self.send_header("Last-Modified",
+                                     formatdate(modified, usegmt=True))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every response")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 503")
+    parser.add_argument("--atoms", type=int, default=2000,
+                        help="typical structure size")
+    args = parser.parse_args(argv)
+
+    server = StandInServer(args.host, args.port, args.latency,
+                           args.failure_rate, n_atoms=args.atoms)
+    print(f"Serving synthetic structures at {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
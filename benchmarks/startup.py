@@ -0,0 +1,85 @@
+"""
+Report where start-up time goes: import time per module (from
+``python -X importtime``) and the time to build the Flask app.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --module analysis --top 30
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CREATE_APP = (
+    "import time; t = time.perf_counter(); import app; "
+    "i = time.perf_counter(); app.create_app(); "
+    "print(i - t, time.perf_counter() - i)"
+)
+
+
+def import_times(module: str) -> list[tuple[str, int, int]]:
+    """
+    Import ``module`` in a fresh interpreter and return
+    (name, self µs, cumulative µs) for every module it loaded.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=ROOT, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = [f.strip() for f in line[len("import time:"):].split("|")]
+        if not fields[0].isdigit():
+            continue  # header line
+        rows.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return rows
+
+
+def top_level_totals(rows) -> dict[str, int]:
+    """Self time summed per top-level package, in µs."""
+    totals: dict[str, int] = {}
+    for name, self_us, _ in rows:
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return totals
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="app",
+                        help="module to import (default: app)")
+    parser.add_argument("--top", type=int, default=15,
+                        help="number of rows to show")
+    args = parser.parse_args(argv)
+
+    rows = import_times(args.module)
+    total = sum(self_us for _, self_us, _ in rows)
+    print(f"import {args.module}: {total / 1000:.1f} ms "
+          f"across {len(rows)} modules\n")
+
+    print(f"{'package':<30} {'self ms':>9}")
+    totals = top_level_totals(rows)
+    for package in sorted(totals, key=lambda p: totals[p],
+                          reverse=True)[:args.top]:
+        print(f"{package:<30} {totals[package] / 1000:>9.1f}")
+
+    print(f"\n{'module':<40} {'cumulative ms':>14}")
+    slowest = sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]
+    for name, _, cumulative in slowest:
+        print(f"{name:<40} {cumulative / 1000:>14.1f}")
+
+    if args.module == "app":
+        out = subprocess.run(
+            [sys.executable, "-c", _CREATE_APP],
+            capture_output=True, text=True, cwd=ROOT, check=True,
+        ).stdout.split()
+        print(f"\nimport app {float(out[0]) * 1000:.1f} ms, "
+              f"create_app() {float(out[1]) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Benchmark suite over synthetic multi-chain, multi-model structures.
+
+    python -m benchmarks.suite --sizes 1000,10000 --output results.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json
+
+Times parsing, centre of mass, Cα extraction, phi/psi, pairwise RMSD
+(with a cold and a warm alignment cache), a single mutation and bulk
+mutation throughput at each size, writes the results as JSON and, given
+a baseline file, fails (exit status 1) when a benchmark is slower than
+the baseline by more than ``--threshold``.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from benchmarks.synthetic import write_synthetic
+
+DEFAULT_SIZES = (1000, 10000, 100000, 500000)
+# Above this size the copy-heavy benchmarks are skipped unless --full
+SLOW_MAX_ATOMS = 100000
+# Timings below this are too noisy to flag as regressions
+MIN_COMPARE_SECONDS = 0.005
+BATCH_MUTATIONS = 500
+
+
+def best_of(func: Callable, repeat: int, budget: float = 2.0) -> float:
+    """
+    Fastest of up to ``repeat`` runs with the garbage collector off, as in
+    timeit; stops repeating once ``budget`` seconds have been spent (at
+    least one run always happens).
+    """
+    best = float("inf")
+    spent = 0.0
+    for _ in range(repeat):
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        best = min(best, elapsed)
+        spent += elapsed
+        if spent >= budget:
+            break
+    return best
+
+
+def synthetic_structure(directory: str, n_atoms: int) -> str:
+    """Two-model mmCIF with ~n_atoms atoms in total over several chains."""
+    return write_synthetic(
+        os.path.join(directory, f"synthetic_{n_atoms}.cif"),
+        n_atoms=n_atoms // 2, n_chains=max(2, n_atoms // 25000),
+        n_models=2, break_every=40,
+    )
+
+
+def _mutations(structure, count: int) -> list[str]:
+    """
+    Up to ``count`` alanine substitutions spread over the first model.
+    Chains with digits in their ID cannot be written as "<chain><pos><aa>".
+    """
+    from Bio.PDB import is_aa
+
+    residues = [(chain.id, res.id[1])
+                for chain in next(structure.get_models())
+                if chain.id.isalpha()
+                for res in chain if is_aa(res) and "CA" in res]
+    step = max(1, len(residues) // count)
+    return [f"{chain}{pos}A" for chain, pos in residues[::step][:count]]
+
+
+def run_size(path: str, repeat: int, full: bool,
+             only: Optional[set] = None) -> dict:
+    """Run every benchmark on one structure file."""
+    from alignment import AlignmentCache
+    from bulk_mutation import MutationEvaluator
+    from explorer import get_ca_coordinates, get_phi_psi
+    from io_utils import parse_structure
+    from metrics import (
+        compare_structures,
+        compute_center_of_mass,
+        compute_center_of_mass_difference,
+        compute_mutation_rmsd,
+    )
+    from mutation import model_mutation
+
+    structure = parse_structure(path)
+    n_atoms = sum(1 for _ in structure.get_atoms())
+    out_dir = os.path.dirname(path)
+    slow_ok = full or n_atoms <= SLOW_MAX_ATOMS
+    mutation = _mutations(structure, 1)[0]
+    batch = _mutations(structure, BATCH_MUTATIONS)
+
+    def single_mutation():
+        mutant = model_mutation(path, mutation)
+        compute_mutation_rmsd(structure, mutant, mutation)
+        compute_center_of_mass_difference(structure, mutant)
+
+    def pairwise_rmsd():
+        # a fresh cache each run, so every repeat computes the alignment
+        cache = AlignmentCache(tempfile.mkdtemp(dir=out_dir))
+        compare_structures(path, path, out_dir, cache)
+
+    warm_cache = AlignmentCache(os.path.join(out_dir, "alignments"))
+
+    def batch_throughput():
+        evaluator = MutationEvaluator(structure)
+        for item in batch:
+            evaluator.evaluate(item)
+
+    benchmarks = {
+        "parse": (lambda: parse_structure(path), True),
+        "center_of_mass": (lambda: compute_center_of_mass(structure), True),
+        "ca_extraction": (lambda: get_ca_coordinates(structure), True),
+        "phi_psi": (lambda: get_phi_psi(structure), True),
+        "pairwise_rmsd": (pairwise_rmsd, slow_ok),
+        "pairwise_rmsd_warm": (
+            lambda: compare_structures(path, path, out_dir, warm_cache),
+            slow_ok,
+        ),
+        "single_mutation": (single_mutation, slow_ok),
+        "batch_throughput": (batch_throughput, True),
+    }
+    results = {}
+    for name, (func, enabled) in benchmarks.items():
+        if not enabled or (only and name not in only):
+            continue
+        if name == "pairwise_rmsd_warm":
+            func()  # fill the cache outside the timing
+        seconds = best_of(func, repeat)
+        entry = {"seconds": seconds, "atoms": n_atoms}
+        if name == "batch_throughput":
+            entry["rows_per_sec"] = len(batch) / seconds
+        results[name] = entry
+    return results
+
+
+def run_suite(sizes, repeat: int = 5, full: bool = False,
+              only: Optional[set] = None, log=print) -> dict:
+    """Results keyed ``<benchmark>@<size>``, plus environment metadata."""
+    import Bio
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = synthetic_structure(tmp, size)
+            for name, entry in run_size(path, repeat, full, only).items():
+                key = f"{name}@{size}"
+                results[key] = entry
+                log(f"{key:<28} {entry['seconds'] * 1000:>12.2f} ms")
+            os.remove(path)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "biopython": Bio.__version__,
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[dict]:
+    """Per-benchmark ratios against ``baseline``; flags regressions."""
+    rows = []
+    for key, entry in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            continue
+        ratio = entry["seconds"] / base["seconds"]
+        noisy = max(entry["seconds"], base["seconds"]) < MIN_COMPARE_SECONDS
+        rows.append({
+            "benchmark": key,
+            "baseline": base["seconds"],
+            "current": entry["seconds"],
+            "ratio": ratio,
+            "regression": not noisy and ratio > 1 + threshold,
+        })
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated atom counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--full", action="store_true",
+                        help="run pairwise RMSD and single mutation above "
+                             f"{SLOW_MAX_ATOMS} atoms too")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="baseline JSON to compare with")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write the results to --baseline instead")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    only = set(args.only.split(",")) if args.only else None
+    current = run_suite(sizes, args.repeat, args.full, only)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    if not args.baseline:
+        return 0
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; "
+              "rerun with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        rows = compare(current, json.load(f), args.threshold)
+    print(f"\n{'benchmark':<28} {'baseline ms':>12} {'current ms':>12} "
+          f"{'ratio':>7}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['benchmark']:<28} {row['baseline'] * 1000:>12.2f} "
+              f"{row['current'] * 1000:>12.2f} {row['ratio']:>7.2f}{flag}")
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than the baseline "
+              f"by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Synthetic protein structures for benchmarks and tests.
+
+Backbones are built residue by residue from ideal bond geometry
+(NeRF placement), so dihedrals, peptide breaks and Cβ/γ side-chain
+atoms are realistic enough for the analysis code paths.
+"""
+import numpy as np
+
+# Residue types cycled along each chain: one letter, three letter, γ atom
+RESIDUE_CYCLE = [
+    ("A", "ALA", None), ("S", "SER", "OG"), ("L", "LEU", "CG"),
+    ("G", "GLY", None), ("V", "VAL", "CG1"), ("K", "LYS", "CG"),
+    ("T", "THR", "OG1"), ("D", "ASP", "CG"), ("C", "CYS", "SG"),
+    ("E", "GLU", "CG"),
+]
+
+CHAIN_IDS = (
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+)
+MAX_CHAIN_RESIDUES = 500
+
+_ELEMENTS = {"N": "N", "CA": "C", "C": "C", "O": "O", "CB": "C",
+             "CG": "C", "CG1": "C", "OG": "O", "OG1": "O", "SG": "S"}
+
+
+def _place(a: np.ndarray, b: np.ndarray, c: np.ndarray, bond: float,
+           angle: float, torsion: float) -> np.ndarray:
+    """Place atom d from a, b, c given |cd|, angle bcd and torsion abcd."""
+    angle, torsion = np.radians(angle), np.radians(torsion)
+    bc = c - b
+    bc /= np.linalg.norm(bc)
+    n = np.cross(b - a, bc)
+    n /= np.linalg.norm(n)
+    m = np.cross(n, bc)
+    d2 = np.array([
+        -bond * np.cos(angle),
+        bond * np.sin(angle) * np.cos(torsion),
+        bond * np.sin(angle) * np.sin(torsion),
+    ])
+    return c + d2[0] * bc + d2[1] * m + d2[2] * n
+
+
+def build_chain(n_residues: int, phi: float = -57.0, psi: float = -47.0,
+                omega: float = 180.0, origin=(0.0, 0.0, 0.0),
+                break_every: int = 0, side_chains: bool = True) -> list:
+    """
+    Return a list of residues ``(resname, [(atom_name, xyz), ...])`` for an
+    ideal chain. With ``break_every`` > 0 the chain is shifted by 10 Å
+    after every ``break_every`` residues, producing peptide breaks.
+    """
+    n = np.array([0.0, 1.458, 0.0])
+    ca = np.array([0.0, 0.0, 0.0])
+    c = _place(np.array([1.0, 1.5, 0.0]), n, ca, 1.525, 111.0, -60.0)
+    residues = []
+    offset = np.asarray(origin, dtype=float)
+    for i in range(n_residues):
+        if i:
+            n = _place(n, ca, c, 1.329, 116.2, psi)
+            ca = _place(ca, c, n, 1.458, 121.7, omega)
+            c = _place(c, n, ca, 1.525, 111.0, phi)
+        if break_every and i and i % break_every == 0:
+            offset = offset + np.array([10.0, 0.0, 0.0])
+        _, resname, gamma = RESIDUE_CYCLE[i % len(RESIDUE_CYCLE)]
+        o = _place(n, ca, c, 1.231, 120.5, psi + 180.0)
+        atoms = [("N", n), ("CA", ca), ("C", c), ("O", o)]
+        if side_chains and resname != "GLY":
+            cb = _place(c, n, ca, 1.53, 110.5, -122.5)
+            atoms.append(("CB", cb))
+            if gamma:
+                atoms.append((gamma, _place(n, ca, cb, 1.52, 114.0, -60.0)))
+        residues.append(
+            (resname, [(name, xyz + offset) for name, xyz in atoms])
+        )
+    return residues
+
+
+def synthetic_chains(n_atoms: int = 1000, n_chains: int = 1,
+                     break_every: int = 0) -> list:
+    """
+    Split roughly ``n_atoms`` atoms over at least ``n_chains`` chains of at
+    most ``MAX_CHAIN_RESIDUES`` residues. Each chain is centred on its own
+    point of a 40 Å grid so coordinates stay small. Returns
+    ``[(chain_id, residues), ...]`` with residues as from build_chain.
+    """
+    # ~5.4 atoms per residue on average with the default residue cycle
+    total_res = max(2, int(round(n_atoms / 5.4)))
+    n_chains = max(1, n_chains, -(-total_res // MAX_CHAIN_RESIDUES))
+    per_chain = max(2, total_res // n_chains)
+    side = int(np.ceil(np.sqrt(n_chains)))
+    chains = []
+    for k in range(n_chains):
+        residues = build_chain(per_chain, break_every=break_every)
+        centre = np.mean([xyz for _, atoms in residues
+                          for _, xyz in atoms], axis=0)
+        grid = np.array([0.0, 40.0 * (k // side), 40.0 * (k % side)])
+        shift = grid - centre
+        residues = [(resname, [(name, xyz + shift) for name, xyz in atoms])
+                    for resname, atoms in residues]
+        chains.append((_chain_id(k), residues))
+    return chains
+
+
+def _chain_id(index: int) -> str:
+    """A, B, ..., 9, then AA, AB, ... for mmCIF output."""
+    if index < len(CHAIN_IDS):
+        return CHAIN_IDS[index]
+    index -= len(CHAIN_IDS)
+    return (CHAIN_IDS[index // len(CHAIN_IDS) % len(CHAIN_IDS)]
+            + CHAIN_IDS[index % len(CHAIN_IDS)])
+
+
+def _iter_atoms(chains: list, n_models: int):
+    """Yield (model, chain_id, resseq, resname, atom_name, xyz)."""
+    for model in range(1, n_models + 1):
+        for chain_id, residues in chains:
+            for resseq, (resname, atoms) in enumerate(residues, start=1):
+                for name, xyz in atoms:
+                    yield (model, chain_id, resseq, resname, name,
+                           xyz + (model - 1) * 0.1)
+
+
+def synthetic_pdb(n_atoms: int = 1000, n_chains: int = 1,
+                  n_models: int = 1, break_every: int = 0) -> str:
+    """
+    PDB-format text with roughly ``n_atoms`` atoms per model. PDB allows
+    one-character chain IDs only, so very large requests raise
+    ValueError; use :func:`synthetic_cif` for those.
+    """
+    chains = synthetic_chains(n_atoms, n_chains, break_every)
+    if len(chains) > len(CHAIN_IDS):
+        raise ValueError(
+            f"{len(chains)} chains do not fit the PDB format; "
+            f"use synthetic_cif"
+        )
+    lines = []
+    current_model = None
+    for serial, (model, chain_id, resseq, resname, name, xyz) in enumerate(
+            _iter_atoms(chains, n_models), start=1):
+        if model != current_model:
+            if current_model is not None and n_models > 1:
+                lines.append("ENDMDL")
+            if n_models > 1:
+                lines.append(f"MODEL     {model:4d}")
+            current_model = model
+        x, y, z = xyz
+        lines.append(
+            f"ATOM  {serial % 100000:5d} {name:<4s} {resname} "
+            f"{chain_id}{resseq % 10000:4d}    "
+            f"{x:8.3f}{y:8.3f}{z:8.3f}  1.00  0.00"
+            f"          {_ELEMENTS[name]:>2s}"
+        )
+    if n_models > 1:
+        lines.append("ENDMDL")
+    lines.append("END")
+    return "\n".join(lines) + "\n"
+
+
+_CIF_HEADER = """\
+data_SYNTH
+#
+loop_
+_atom_site.group_PDB
+_atom_site.id
+_atom_site.type_symbol
+_atom_site.label_atom_id
+_atom_site.label_alt_id
+_atom_site.label_comp_id
+_atom_site.label_asym_id
+_atom_site.label_entity_id
+_atom_site.label_seq_id
+_atom_site.pdbx_PDB_ins_code
+_atom_site.Cartn_x
+_atom_site.Cartn_y
+_atom_site.Cartn_z
+_atom_site.occupancy
+_atom_site.B_iso_or_equiv
+_atom_site.auth_seq_id
+_atom_site.auth_asym_id
+_atom_site.pdbx_PDB_model_num
+"""
+
+
+def synthetic_cif(n_atoms: int = 1000, n_chains: int = 1,
+                  n_models: int = 1, break_every: int = 0) -> str:
+    """mmCIF-format text; same layout as :func:`synthetic_pdb`."""
+    chains = synthetic_chains(n_atoms, n_chains, break_every)
+    lines = [_CIF_HEADER.rstrip("\n")]
+    for serial, (model, chain_id, resseq, resname, name, xyz) in enumerate(
+            _iter_atoms(chains, n_models), start=1):
+        x, y, z = xyz
+        lines.append(
+            f"ATOM {serial} {_ELEMENTS[name]} {name} . {resname} "
+            f"{chain_id} 1 {resseq} ? {x:.3f} {y:.3f} {z:.3f} 1.00 0.00 "
+            f"{resseq} {chain_id} {model}"
+        )
+    lines.append("#")
+    return "\n".join(lines) + "\n"
+
+
+def write_synthetic(path: str, **kwargs) -> str:
+    """
+    Write a synthetic structure to ``path``; the format follows the
+    extension (.pdb, otherwise mmCIF). Returns the path.
+    """
+    if path.lower().endswith(".pdb"):
+        text = synthetic_pdb(**kwargs)
+    else:
+        text = synthetic_cif(**kwargs)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
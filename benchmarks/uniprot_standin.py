@@ -0,0 +1,155 @@
+"""
+Local stand-in for the UniProtKB REST API.
+
+    python -m benchmarks.uniprot_standin --port 8090 --latency 0.05
+    UNIPROT_BASE_URL=http://127.0.0.1:8090/uniprotkb \\
+        python run_mutation_batch.py --pdb 1AKE --uniprot P69441
+
+``GET /uniprotkb/<accession>.json`` returns a minimal entry (sequence and
+natural variant features) with an ETag, and answers ``If-None-Match``
+with 304. Unknown accessions get a generated entry. ``stats`` counts
+requests, 304s and the highest number of concurrent requests seen.
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+PATH_PATTERN = re.compile(r"^/uniprotkb/([0-9A-Za-z_-]+)\.json$")
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+
+def make_entry(accession: str, sequence: str, variants) -> dict:
+    """UniProtKB-style JSON for ``variants`` of (position, original, new)."""
+    return {
+        "primaryAccession": accession,
+        "sequence": {"value": sequence, "length": len(sequence)},
+        "features": [
+            {
+                "type": "Natural variant",
+                "featureId": f"VAR_{n:06d}",
+                "location": {"start": {"value": pos, "modifier": "EXACT"},
+                             "end": {"value": pos, "modifier": "EXACT"}},
+                "alternativeSequence": {"originalSequence": original,
+                                        "alternativeSequences": [new]},
+            }
+            for n, (pos, original, new) in enumerate(variants)
+        ],
+    }
+
+
+def generated_entry(accession: str, length: int = 300,
+                    n_variants: int = 20) -> dict:
+    rng = random.Random(accession)
+    sequence = "".join(rng.choice(AMINO_ACIDS) for _ in range(length))
+    positions = sorted(rng.sample(range(1, length + 1), n_variants))
+    return make_entry(accession, sequence, [
+        (p, sequence[p - 1], rng.choice(AMINO_ACIDS)) for p in positions
+    ])
+
+
+class UniProtStandIn:
+    """Threaded HTTP server in a background thread (see module doc)."""
+
+    def __init__(self, entries: Optional[dict] = None,
+                 host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, etag: str = '"v1"'):
+        self.entries = entries or {}
+        self.latency = latency
+        self.etag = etag
+        self.host = host
+        self.stats = {"requests": 0, "not_modified": 0, "max_in_flight": 0}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self._server.server_port}/uniprotkb"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    server.stats["requests"] += 1
+                    server._in_flight += 1
+                    server.stats["max_in_flight"] = max(
+                        server.stats["max_in_flight"], server._in_flight)
+                try:
+                    self._respond()
+                finally:
+                    with server._lock:
+                        server._in_flight -= 1
+
+            def _respond(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                match = PATH_PATTERN.match(self.path)
+                if match is None:
+                    self.send_error(404)
+                    return
+                if self.headers.get("If-None-Match") == server.etag:
+                    with server._lock:
+                        server.stats["not_modified"] += 1
+                    self.send_response(304)
+                    self.send_header("ETag", server.etag)
+                    self.end_headers()
+                    return
+                accession = match.group(1)
+                entry = server.entries.get(accession) \
+                    or generated_entry(accession)
+                body = json.dumps(entry).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", server.etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "UniProtStandIn":
+        threading.Thread(target=self._server.serve_forever,
+                         daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "UniProtStandIn":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every response")
+    args = parser.parse_args(argv)
+
+    server = UniProtStandIn(host=args.host, port=args.port,
+                            latency=args.latency)
+    print(f"Serving UniProt entries at {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
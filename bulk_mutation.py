@@ -0,0 +1,170 @@
+"""Evaluate many point mutations against one parsed wild-type structure."""
+import csv
+import io
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+from Bio.Data.IUPACData import protein_letters_1to3
+from Bio.PDB import is_aa
+
+from metrics import get_atomic_mass
+from mutation import BACKBONE_ATOMS, parse_mutation, rotated_sidechain
+
+
+class MutationEvaluator:
+    """
+    Compute the same RMSD and COM shift as ``model_mutation`` followed by
+    ``compute_mutation_rmsd`` / ``compute_center_of_mass_difference``,
+    without re-parsing or copying the structure per mutation.
+
+    A modelled mutation only moves side-chain atoms of one residue and
+    leaves the backbone untouched, so the backbone superposition is the
+    identity: the RMSD is taken directly over the residue's non-backbone
+    atoms, and the COM shift is the mass-weighted sum of their
+    displacements divided by the total mass.
+    """
+
+    def __init__(self, structure):
+        self.structure = structure
+        self._total_mass = sum(
+            get_atomic_mass(getattr(atom, "element", "C"))
+            for atom in structure.get_atoms()
+        )
+        # first match in iteration order, as model_mutation does
+        self._residues: dict = {}
+        self._chain_for_resseq: dict = {}
+        for residue in structure.get_residues():
+            chain_id = residue.get_parent().id
+            self._residues.setdefault((chain_id, residue.id[1]), residue)
+            if is_aa(residue):
+                self._chain_for_resseq.setdefault(residue.id[1], chain_id)
+
+    def find_chain(self, residue_number: int) -> Optional[str]:
+        """Chain of the first amino acid with this residue number."""
+        return self._chain_for_resseq.get(residue_number)
+
+    def evaluate(self, mutation: str) -> tuple[float, float]:
+        """Return (rmsd, com_shift); raise ValueError like model_mutation."""
+        chain_id, pos, new_aa = parse_mutation(mutation)
+        residue = self._residues.get((chain_id, pos))
+        if residue is None:
+            raise ValueError(
+                f"Residue {chain_id}{pos} not found in structure"
+            )
+        if new_aa not in protein_letters_1to3:
+            raise ValueError(f"Invalid amino acid code: {new_aa!r}")
+        if "CA" not in residue:
+            raise ValueError(f"No Cα atom found for residue {chain_id}{pos}")
+
+        moved = rotated_sidechain(residue)
+        sidechain = [a for a in residue if a.get_id() not in BACKBONE_ATOMS]
+        if not moved:
+            return 0.0, 0.0
+        deltas = np.array([new - atom.get_coord() for atom, new in moved])
+        masses = np.array([
+            get_atomic_mass(getattr(atom, "element", "C"))
+            for atom, _ in moved
+        ])
+        rmsd = float(np.sqrt(np.sum(deltas * deltas) / len(sidechain)))
+        com_shift = float(np.linalg.norm(
+            masses @ deltas / self._total_mass
+        ))
+        return rmsd, com_shift
+
+
+def mutations_from_json(items: Iterable) -> Iterator[dict]:
+    """
+    Normalise JSON input: mutation strings ("A13A") or objects with
+    ``mutation`` or ``residue_number``/``mutated`` (and optional ``chain``).
+    """
+    for item in items:
+        if isinstance(item, str):
+            yield {"mutation": item}
+        elif isinstance(item, dict):
+            yield dict(item)
+        else:
+            yield {"mutation": str(item)}
+
+
+def mutations_from_csv(stream) -> Iterator[dict]:
+    """Rows of a CSV in the mutations_1AKE.csv layout, read lazily."""
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    yield from csv.DictReader(stream)
+
+
+def _mutation_string(row: dict, evaluator_factory) -> str:
+    """Build "<chain><pos><aa>" for a row, inferring the chain if needed."""
+    if row.get("mutation"):
+        return str(row["mutation"]).strip()
+    pos = int(row["residue_number"])
+    chain = (row.get("chain") or "").strip()
+    if not chain:
+        chain = evaluator_factory().find_chain(pos)
+        if chain is None:
+            raise LookupError(f"Residue {pos} not found in any chain")
+    return f"{chain}{pos}{str(row['mutated']).strip()}"
+
+
+def evaluate_batches(rows: Iterable[dict], evaluator_factory,
+                     cache=None, pdb_id: str = "", checksum: str = "",
+                     batch_size: int = 256) -> Iterator[list]:
+    """
+    Yield lists of result records, one per input row, ``batch_size`` rows
+    at a time.
+
+    ``evaluator_factory`` returns the shared MutationEvaluator and is only
+    called when a batch has cache misses (or a row needs its chain
+    inferred), so fully cached inputs never parse the structure. Only one
+    batch is held in memory at a time.
+    """
+    rows = iter(rows)
+    index = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+
+        records = []
+        for row in batch:
+            record = dict(row)
+            record["index"] = index
+            index += 1
+            try:
+                record["mutation"] = _mutation_string(row, evaluator_factory)
+            except (LookupError, ValueError, TypeError) as e:
+                record.update(rmsd=None, center_of_mass_diff=None,
+                              status="residue_not_found"
+                              if isinstance(e, LookupError)
+                              else f"error: {e}")
+            records.append(record)
+
+        todo = [r["mutation"] for r in records if "status" not in r]
+        known = cache.get_many(pdb_id, checksum, todo) if cache else {}
+        fresh: dict = {}
+        for record in records:
+            if "status" in record:
+                continue
+            mutation = record["mutation"]
+            value = known.get(mutation) or fresh.get(mutation)
+            if value is None:
+                try:
+                    value = evaluator_factory().evaluate(mutation)
+                except (KeyError, ValueError) as e:
+                    record.update(rmsd=None, center_of_mass_diff=None,
+                                  status=f"error: {e}")
+                    continue
+                fresh[mutation] = value
+            record.update(rmsd=value[0], center_of_mass_diff=value[1],
+                          status="success")
+        if cache and fresh:
+            cache.put_many(pdb_id, checksum, fresh)
+        yield records
+
+
+def evaluate_stream(rows: Iterable[dict], evaluator_factory,
+                    **kwargs) -> Iterator[dict]:
+    """Flat version of :func:`evaluate_batches`."""
+    for records in evaluate_batches(rows, evaluator_factory, **kwargs):
+        yield from records
@@ -0,0 +1,153 @@
+"""
+Parquet output for batch mutation results.
+
+Rows are buffered and appended to the file as Arrow record batches (one
+row group each), so memory use does not grow with the run. Metrics are
+kept as float64, ``status`` is dictionary-encoded (``STATUS_VALUES``) and
+error messages are kept whole in ``error``. With ``partition=True`` the
+output is a hive-style dataset directory, ``<root>/pdb_id=<ID>/``, that
+accumulates runs for many PDB IDs; rerunning one ID replaces its partition.
+
+pyarrow is imported on first use so CSV-only runs do not need it.
+"""
+import os
+from typing import Optional
+
+STATUS_VALUES = ("success", "residue_not_found", "error")
+# Rows per record batch / row group
+BATCH_ROWS = 4096
+PARTITION_FILE = "results.parquet"
+
+
+def result_schema(extra_columns=(), timing_columns=(),
+                  partition: bool = False):
+    """Arrow schema of a batch result file."""
+    import pyarrow as pa
+
+    fields = [] if partition else [pa.field("pdb_id", pa.string())]
+    fields += [
+        pa.field("residue_number", pa.int32()),
+        pa.field("original", pa.string()),
+        pa.field("mutated", pa.string()),
+    ]
+    fields += [pa.field(name, pa.string()) for name in extra_columns]
+    fields += [
+        pa.field("chain", pa.string()),
+        pa.field("mutation", pa.string()),
+        pa.field("rmsd", pa.float64()),
+        pa.field("com_shift", pa.float64()),
+        pa.field("status", pa.dictionary(pa.int8(), pa.string())),
+        pa.field("error", pa.string()),
+    ]
+    fields += [pa.field(name, pa.float64()) for name in timing_columns]
+    return pa.schema(fields)
+
+
+class ParquetResultWriter:
+    """
+    Streams result rows for one PDB ID to ``path``.
+
+    Batches are written to a hidden temporary file that is renamed into
+    place on ``close()``, so readers never see a half-written file.
+    """
+
+    def __init__(self, path: str, pdb_id: str, extra_columns=(),
+                 timing_columns=(), partition: bool = False,
+                 batch_rows: int = BATCH_ROWS):
+        self.pdb_id = pdb_id
+        self.partition = partition
+        if partition:
+            directory = os.path.join(path, f"pdb_id={pdb_id}")
+            self.path = os.path.join(directory, PARTITION_FILE)
+        else:
+            directory = os.path.dirname(os.path.abspath(path))
+            self.path = path
+        os.makedirs(directory, exist_ok=True)
+        self._tmp_path = os.path.join(
+            directory, f".{os.path.basename(self.path)}.{os.getpid()}"
+        )
+        self.schema = result_schema(extra_columns, timing_columns, partition)
+        self.batch_rows = batch_rows
+        self.rows_written = 0
+        self._columns: dict = {name: [] for name in self.schema.names}
+        self._writer = None
+
+    def write(self, row: dict, timings: Optional[dict] = None) -> None:
+        """Buffer one row (as produced by run_mutation_batch.process_row)."""
+        timings = timings or {}
+        for name, values in self._columns.items():
+            if name == "pdb_id":
+                values.append(self.pdb_id)
+            elif name == "residue_number":
+                values.append(int(row[name]))
+            elif name.endswith("_ms"):
+                values.append(timings.get(name))
+            else:
+                value = row.get(name)
+                values.append(None if value == "" else value)
+        if len(self._columns["residue_number"]) >= self.batch_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append the buffered rows as one record batch."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = self._writer
+        if writer is None:
+            writer = self._writer = pq.ParquetWriter(self._tmp_path,
+                                                     self.schema)
+        if not self._columns["residue_number"]:
+            return
+        batch = pa.RecordBatch.from_pydict(self._columns, schema=self.schema)
+        writer.write_batch(batch)
+        self.rows_written += batch.num_rows
+        for values in self._columns.values():
+            values.clear()
+
+    def close(self) -> None:
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self) -> "ParquetResultWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        elif self._writer is not None:
+            self._writer.close()
+            os.remove(self._tmp_path)
+
+
+def is_parquet(path: str) -> bool:
+    """Whether ``path`` names a Parquet file or a partitioned dataset."""
+    return path.endswith(".parquet") or os.path.isdir(path)
+
+
+def read_results(path: str, columns=None, pdb_id: Optional[str] = None,
+                 status: Optional[str] = None):
+    """
+    Load results as a pandas DataFrame, reading only ``columns`` and only
+    the partitions/row groups that can match ``pdb_id`` and ``status``.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partitioning = None
+    if os.path.isdir(path):
+        # explicit string type: hive inference would turn "1234" into int
+        partitioning = ds.partitioning(
+            pa.schema([("pdb_id", pa.string())]), flavor="hive"
+        )
+    dataset = ds.dataset(path, format="parquet", partitioning=partitioning)
+    predicate = None
+    if pdb_id is not None:
+        predicate = ds.field("pdb_id") == pdb_id.upper()
+    if status is not None:
+        condition = ds.field("status") == status
+        predicate = condition if predicate is None else predicate & condition
+    table = dataset.to_table(columns=columns, filter=predicate)
+    return table.to_pandas()
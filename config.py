@@ -3,8 +3,94 @@ import os
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
 SECRET_KEY = os.getenv('SECRET_KEY', 'replace-this-with-a-secure-key')
-CACHE_DIR = os.path.join(BASE_DIR, 'data', 'cifs')
-OUTPUT_DIR = os.path.join(BASE_DIR, 'outputs')
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(BASE_DIR, 'data', 'cifs'))
+OUTPUT_DIR = os.getenv('OUTPUT_DIR', os.path.join(BASE_DIR, 'outputs'))
+# Where coordinate files are downloaded from; point it at a local
+# stand-in (benchmarks/rcsb_standin.py) for offline load tests
+RCSB_BASE_URL = os.getenv(
+    'RCSB_BASE_URL', 'https://files.rcsb.org/download'
+).rstrip('/')
+
+# UniProt variant retrieval (see variants.py): entries are cached on disk
+# and revalidated with ETag/Last-Modified once older than the TTL
+UNIPROT_BASE_URL = os.getenv(
+    'UNIPROT_BASE_URL', 'https://rest.uniprot.org/uniprotkb'
+).rstrip('/')
+VARIANT_CACHE_DIR = os.getenv(
+    'VARIANT_CACHE_DIR', os.path.join(CACHE_DIR, 'uniprot')
+)
+VARIANT_CACHE_TTL = float(os.getenv('VARIANT_CACHE_TTL', str(7 * 24 * 3600)))
+UNIPROT_MAX_CONCURRENCY = int(os.getenv('UNIPROT_MAX_CONCURRENCY', '4'))
+
+# Sequence alignments behind compare_structures (see alignment.py)
+ALIGNMENT_CACHE_DIR = os.getenv(
+    'ALIGNMENT_CACHE_DIR', os.path.join(CACHE_DIR, 'alignments')
+)
+
+# Mutation result cache (see result_cache.py)
+RESULT_CACHE_PATH = os.getenv(
+    'RESULT_CACHE_PATH', os.path.join(BASE_DIR, 'data', 'results.sqlite')
+)
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '4096'))
+# k-mer index over chain sequences of cached structures
+# (see sequence_index.py)
+SEQUENCE_INDEX_PATH = os.getenv(
+    'SEQUENCE_INDEX_PATH',
+    os.path.join(BASE_DIR, 'data', 'sequence_index.sqlite')
+)
+# Rows evaluated per batch by POST /api/mutation_metrics/<pdb_id>
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', '256'))
+
+# Background plot rendering (see plotting.PlotRenderer); plots of larger
+# structures are downsampled to PLOT_MAX_POINTS points (0 disables)
+PLOT_WORKERS = int(os.getenv('PLOT_WORKERS', '1'))
+PLOT_MAX_POINTS = int(os.getenv('PLOT_MAX_POINTS', '20000'))
+PLOT_WAIT_SECONDS = float(os.getenv('PLOT_WAIT_SECONDS', '30'))
+
+# Admission control (see admission.py): cost units in flight per
+# endpoint, with requests costing 1 + atoms / ADMISSION_ATOMS_PER_UNIT;
+# excess requests queue up to ADMISSION_MAX_WAIT seconds, then get 503
+ADMISSION_LIMITS = os.getenv(
+    'ADMISSION_LIMITS', 'analyze=4,mutation=8,bulk_mutation=2'
+)
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '16'))
+ADMISSION_MAX_WAIT = float(os.getenv('ADMISSION_MAX_WAIT', '10'))
+ADMISSION_ATOMS_PER_UNIT = int(os.getenv('ADMISSION_ATOMS_PER_UNIT', '10000'))
+
+# Background analysis jobs (see jobs.py)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', '32'))
+
+# ASGI serving mode (see asgi.py): concurrent structure downloads on the
+# event loop, Flask views on a bounded thread pool
+ASYNC_CPU_WORKERS = int(os.getenv('ASYNC_CPU_WORKERS', '4'))
+ASYNC_MAX_DOWNLOADS = int(os.getenv('ASYNC_MAX_DOWNLOADS', '32'))
+# Conditional GETs in flight while revalidating the cache (see refresh.py)
+REFRESH_CONCURRENCY = int(os.getenv('REFRESH_CONCURRENCY', '16'))
+
+# Memory-mapped arrays of parsed structures shared by all worker
+# processes (see structure_store.py)
+STRUCTURE_STORE_DIR = os.getenv(
+    'STRUCTURE_STORE_DIR', os.path.join(CACHE_DIR, 'store')
+)
+# Append-only coordinates of all stored structures for corpus-wide
+# metrics (see corpus.py)
+CORPUS_DIR = os.getenv('CORPUS_DIR', os.path.join(CACHE_DIR, 'corpus'))
+
+# Stage timers behind Server-Timing headers, request logs and /metrics
+INSTRUMENTATION = os.getenv('INSTRUMENTATION', '1').lower() in (
+    '1', 'true', 'yes'
+)
+
+# Parse the structures listed in PDB_LIST_PATH when the app is created.
+# Combined with ``gunicorn --preload`` the parsed structures are built once
+# in the master process and shared copy-on-write by the forked workers.
+PRELOAD_STRUCTURES = os.getenv(
+    'PRELOAD_STRUCTURES', ''
+).lower() in ('1', 'true', 'yes')
+PDB_LIST_PATH = os.getenv(
+    'PDB_LIST_PATH', os.path.join(BASE_DIR, 'data', 'pdb_list.txt')
+)
 
 os.makedirs(CACHE_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -0,0 +1,480 @@
+"""
+Append-only, memory-mapped coordinates of every cached structure.
+
+Dataset-wide questions (centre of mass or Cα count of everything, radii
+of gyration, which structures resemble a reference) would otherwise mean
+parsing every file in ``CACHE_DIR``. The corpus keeps the first model of
+each structure in a few flat files under ``CORPUS_DIR``::
+
+    coords.f32     float32 (x, y, z) per atom
+    elements.u1    element code per atom (see _element_table)
+    atoms.i4       residue of each atom, within its structure, with the
+                   CA_FLAG bit set on amino acid Cα atoms
+    residues.bin   RESIDUE_DTYPE record per residue
+    index.bin      INDEX_DTYPE record per structure: PDB ID, checksum and
+                   offsets into the files above
+
+Writers hold an exclusive lock (``flock``, or ``msvcrt.locking`` on
+Windows), append the data and then the index record, so readers (any
+number of processes) never see a structure whose data is incomplete.
+A PDB ID added again supersedes its older record. The metric functions
+memory-map the files and reduce them in chunks of ``CHUNK_ATOMS`` atoms,
+so a corpus larger than RAM is fine.
+"""
+import os
+import sys
+import time
+import argparse
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import numpy as np
+
+import config
+
+CA_FLAG = np.int32(1 << 30)
+CHUNK_ATOMS = 1 << 22
+
+RESIDUE_DTYPE = np.dtype([("chain", "S4"), ("resseq", "<i4"),
+                          ("is_aa", "?")])
+INDEX_DTYPE = np.dtype([
+    ("pdb_id", "S8"), ("checksum", "S64"),
+    ("atom_start", "<i8"), ("n_atoms", "<i8"),
+    ("res_start", "<i8"), ("n_residues", "<i8"),
+])
+_ATOM_FILES = (("coords.f32", np.dtype("<f4"), 3),
+               ("elements.u1", np.dtype("u1"), 1),
+               ("atoms.i4", np.dtype("<i4"), 1))
+_elements: Optional[tuple] = None
+
+
+def _element_table() -> tuple:
+    """
+    ({symbol: code}, mass of each code). Code 0 is any element missing
+    from metrics.ATOMIC_MASSES and weighs 12.0, as there; new elements
+    must be appended to that table, never inserted.
+    """
+    global _elements
+    if _elements is None:
+        from metrics import ATOMIC_MASSES
+
+        codes = {symbol: code + 1
+                 for code, symbol in enumerate(ATOMIC_MASSES)}
+        masses = np.array([12.0] + list(ATOMIC_MASSES.values()))
+        _elements = codes, masses
+    return _elements
+
+
+def element_codes(elements) -> np.ndarray:
+    codes = _element_table()[0]
+    return np.array([codes.get(str(e).upper().strip(), 0)
+                     for e in elements], dtype=np.uint8)
+
+
+@contextmanager
+def _exclusive(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on ``path`` across processes."""
+    with open(path, "a+b") as f:
+        if sys.platform == "win32":
+            import msvcrt
+
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK gives up after about 10 seconds
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+
+class Corpus:
+    """Reader and appender of the corpus in ``root``."""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or config.CORPUS_DIR
+        os.makedirs(self.root, exist_ok=True)
+        self._index_size = -1
+        self._index = np.zeros(0, dtype=INDEX_DTYPE)
+        self._live: dict[str, int] = {}
+        self._maps: dict[str, np.ndarray] = {}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    # -- writing ---------------------------------------------------------
+
+    def add(self, pdb_id: str, checksum: str, coords, elements,
+            atom_residue, ca_mask, res_chain, res_seq,
+            res_is_aa) -> bool:
+        """
+        Append one structure (per-atom and per-residue arrays). Returns
+        False if this checksum is already in the corpus.
+        """
+        n_atoms, n_residues = len(coords), len(res_seq)
+        residues = np.zeros(n_residues, dtype=RESIDUE_DTYPE)
+        residues["chain"] = np.char.encode(
+            np.asarray(res_chain, dtype=str), "ascii")
+        residues["resseq"] = res_seq
+        residues["is_aa"] = res_is_aa
+        atoms = np.asarray(atom_residue, dtype=np.int32) | np.where(
+            ca_mask, CA_FLAG, np.int32(0))
+        data = {
+            "coords.f32": np.asarray(coords, dtype="<f4").reshape(-1, 3),
+            "elements.u1": element_codes(elements),
+            "atoms.i4": atoms.astype("<i4"),
+        }
+
+        with _exclusive(self._path(".lock")):
+            index = np.fromfile(self._path("index.bin"), dtype=INDEX_DTYPE) \
+                if os.path.exists(self._path("index.bin")) \
+                else np.zeros(0, dtype=INDEX_DTYPE)
+            if checksum.encode() in set(index["checksum"].tolist()):
+                return False
+            atom_end = res_end = 0
+            if len(index):
+                atom_end = int((index["atom_start"]
+                                + index["n_atoms"]).max())
+                res_end = int((index["res_start"]
+                               + index["n_residues"]).max())
+            # bytes past the last record are from a writer that died
+            for name, dtype, width in _ATOM_FILES:
+                self._append(name, atom_end * dtype.itemsize * width,
+                             data[name])
+            self._append("residues.bin", res_end * RESIDUE_DTYPE.itemsize,
+                         residues)
+            record = np.array([(pdb_id.upper().encode(), checksum.encode(),
+                                atom_end, n_atoms, res_end, n_residues)],
+                              dtype=INDEX_DTYPE)
+            self._append("index.bin", len(index) * INDEX_DTYPE.itemsize,
+                         record)
+        return True
+
+    def _append(self, name: str, offset: int, values: np.ndarray) -> None:
+        with open(self._path(name), "ab") as f:
+            f.truncate(offset)
+            f.write(values.tobytes())
+
+    def add_arrays(self, arrays) -> None:
+        """StructureStore ``on_add`` hook: append the first model."""
+        first = arrays.res_model == 0
+        residues = np.flatnonzero(first)
+        n_residues = len(residues)
+        atoms = np.flatnonzero(np.isin(arrays.atom_residue, residues)) \
+            if n_residues < len(first) \
+            else np.arange(len(arrays.atom_residue))
+        atom_residue = arrays.atom_residue[atoms]
+        ca_mask = ((arrays.atom_names[atoms] == "CA")
+                   & arrays.res_is_aa[atom_residue])
+        try:
+            self.add(arrays.pdb_id, arrays.meta["checksum"],
+                     arrays.coords[atoms], arrays.elements[atoms],
+                     atom_residue, ca_mask, arrays.res_chain[first],
+                     arrays.res_seq[first], arrays.res_is_aa[first])
+        except OSError as e:
+            # the corpus is an optimisation; never fail the analysis
+            print(f"Warning: could not add {arrays.pdb_id} to corpus: {e}")
+
+    def build(self, cache_dir: str, store, log=print) -> int:
+        """
+        Add every ``.cif``/``.pdb`` file in ``cache_dir`` not in the
+        corpus yet, parsing only those not in ``store``. Returns the
+        number of structures added.
+        """
+        from io_utils import file_checksum
+
+        self.refresh()
+        known = set(self._index["checksum"].tolist())
+        added = 0
+        for name in sorted(os.listdir(cache_dir)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in (".cif", ".pdb"):
+                continue
+            path = os.path.join(cache_dir, name)
+            if file_checksum(path).encode() in known:
+                continue
+            self.refresh()
+            before = len(self._index)
+            try:
+                # a store whose on_add feeds this corpus appends it itself
+                arrays = store.get(path, stem.upper())
+            except Exception as e:
+                log(f"Skipping {name}: {e}")
+                continue
+            self.add_arrays(arrays)
+            self.refresh()
+            added += len(self._index) > before
+        return added
+
+    # -- reading ---------------------------------------------------------
+
+    def refresh(self) -> int:
+        """Pick up structures appended since the last call; returns count."""
+        try:
+            size = os.path.getsize(self._path("index.bin"))
+        except OSError:
+            size = 0
+        size -= size % INDEX_DTYPE.itemsize
+        if size != self._index_size:
+            self._index = np.fromfile(
+                self._path("index.bin"), dtype=INDEX_DTYPE,
+                count=size // INDEX_DTYPE.itemsize,
+            ) if size else np.zeros(0, dtype=INDEX_DTYPE)
+            self._index_size = size
+            self._live = {pdb_id.decode(): i for i, pdb_id
+                          in enumerate(self._index["pdb_id"].tolist())}
+            self._maps = {}
+        return len(self._live)
+
+    def _map(self, name: str, dtype: np.dtype, count: int,
+             width: int = 1) -> np.ndarray:
+        """Read-only view of the first ``count`` records of a file."""
+        mapped = self._maps.get(name)
+        if mapped is None or len(mapped) < count:
+            shape = (count, width) if width > 1 else (count,)
+            mapped = np.memmap(self._path(name), dtype=dtype, mode="r",
+                               shape=shape) if count \
+                else np.zeros((0, width) if width > 1 else 0, dtype=dtype)
+            self._maps[name] = mapped
+        return mapped
+
+    def _atoms_end(self) -> int:
+        index = self._index
+        return int((index["atom_start"] + index["n_atoms"]).max()) \
+            if len(index) else 0
+
+    def coords(self) -> np.ndarray:
+        """(N, 3) float32 coordinates of all atoms, memory-mapped."""
+        self.refresh()
+        return self._map("coords.f32", np.dtype("<f4"), self._atoms_end(), 3)
+
+    def pdb_ids(self) -> list[str]:
+        self.refresh()
+        return sorted(self._live)
+
+    def __contains__(self, pdb_id: str) -> bool:
+        self.refresh()
+        return pdb_id.upper() in self._live
+
+    def __len__(self) -> int:
+        return self.refresh()
+
+    def entry(self, pdb_id: str) -> dict:
+        """Index record of ``pdb_id``; KeyError if absent."""
+        self.refresh()
+        record = self._index[self._live[pdb_id.upper()]]
+        return {
+            "pdb_id": pdb_id.upper(),
+            "checksum": record["checksum"].decode(),
+            "n_atoms": int(record["n_atoms"]),
+            "n_residues": int(record["n_residues"]),
+        }
+
+    def structure(self, pdb_id: str) -> dict:
+        """Arrays of one structure, as views into the corpus files."""
+        self.refresh()
+        record = self._index[self._live[pdb_id.upper()]]
+        atoms = slice(int(record["atom_start"]),
+                      int(record["atom_start"] + record["n_atoms"]))
+        residues = slice(int(record["res_start"]),
+                         int(record["res_start"] + record["n_residues"]))
+        res_end = int((self._index["res_start"]
+                       + self._index["n_residues"]).max())
+        flags = self._map("atoms.i4", np.dtype("<i4"),
+                          self._atoms_end())[atoms]
+        return {
+            "coords": self.coords()[atoms],
+            "elements": self._map("elements.u1", np.dtype("u1"),
+                                  self._atoms_end())[atoms],
+            "atom_residue": flags & ~CA_FLAG,
+            "is_ca": (flags & CA_FLAG) != 0,
+            "residues": self._map("residues.bin", RESIDUE_DTYPE,
+                                  res_end)[residues],
+        }
+
+    def _chunks(self):
+        """
+        Yield (pdb_ids, segment of each atom in a chunk or -1, first
+        atom of the chunk, end atom) over the live structures as of
+        the last refresh.
+        """
+        live = sorted(self._live.items(),
+                      key=lambda item: self._index["atom_start"][item[1]])
+        batch: list = []
+        n_atoms = 0
+        for item in live + [None]:
+            size = 0 if item is None else int(self._index["n_atoms"][item[1]])
+            if batch and (item is None or n_atoms + size > CHUNK_ATOMS):
+                rows = self._index[[i for _, i in batch]]
+                lo = int(rows["atom_start"][0])
+                hi = int((rows["atom_start"] + rows["n_atoms"]).max())
+                segments = np.full(hi - lo, -1, dtype=np.int64)
+                for k, row in enumerate(rows):
+                    start = int(row["atom_start"]) - lo
+                    segments[start:start + int(row["n_atoms"])] = k
+                yield [pdb_id for pdb_id, _ in batch], segments, lo, hi
+                batch, n_atoms = [], 0
+            if item is not None:
+                batch.append(item)
+                n_atoms += size
+
+    def _reduce(self, per_chunk) -> dict:
+        results: dict = {}
+        self.refresh()
+        end = self._atoms_end()
+        coords = self.coords()
+        elements = self._map("elements.u1", np.dtype("u1"), end)
+        flags = self._map("atoms.i4", np.dtype("<i4"), end)
+        for pdb_ids, segments, lo, hi in self._chunks():
+            keep = segments >= 0
+            values = per_chunk(
+                np.asarray(coords[lo:hi], dtype=np.float64)[keep],
+                np.asarray(elements[lo:hi])[keep],
+                np.asarray(flags[lo:hi])[keep],
+                segments[keep], len(pdb_ids),
+            )
+            results.update(zip(pdb_ids, values))
+        return dict(sorted(results.items()))
+
+    # -- corpus-wide metrics ---------------------------------------------
+
+    def centers_of_mass(self) -> dict:
+        """``{pdb_id: mass-weighted centre of mass}`` (NaN if no atoms)."""
+        def chunk(coords, elements, flags, segments, n):
+            return _com(coords, _element_table()[1][elements], segments, n)
+        return self._reduce(chunk)
+
+    def ca_counts(self) -> dict:
+        """``{pdb_id: number of amino acid Cα atoms}``."""
+        def chunk(coords, elements, flags, segments, n):
+            is_ca = (flags & CA_FLAG) != 0
+            return np.bincount(segments[is_ca], minlength=n).tolist()
+        return self._reduce(chunk)
+
+    def radii_of_gyration(self) -> dict:
+        """``{pdb_id: mass-weighted radius of gyration}`` in Å."""
+        def chunk(coords, elements, flags, segments, n):
+            weights = _element_table()[1][elements]
+            com = _com(coords, weights, segments, n)
+            squared = ((coords - com[segments]) ** 2).sum(axis=1)
+            total = np.bincount(segments, weights=weights, minlength=n)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.sqrt(np.bincount(segments, weights=weights
+                                           * squared, minlength=n) / total)
+        return self._reduce(chunk)
+
+    def nearest(self, pdb_id: str, limit: int = 10) -> list[dict]:
+        """
+        Structures most like ``pdb_id`` in size and compactness: ranked
+        by the relative differences of Cα count and radius of gyration.
+        A cheap screen before superposing the candidates.
+        """
+        counts, radii = self.ca_counts(), self.radii_of_gyration()
+        reference = pdb_id.upper()
+        ref_count, ref_radius = counts[reference], radii[reference]
+        ranked = []
+        for other in counts:
+            if other == reference or not np.isfinite(radii[other]):
+                continue
+            distance = float(np.hypot(
+                (counts[other] - ref_count) / max(ref_count, 1),
+                (radii[other] - ref_radius) / max(ref_radius, 1e-6),
+            ))
+            ranked.append({"pdb_id": other, "distance": round(distance, 4),
+                           "ca_count": counts[other],
+                           "radius_of_gyration": round(radii[other], 3)})
+        ranked.sort(key=lambda r: (r["distance"], r["pdb_id"]))
+        return ranked[:limit]
+
+    def stats(self) -> dict:
+        self.refresh()
+        live = [self._index[i] for i in self._live.values()]
+        return {
+            "structures": len(live),
+            "atoms": int(sum(int(r["n_atoms"]) for r in live)),
+            "records": len(self._index),
+            "bytes": sum(os.path.getsize(self._path(name))
+                         for name, _, _ in _ATOM_FILES
+                         if os.path.exists(self._path(name))),
+        }
+
+
+def _com(coords, weights, segments, n) -> np.ndarray:
+    total = np.bincount(segments, weights=weights, minlength=n)
+    sums = np.column_stack([
+        np.bincount(segments, weights=weights * coords[:, axis],
+                    minlength=n)
+        for axis in range(3)
+    ])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / total[:, None]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Dataset-wide queries over all cached structures."
+    )
+    parser.add_argument("--corpus", default=config.CORPUS_DIR,
+                        help="corpus directory (default: CORPUS_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="add cached structures")
+    build.add_argument("--cache-dir", default=config.CACHE_DIR)
+    build.add_argument("--store-dir", default=config.STRUCTURE_STORE_DIR)
+    for name, help_text in (("com", "centre of mass of every structure"),
+                            ("ca", "Cα count of every structure"),
+                            ("rg", "radius of gyration of every structure")):
+        commands.add_parser(name, help=help_text)
+    nearest = commands.add_parser(
+        "nearest", help="structures of similar size and compactness")
+    nearest.add_argument("pdb_id")
+    nearest.add_argument("--limit", type=int, default=10)
+    commands.add_parser("stats", help="corpus size")
+    args = parser.parse_args(argv)
+
+    corpus = Corpus(args.corpus)
+    started = time.perf_counter()
+    if args.command == "build":
+        from structure_store import StructureStore
+
+        added = corpus.build(args.cache_dir, StructureStore(args.store_dir))
+        print(f"Added {added} structures in "
+              f"{time.perf_counter() - started:.1f}s; {corpus.stats()}")
+        return 0
+    if args.command == "stats":
+        print(corpus.stats())
+        return 0
+    if args.command == "nearest":
+        if args.pdb_id.upper() not in corpus:
+            print(f"{args.pdb_id.upper()} is not in the corpus")
+            return 1
+        for row in corpus.nearest(args.pdb_id, args.limit):
+            print(f"{row['pdb_id']}\t{row['distance']:.4f}\t"
+                  f"{row['ca_count']}\t{row['radius_of_gyration']:.3f}")
+        return 0
+
+    values = {"com": corpus.centers_of_mass, "ca": corpus.ca_counts,
+              "rg": corpus.radii_of_gyration}[args.command]()
+    for pdb_id, value in values.items():
+        if args.command == "com":
+            value = "\t".join(f"{v:.3f}" for v in value)
+        elif args.command == "rg":
+            value = f"{value:.3f}"
+        print(f"{pdb_id}\t{value}")
+    print(f"{len(values)} structures in "
+          f"{(time.perf_counter() - started) * 1000:.1f} ms",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
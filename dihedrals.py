@@ -0,0 +1,184 @@
+"""Vectorized backbone and side-chain dihedral angles."""
+import numpy as np
+from Bio.PDB import is_aa
+
+# Same C–N cut-off as Bio.PDB.PPBuilder
+PEPTIDE_BOND_CUTOFF = 1.8
+
+# Atom completing the chi1 torsion N-CA-CB-X for each residue type
+CHI1_GAMMA_ATOMS = {
+    "ARG": "CG", "ASN": "CG", "ASP": "CG", "CYS": "SG", "GLN": "CG",
+    "GLU": "CG", "HIS": "CG", "ILE": "CG1", "LEU": "CG", "LYS": "CG",
+    "MET": "CG", "PHE": "CG", "PRO": "CG", "SER": "OG", "THR": "OG1",
+    "TRP": "CG", "TYR": "CG", "VAL": "CG1",
+}
+
+
+def dihedral_angles(p0: np.ndarray, p1: np.ndarray,
+                    p2: np.ndarray, p3: np.ndarray) -> np.ndarray:
+    """
+    Dihedral angles in degrees for stacked (N, 3) point arrays.
+    Rows containing NaN coordinates give NaN.
+    """
+    b0 = p0 - p1
+    b1 = p2 - p1
+    b2 = p3 - p2
+    b1_norm = np.linalg.norm(b1, axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        b1_unit = b1 / b1_norm
+    v = b0 - np.sum(b0 * b1_unit, axis=1, keepdims=True) * b1_unit
+    w = b2 - np.sum(b2 * b1_unit, axis=1, keepdims=True) * b1_unit
+    x = np.sum(v * w, axis=1)
+    y = np.sum(np.cross(b1_unit, v) * w, axis=1)
+    return np.degrees(np.arctan2(y, x))
+
+
+def _disordered_link(c_atom, n_atom, cutoff: float) -> bool:
+    """PPBuilder's altloc-aware C–N test, used only for disordered atoms."""
+    clist = (c_atom.disordered_get_list()
+             if c_atom.is_disordered() else [c_atom])
+    nlist = (n_atom.disordered_get_list()
+             if n_atom.is_disordered() else [n_atom])
+    for nn in nlist:
+        for cc in clist:
+            n_alt, c_alt = nn.get_altloc(), cc.get_altloc()
+            if n_alt == c_alt or n_alt == " " or c_alt == " ":
+                if (nn - cc) < cutoff:
+                    return True
+    return False
+
+
+def backbone_arrays(structure, chi1: bool = False,
+                    cutoff: float = PEPTIDE_BOND_CUTOFF) -> dict:
+    """
+    Flatten every residue of every model/chain into coordinate arrays.
+
+    Returns a dict with ``n``, ``ca``, ``c`` (and ``cb``/``gamma`` when
+    ``chi1`` is set) as (R, 3) float64 arrays holding NaN for missing
+    atoms, ``chain``, ``resseq`` and ``accepted`` (standard amino acid)
+    per residue, and ``links`` of length R - 1 that is True where
+    residue i is peptide-bonded to residue i + 1.
+    """
+    residues = [res for model in structure
+                for chain in model for res in chain]
+    count = len(residues)
+    names = ("N", "CA", "C", "CB") if chi1 else ("N", "CA", "C")
+    coords = np.full((len(names) + int(chi1), count, 3), np.nan)
+    accepted = np.zeros(count, dtype=bool)
+    chain_start = np.zeros(count, dtype=bool)
+    chain_ids = np.empty(count, dtype=object)
+    resseq = np.zeros(count, dtype=np.int64)
+    disordered = []
+
+    prev_chain = None
+    for i, res in enumerate(residues):
+        chain = res.get_parent()
+        if chain is not prev_chain:
+            chain_start[i] = True
+            prev_chain = chain
+        chain_ids[i] = chain.id
+        resseq[i] = res.id[1]
+        if not is_aa(res, standard=True):
+            continue
+        accepted[i] = True
+        atoms = res.child_dict
+        for j, name in enumerate(names):
+            atom = atoms.get(name)
+            if atom is not None:
+                coords[j, i] = atom.get_coord()
+                if atom.is_disordered() and name in ("N", "C"):
+                    disordered.append(i)
+        if chi1:
+            gamma = atoms.get(CHI1_GAMMA_ATOMS.get(res.get_resname(), ""))
+            if gamma is not None:
+                coords[-1, i] = gamma.get_coord()
+
+    arrays = {
+        "n": coords[0],
+        "ca": coords[1],
+        "c": coords[2],
+        "accepted": accepted,
+        "chain": chain_ids,
+        "resseq": resseq,
+    }
+    arrays["links"] = _peptide_links(
+        arrays, chain_start, residues, sorted(set(disordered)), cutoff
+    )
+    if chi1:
+        arrays["cb"] = coords[3]
+        arrays["gamma"] = coords[4]
+    return arrays
+
+
+def _peptide_links(arrays: dict, chain_start: np.ndarray, residues: list,
+                   disordered: list, cutoff: float) -> np.ndarray:
+    """Peptide-bond flags between consecutive residues (PRIVATE)."""
+    accepted = arrays["accepted"]
+    if len(accepted) < 2:
+        return np.zeros(0, dtype=bool)
+    dist = np.linalg.norm(arrays["c"][:-1] - arrays["n"][1:], axis=1)
+    with np.errstate(invalid="ignore"):
+        links = dist < cutoff
+    links &= accepted[:-1] & accepted[1:] & ~chain_start[1:]
+
+    for i in disordered:
+        for j in (i - 1, i):
+            if j < 0 or j + 1 >= len(residues) or chain_start[j + 1]:
+                continue
+            if not (accepted[j] and accepted[j + 1]):
+                continue
+            c_atom = residues[j].child_dict.get("C")
+            n_atom = residues[j + 1].child_dict.get("N")
+            if c_atom is not None and n_atom is not None:
+                links[j] = _disordered_link(c_atom, n_atom, cutoff)
+    return links
+
+
+def compute_backbone_dihedrals(structure, omega: bool = False,
+                               chi1: bool = False,
+                               cutoff: float = PEPTIDE_BOND_CUTOFF) -> dict:
+    """
+    Compute phi/psi (optionally omega and chi1) for every residue in one
+    vectorized pass. Angles are in degrees; NaN marks undefined angles
+    (chain ends, peptide breaks, missing atoms, non-amino acids).
+    omega[i] is the CA(i)-C(i)-N(i+1)-CA(i+1) torsion.
+    """
+    arrays = backbone_arrays(structure, chi1=chi1, cutoff=cutoff)
+    return dihedrals_from_arrays(arrays, omega=omega, chi1=chi1)
+
+
+def dihedrals_from_arrays(arrays: dict, omega: bool = False,
+                          chi1: bool = False) -> dict:
+    """compute_backbone_dihedrals on precomputed backbone_arrays output."""
+    count = len(arrays["accepted"])
+    n, ca, c = arrays["n"], arrays["ca"], arrays["c"]
+    links = arrays["links"]
+
+    phi = np.full(count, np.nan)
+    psi = np.full(count, np.nan)
+    if count > 1:
+        phi[1:] = np.where(
+            links, dihedral_angles(c[:-1], n[1:], ca[1:], c[1:]), np.nan
+        )
+        psi[:-1] = np.where(
+            links, dihedral_angles(n[:-1], ca[:-1], c[:-1], n[1:]), np.nan
+        )
+
+    result = {
+        "chain": arrays["chain"],
+        "resseq": arrays["resseq"],
+        "phi": phi,
+        "psi": psi,
+    }
+    if omega:
+        om = np.full(count, np.nan)
+        if count > 1:
+            om[:-1] = np.where(
+                links, dihedral_angles(ca[:-1], c[:-1], n[1:], ca[1:]),
+                np.nan,
+            )
+        result["omega"] = om
+    if chi1:
+        result["chi1"] = dihedral_angles(n, ca, arrays["cb"],
+                                         arrays["gamma"])
+    return result
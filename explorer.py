@@ -1,5 +1,5 @@
 """Utility wrappers for Protein Explorer."""
-import requests
+import numpy as np
 from io_utils import (
     download_cif,
     download_pdb,
@@ -14,12 +14,17 @@ from metrics import (
 )
 from plotting import plot_ca_scatter, plot_ramachandran
 from mutation import model_mutation
+from dihedrals import compute_backbone_dihedrals, dihedrals_from_arrays
+from structure_store import StructureArrays
+from instrumentation import timed
 
 from Bio.PDB import PPBuilder, is_aa
-from math import degrees
 
 
+@timed("count_residues")
 def count_residues(structure) -> tuple[int, dict]:
+    if isinstance(structure, StructureArrays):
+        return _count_residue_arrays(structure)
     chain_counts = {}
     total = 0
     for model in structure:
@@ -30,7 +35,26 @@ def count_residues(structure) -> tuple[int, dict]:
     return total, chain_counts
 
 
+def _count_residue_arrays(structure: StructureArrays) -> tuple[int, dict]:
+    """count_residues over StructureArrays, one group per model chain."""
+    model, chain = structure.res_model, structure.res_chain
+    if not len(model):
+        return 0, {}
+    starts = np.flatnonzero(np.r_[
+        True, (model[1:] != model[:-1]) | (chain[1:] != chain[:-1])
+    ])
+    counts = np.add.reduceat(structure.res_is_aa.astype(np.int64), starts)
+    # later models overwrite earlier ones, as in the loop above
+    chain_counts = {
+        str(chain[start]): int(count) for start, count in zip(starts, counts)
+    }
+    return int(structure.res_is_aa.sum()), chain_counts
+
+
+@timed("sequences")
 def get_chain_sequences(structure) -> dict:
+    if isinstance(structure, StructureArrays):
+        return dict(structure.sequences)
     ppb = PPBuilder()
     seq_dict = {}
     for model in structure:
@@ -41,28 +65,28 @@ def get_chain_sequences(structure) -> dict:
     return seq_dict
 
 
+@timed("ca_coords")
 def get_ca_coordinates(structure) -> list:
+    if isinstance(structure, StructureArrays):
+        return structure.coords[structure.atom_names == "CA"].tolist()
     return [atom.get_coord().tolist()
             for atom in structure.get_atoms() if atom.get_id() == "CA"]
 
 
+@timed("phi_psi")
 def get_phi_psi(structure) -> list:
     """
-    FIX: Changed condition from 'if phi and
-    psi:' to 'if phi is not None and psi is not None:'
-    to correctly handle zero-degree
-    angles (which are valid but evaluate to False)
+    Return (phi, psi) pairs in degrees for every residue that has both
+    angles, in chain order. Uses the vectorized backbone pass from
+    dihedrals.py; peptides are split on C–N distance like PPBuilder.
     """
-    angles = []
-    ppb = PPBuilder()
-    for model in structure:
-        for chain in model:
-            for pp in ppb.build_peptides(chain):
-                for phi, psi in pp.get_phi_psi_list():
-                    # FIX: Properly check for None instead of truthiness
-                    if phi is not None and psi is not None:
-                        angles.append((degrees(phi), degrees(psi)))
-    return angles
+    if isinstance(structure, StructureArrays):
+        dihedrals = dihedrals_from_arrays(structure.backbone)
+    else:
+        dihedrals = compute_backbone_dihedrals(structure)
+    phi, psi = dihedrals["phi"], dihedrals["psi"]
+    mask = ~np.isnan(phi) & ~np.isnan(psi)
+    return list(zip(phi[mask].tolist(), psi[mask].tolist()))
 
 
 __all__ = [
@@ -81,38 +105,18 @@ __all__ = [
     "get_chain_sequences",
     "get_ca_coordinates",
     "get_phi_psi",
+    "compute_backbone_dihedrals",
 ]
 
 
 def fetch_uniprot_variants(accession: str) -> list:
     """
-    Fetch variant data from UniProt REST API for a given accession.
-    Returns list of dicts with key 'position'.
-
-    FIX: Added try-except block for robust error handling
+    Natural variants of a UniProt accession as dicts with 'position',
+    'original', 'mutated' and 'id'. Served from the on-disk variant
+    cache when possible (see variants.fetch_variants); an empty list if
+    the entry cannot be fetched.
     """
-    url = f"https://rest.uniprot.org/uniprotkb/{accession}.json"
-
-    try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-
-        data = resp.json()
-        variants = []
-        for feature in data.get("features", []):
-            loc = feature.get("location", {})
-            pos = loc.get("start")
-            if isinstance(pos, int):
-                variants.append({"position": pos})
-        return variants
-
-    except requests.exceptions.RequestException as e:
-        # FIX: Handle network errors gracefully
-        print(f"Warning: Failed to fetch "
-              f"UniProt variants for {accession}: {e}")
-        return []
-    except (KeyError, ValueError) as e:
-        # FIX: Handle JSON parsing errors
-        print(f"Warning: Failed to parse "
-              f"UniProt response for {accession}: {e}")
-        return []
+    from variants import fetch_variants
+
+    record = fetch_variants([accession]).get(accession.strip().upper())
+    return record["variants"] if record else []
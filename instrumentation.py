@@ -0,0 +1,192 @@
+"""
+Lightweight stage timing for requests and batch code.
+
+``@timed("parse")`` or ``with timer("parse"):`` records how long a stage
+took into a process-wide latency histogram and, inside a request started
+with :func:`start_request`, into that request's timings, which the web app
+turns into ``Server-Timing`` headers and log lines. Stages may nest
+(``mutate`` includes the ``parse`` it triggers). Set ``enabled = False``
+to skip all recording.
+"""
+import time
+import threading
+import functools
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Iterator, Optional
+
+enabled = True
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    pairs = ",".join(f'{n}="{v}"' for n, v in zip(names, values))
+    return "{" + pairs + "}" if pairs else ""
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram keyed by one label."""
+
+    def __init__(self, name: str, help_text: str, label: str,
+                 buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.buckets = buckets
+        # label value -> [bucket counts..., +Inf count, sum]
+        self._series: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: str, seconds: float) -> None:
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(value)
+            if series is None:
+                series = self._series[value] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}",
+                 f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for value in sorted(series):
+            counts = series[value]
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                labels = _labels((self.label, "le"), (value, bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels((self.label,), (value,))
+            lines.append(f"{self.name}_sum{labels} {counts[-1]:.6f}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Prometheus-style counter keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, labels: tuple):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def value(self, *values: str) -> float:
+        with self._lock:
+            return self._values.get(values, 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}",
+                 f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for key in sorted(values):
+            lines.append(
+                f"{self.name}{_labels(self.labels, key)} {values[key]:g}"
+            )
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "protein_explorer_stage_duration_seconds",
+    "Time spent in instrumented stages (download, parse, metrics, ...).",
+    "stage",
+)
+REQUEST_SECONDS = Histogram(
+    "protein_explorer_request_duration_seconds",
+    "HTTP request latency by endpoint.",
+    "endpoint",
+)
+CACHE_LOOKUPS = Counter(
+    "protein_explorer_cache_lookups_total",
+    "Cache lookups by cache and result (hit or miss).",
+    ("cache", "result"),
+)
+
+# stage -> [total seconds, calls] for the request being handled
+_request_timings: ContextVar[Optional[dict]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def record(stage: str, seconds: float) -> None:
+    """Add one measurement of ``stage``."""
+    if not enabled:
+        return
+    STAGE_SECONDS.observe(stage, seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        entry = timings.get(stage)
+        if entry is None:
+            timings[stage] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+
+def count_cache(cache: str, hit: bool) -> None:
+    if enabled:
+        CACHE_LOOKUPS.inc(cache, "hit" if hit else "miss")
+
+
+@contextmanager
+def timer(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def timed(stage: str):
+    """Decorator recording every call of the function as ``stage``."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def start_request() -> Token:
+    """Collect stage timings of the current request/context."""
+    return _request_timings.set({})
+
+
+def end_request(token: Token) -> dict:
+    """Stop collecting; returns {stage: (seconds, calls)}."""
+    timings = _request_timings.get() or {}
+    _request_timings.reset(token)
+    return {stage: (entry[0], entry[1]) for stage, entry in timings.items()}
+
+
+def server_timing(timings: dict, total: Optional[float] = None) -> str:
+    """Format request timings as a Server-Timing header value (ms)."""
+    parts = [f"{stage};dur={seconds * 1000:.1f}"
+             for stage, (seconds, _) in timings.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def render_metrics(extra: Optional[list] = None) -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = (STAGE_SECONDS.render() + REQUEST_SECONDS.render()
+             + CACHE_LOOKUPS.render() + (extra or []))
+    return "\n".join(lines) + "\n"
@@ -1,25 +1,41 @@
 import os
 import gzip
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from Bio.PDB import PDBParser, MMCIFParser
+import json
+import hashlib
+import threading
 from typing import Union
-from config import CACHE_DIR
+from config import CACHE_DIR, RCSB_BASE_URL
+from instrumentation import timed
 
+# requests and Bio.PDB are imported on first use: they dominate the
+# import time of every module (and web worker) that needs only checksums.
+
+# Statuses retried by the download sessions, sync and async
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Upstream response headers kept next to each cached file for
+# conditional revalidation (see refresh.py)
+VALIDATOR_HEADERS = {"etag": "ETag", "last_modified": "Last-Modified"}
+
+
+def _get_session(pool_size: int = 10):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 
-def _get_session() -> requests.Session:
     session = requests.Session()
     retries = Retry(
         total=5,
         backoff_factor=1,
-        status_forcelist=[429, 500, 502, 503, 504],
+        status_forcelist=list(RETRY_STATUSES),
         allowed_methods=["GET"],
     )
-    session.mount("https://", HTTPAdapter(max_retries=retries))
+    adapter = HTTPAdapter(max_retries=retries, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
     return session
 
 
+@timed("download")
 def download_cif(pdb_id: str, out_dir: str) -> str:
     pdb_id = pdb_id.upper()
     cache_cif = os.path.join(CACHE_DIR, f"{pdb_id}.cif")
@@ -28,7 +44,7 @@ def download_cif(pdb_id: str, out_dir: str) -> str:
         return cache_cif
 
     session = _get_session()
-    url = f"https://files.rcsb.org/download/{pdb_id}.cif"
+    url = f"{RCSB_BASE_URL}/{pdb_id}.cif"
     resp = session.get(url, timeout=30)
     resp.raise_for_status()
 
@@ -38,11 +54,13 @@ def download_cif(pdb_id: str, out_dir: str) -> str:
         f.write(resp.content)
     with open(cache_cif, "wb") as f:
         f.write(resp.content)
+    store_validators(cache_cif, resp.headers)
     with gzip.open(cache_gz, "wb") as gz:
         gz.write(resp.content)
     return out_cif
 
 
+@timed("download")
 def download_pdb(pdb_id: str, out_dir: str) -> str:
     pdb_id = pdb_id.upper()
     cache_pdb = os.path.join(CACHE_DIR, f"{pdb_id}.pdb")
@@ -50,7 +68,7 @@ def download_pdb(pdb_id: str, out_dir: str) -> str:
         return cache_pdb
 
     session = _get_session()
-    url = f"https://files.rcsb.org/download/{pdb_id}.pdb"
+    url = f"{RCSB_BASE_URL}/{pdb_id}.pdb"
     resp = session.get(url, timeout=30)
     resp.raise_for_status()
 
@@ -60,9 +78,157 @@ def download_pdb(pdb_id: str, out_dir: str) -> str:
         f.write(resp.content)
     with open(cache_pdb, "wb") as f:
         f.write(resp.content)
+    store_validators(cache_pdb, resp.headers)
     return out_pdb
 
 
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def validators_path(cache_path: str) -> str:
+    return cache_path + ".validators.json"
+
+
+def read_validators(cache_path: str) -> dict:
+    """ETag/Last-Modified stored for a cached file; {} if none."""
+    try:
+        with open(validators_path(cache_path), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def store_validators(cache_path: str, headers) -> None:
+    """Keep the validators among upstream response ``headers``."""
+    validators = {key: headers[name]
+                  for key, name in VALIDATOR_HEADERS.items()
+                  if headers.get(name)}
+    _write_atomic(validators_path(cache_path),
+                  json.dumps(validators).encode())
+
+
+def _store_cif(pdb_id: str, content: bytes, headers=None) -> str:
+    """Cache a downloaded mmCIF file the way download_cif does."""
+    cache_cif = os.path.join(CACHE_DIR, f"{pdb_id}.cif")
+    _write_atomic(cache_cif, content)
+    store_validators(cache_cif, headers or {})
+    # written last: download_cif treats the pair as a cache hit
+    _write_atomic(cache_cif + ".gz", gzip.compress(content))
+    return cache_cif
+
+
+def _store_pdb(pdb_id: str, content: bytes, headers=None) -> str:
+    cache_pdb = os.path.join(CACHE_DIR, f"{pdb_id}.pdb")
+    _write_atomic(cache_pdb, content)
+    store_validators(cache_pdb, headers or {})
+    return cache_pdb
+
+
+async def _get_async(client, url: str, retries: int = 5,
+                     backoff: float = 1.0, headers=None):
+    """
+    GET with the retry policy of ``_get_session``, awaiting backoffs.
+    Returns the response, which is 2xx or a 304 to conditional
+    ``headers``.
+    """
+    import asyncio
+    import httpx
+
+    for attempt in range(retries + 1):
+        try:
+            resp = await client.get(url, headers=headers)
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+        else:
+            if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                if resp.status_code != 304:
+                    resp.raise_for_status()
+                return resp
+        await asyncio.sleep(backoff * 2 ** attempt)
+    raise AssertionError("unreachable")
+
+
+async def fetch_structure_async(pdb_id: str, client,
+                                backoff: float = 1.0) -> str:
+    """
+    Download ``pdb_id`` into CACHE_DIR with an ``httpx.AsyncClient``,
+    mmCIF first and PDB as fallback, exactly where download_cif and
+    download_pdb look for it, so a later prepare_structure finds it
+    without network I/O. Returns the cached path. Raises
+    ``httpx.HTTPError`` if neither format can be fetched.
+    """
+    import asyncio
+    import httpx
+
+    pdb_id = pdb_id.upper()
+    cache_cif = os.path.join(CACHE_DIR, f"{pdb_id}.cif")
+    cache_pdb = os.path.join(CACHE_DIR, f"{pdb_id}.pdb")
+    if os.path.exists(cache_cif) and os.path.exists(cache_cif + ".gz"):
+        return cache_cif
+    try:
+        resp = await _get_async(
+            client, f"{RCSB_BASE_URL}/{pdb_id}.cif", backoff=backoff)
+    except httpx.HTTPError:
+        if os.path.exists(cache_pdb):
+            return cache_pdb
+        resp = await _get_async(
+            client, f"{RCSB_BASE_URL}/{pdb_id}.pdb", backoff=backoff)
+        return await asyncio.to_thread(_store_pdb, pdb_id, resp.content,
+                                       resp.headers)
+    # compressing a large file would stall the event loop
+    return await asyncio.to_thread(_store_cif, pdb_id, resp.content,
+                                   resp.headers)
+
+
+def cached_path(pdb_id: str):
+    """Cached file of ``pdb_id`` as download_structure finds it, or None."""
+    pdb_id = pdb_id.upper()
+    cache_cif = os.path.join(CACHE_DIR, f"{pdb_id}.cif")
+    if os.path.exists(cache_cif) and os.path.exists(cache_cif + ".gz"):
+        return cache_cif
+    cache_pdb = os.path.join(CACHE_DIR, f"{pdb_id}.pdb")
+    return cache_pdb if os.path.exists(cache_pdb) else None
+
+
+async def revalidate_async(pdb_id: str, client,
+                           backoff: float = 1.0) -> tuple:
+    """
+    Check the cached file of ``pdb_id`` with a conditional GET and
+    replace it if upstream has a different version. Returns
+    ("missing" | "unchanged" | "updated", checksum of the replaced file
+    or None). Raises ``httpx.HTTPError`` if the check fails.
+    """
+    import asyncio
+
+    pdb_id = pdb_id.upper()
+    path = cached_path(pdb_id)
+    if path is None:
+        return "missing", None
+    validators = read_validators(path)
+    headers = {name: validators[key]
+               for key, name in (("etag", "If-None-Match"),
+                                 ("last_modified", "If-Modified-Since"))
+               if validators.get(key)}
+    ext = os.path.splitext(path)[1]
+    resp = await _get_async(client, f"{RCSB_BASE_URL}/{pdb_id}{ext}",
+                            backoff=backoff, headers=headers)
+    if resp.status_code == 304:
+        return "unchanged", None
+    old_checksum = await asyncio.to_thread(file_checksum, path)
+    if hashlib.sha256(resp.content).hexdigest() == old_checksum:
+        # no validators stored yet, or upstream changed only those
+        await asyncio.to_thread(store_validators, path, resp.headers)
+        return "unchanged", None
+    store = _store_cif if ext == ".cif" else _store_pdb
+    await asyncio.to_thread(store, pdb_id, resp.content, resp.headers)
+    return "updated", old_checksum
+
+
 def download_structure(pdb_id: str, out_dir: str):
     try:
         cif_path = download_cif(pdb_id, out_dir)
@@ -75,7 +241,10 @@ def download_structure(pdb_id: str, out_dir: str):
         return os.path.basename(pdb_path), "pdb"
 
 
+@timed("parse")
 def parse_structure(path: str):
+    from Bio.PDB import PDBParser, MMCIFParser
+
     ext = os.path.splitext(path)[1].lower()
     parser: Union[PDBParser, MMCIFParser]
     if ext == ".pdb":
@@ -85,3 +254,31 @@ def parse_structure(path: str):
     else:
         raise ValueError(f"Unsupported format: {ext}")
     return parser.get_structure(os.path.basename(path), path)
+
+
+# {absolute path: (mtime_ns, size, SHA-256)}; one entry per file
+_CHECKSUMS: dict = {}
+_CHECKSUMS_LOCK = threading.Lock()
+
+
+def file_checksum(path: str) -> str:
+    """
+    SHA-256 of a file's content. Memoised per path on (mtime, size) so
+    repeated lookups of an unchanged file only cost a stat call; a
+    changed file replaces its entry.
+    """
+    st = os.stat(path)
+    path = os.path.abspath(path)
+    version = (st.st_mtime_ns, st.st_size)
+    with _CHECKSUMS_LOCK:
+        entry = _CHECKSUMS.get(path)
+    if entry is not None and entry[:2] == version:
+        return entry[2]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    with _CHECKSUMS_LOCK:
+        _CHECKSUMS[path] = (*version, digest)
+    return digest
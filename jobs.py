@@ -0,0 +1,218 @@
+"""Bounded background job queue for long-running analyses."""
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are already waiting to run."""
+
+
+def discard_jobs(store_dir: str, match: Callable[[tuple], bool]) -> int:
+    """
+    Delete the stored jobs whose arguments satisfy ``match``, so their
+    next submission runs again. Returns the number deleted.
+    """
+    try:
+        names = os.listdir(store_dir)
+    except OSError:
+        return 0
+    discarded = 0
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(store_dir, name)
+        try:
+            with open(path, encoding="utf-8") as f:
+                args = tuple(json.load(f).get("args", ()))
+            if match(args):
+                os.remove(path)
+                discarded += 1
+        except (OSError, ValueError):
+            continue
+    return discarded
+
+
+class Job:
+    def __init__(self, job_id: str, args: tuple):
+        self.id = job_id
+        self.args = args
+        self.status = QUEUED
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.finished: Optional[float] = None
+
+    @property
+    def pending(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    Run ``func(*args)`` on a fixed-size thread pool.
+
+    Job IDs are derived from the arguments, so submitting the same work
+    while it is queued, running or finished returns the existing job.
+    Every state change is written as JSON to ``store_dir``, so any worker
+    process sharing it can report a job another one accepted; finished
+    results are reloaded from there once evicted from memory. Failed
+    jobs, and queued or running ones whose record has not changed for
+    ``stale_after`` seconds (their worker died), are run again on the
+    next submission.
+    """
+
+    def __init__(self, func: Callable[..., dict], store_dir: str,
+                 max_workers: int = 2, max_pending: int = 32,
+                 max_jobs: int = 256, stale_after: float = 3600.0):
+        self.func = func
+        self.store_dir = store_dir
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self.stale_after = stale_after
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job"
+        )
+        os.makedirs(store_dir, exist_ok=True)
+
+    @staticmethod
+    def job_id(*args) -> str:
+        key = json.dumps(args, sort_keys=True, default=str)
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+    def _result_path(self, job_id: str) -> str:
+        return os.path.join(self.store_dir, f"{job_id}.json")
+
+    def _save(self, job: Job) -> None:
+        path = self._result_path(job.id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"args": job.args, "status": job.status,
+                 "result": job.result, "error": job.error,
+                 "submitted": job.submitted, "finished": job.finished,
+                 "updated": time.time()},
+                f,
+            )
+        os.replace(tmp_path, path)
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        try:
+            with open(self._result_path(job_id), encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        job = Job(job_id, tuple(stored.get("args", ())))
+        # records without a status predate state tracking: all finished
+        job.status = stored.get("status", DONE)
+        job.result = stored.get("result")
+        job.error = stored.get("error")
+        job.submitted = stored.get("submitted", job.submitted)
+        job.finished = stored.get("finished")
+        if job.pending and time.time() - stored.get(
+                "updated", 0) > self.stale_after:
+            job.status = FAILED
+            job.error = "job was abandoned by its worker"
+        return job
+
+    def _evict(self) -> None:
+        """Drop the oldest finished jobs beyond ``max_jobs`` (locked)."""
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if not self._jobs[job_id].pending:
+                del self._jobs[job_id]
+                excess -= 1
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.pending)
+
+    def _cached(self, job_id: str) -> Optional[Job]:
+        """
+        In-memory job (locked), unless it finished and its record was
+        discarded since, e.g. by discard_jobs in another process.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None and job.status == DONE \
+                and not os.path.exists(self._result_path(job_id)):
+            del self._jobs[job_id]
+            return None
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Job by ID, from memory or as another process last saved it."""
+        with self._lock:
+            job = self._cached(job_id)
+        if job is None:
+            job = self._load(job_id)
+        return job
+
+    def submit(self, *args) -> Job:
+        job_id = self.job_id(*args)
+        with self._lock:
+            job = self._cached(job_id)
+            if job is not None and job.status != FAILED:
+                return job
+            if job is None:
+                job = self._load(job_id)
+                if job is not None and job.status == DONE:
+                    self._jobs[job_id] = job
+                    return job
+                if job is not None and job.pending:
+                    # running in another process; not cached here, so
+                    # get() keeps reading its progress from disk
+                    return job
+            if sum(1 for j in self._jobs.values()
+                   if j.pending) >= self.max_pending:
+                raise QueueFullError(
+                    f"{self.max_pending} jobs already pending"
+                )
+            job = Job(job_id, args)
+            self._jobs[job_id] = job
+            self._jobs.move_to_end(job_id)
+            self._evict()
+            self._save(job)
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job: Job) -> None:
+        job.status = RUNNING
+        try:
+            self._save(job)
+            result = self.func(*job.args)
+            job.result = result
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        job.finished = time.time()
+        try:
+            self._save(job)
+        except OSError as e:
+            job.result = None
+            job.error = str(e)
+            job.status = FAILED
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
@@ -3,6 +3,8 @@ import copy
 import numpy as np
 from Bio.PDB import Superimposer, is_aa
 from io_utils import parse_structure
+from instrumentation import timed
+from structure_store import StructureArrays
 
 # FIX: Added atomic mass lookup table for mass-weighted COM
 ATOMIC_MASSES = {
@@ -23,10 +25,18 @@ def get_atomic_mass(element: str) -> float:
     return ATOMIC_MASSES.get(element_upper, 12.0)
 
 
+@timed("center_of_mass")
 def compute_center_of_mass(structure) -> np.ndarray:
     """
-    Compute mass-weighted center of mass.
+    Compute mass-weighted center of mass of a parsed structure or of
+    StructureArrays from the shared structure store.
     """
+    if isinstance(structure, StructureArrays):
+        if not len(structure.masses):
+            return np.array([np.nan, np.nan, np.nan])
+        return np.average(structure.coords, axis=0,
+                          weights=structure.masses)
+
     coords_list: list[np.ndarray] = []
     masses_list: list[float] = []
 
@@ -45,51 +55,53 @@ def compute_center_of_mass(structure) -> np.ndarray:
     return com
 
 
-def compare_structures(path1: str, path2: str, out_dir: str) -> float:
-    """
-    FIX: Use deep copy to avoid
-    mutating original structure during superposition
-    """
-    struct1 = parse_structure(path1)
-    struct2 = parse_structure(path2)
+def superposition_rmsd(coords1: np.ndarray, coords2: np.ndarray) -> float:
+    """RMSD of two (N, 3) coordinate arrays after optimal superposition."""
+    centered1 = coords1 - coords1.mean(axis=0)
+    centered2 = coords2 - coords2.mean(axis=0)
+    # Kabsch: the singular values give the optimal rotation's overlap
+    u, singular, vt = np.linalg.svd(centered2.T @ centered1)
+    if np.linalg.det(u) * np.linalg.det(vt) < 0:
+        singular[-1] = -singular[-1]
+    squared = ((centered1 ** 2).sum() + (centered2 ** 2).sum()
+               - 2 * singular.sum())
+    return float(np.sqrt(max(squared, 0.0) / len(coords1)))
 
-    model1 = next(struct1.get_models())
-    # FIX: Create a deep copy to prevent mutation of original structure
-    model2 = copy.deepcopy(next(struct2.get_models()))
 
-    ca1, ca2 = [], []
-    for chain1 in model1:
-        if chain1.id not in model2:
-            continue
-        chain2 = model2[chain1.id]
-        for res1 in chain1:
-            if not is_aa(res1) or "CA" not in res1:
-                continue
-            res_id = res1.id
-            if res_id not in chain2 or "CA" not in chain2[res_id]:
-                continue
-            ca1.append(res1["CA"])
-            ca2.append(chain2[res_id]["CA"])
+@timed("superpose")
+def compare_structures(path1: str, path2: str, out_dir: str,
+                       cache=None, store=None) -> float:
+    """
+    Cα RMSD of two structures after superposition. Residues are paired
+    by aligning chain sequences (alignment.residue_correspondence), so
+    homologs and differently numbered entries compare meaningfully;
+    ``cache`` is the AlignmentCache to use. With a
+    structure_store.StructureStore the chains come from its arrays
+    instead of parsing the files. 0.0 if no chains pair up.
+    """
+    from alignment import residue_correspondence
 
-    if not ca1:
+    id1 = os.path.splitext(os.path.basename(path1))[0]
+    id2 = os.path.splitext(os.path.basename(path2))[0]
+    if store is not None:
+        structure1, structure2 = store.get(path1, id1), store.get(path2, id2)
+    else:
+        structure1, structure2 = parse_structure(path1), parse_structure(path2)
+    coords1, coords2 = residue_correspondence(structure1, structure2, cache)
+    if not len(coords1):
         return 0.0
-
-    sup = Superimposer()
-    sup.set_atoms(ca1, ca2)
-    # FIX: Apply superposition to the copy, not the original
-    sup.apply(list(model2.get_atoms()))
-    rmsd_value = sup.rms
+    rmsd_value = superposition_rmsd(coords1, coords2)
 
     os.makedirs(out_dir, exist_ok=True)
-    id1 = os.path.splitext(os.path.basename(path1))[0]
-    id2 = os.path.splitext(os.path.basename(path2))[0]
     txt_path = os.path.join(out_dir, f"RMSD_{id1}_{id2}.txt")
     with open(txt_path, "w", encoding="utf-8") as f:
-        f.write(f"RMSD between {id1} and {id2}: {rmsd_value:.3f} Å\n")
+        f.write(f"RMSD between {id1} and {id2}: {rmsd_value:.3f} Å "
+                f"over {len(coords1)} aligned Cα pairs\n")
 
     return rmsd_value
 
 
+@timed("mutation_rmsd")
 def compute_mutation_rmsd(wt_struct, mut_struct, mutation: str) -> float:
     """
     FIX: Perform structural superposition before computing RMSD
@@ -168,6 +180,7 @@ def compute_mutation_rmsd(wt_struct, mut_struct, mutation: str) -> float:
     return rmsd
 
 
+@timed("com_diff")
 def compute_center_of_mass_difference(wt_struct, mut_struct) -> float:
     """
     FIX: Now uses mass-weighted COM from corrected compute_center_of_mass()
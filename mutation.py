@@ -1,21 +1,22 @@
 import numpy as np
 from Bio.Data.IUPACData import protein_letters_1to3
-from Bio.PDB.vectors import Vector, rotaxis
 from io_utils import parse_structure
+from instrumentation import timed
 
+# Bump whenever model_mutation or the mutation metrics change results,
+# so cached results (result_cache.py) are recomputed.
+ALGORITHM_VERSION = "1"
 
-def model_mutation(pdb_path: str, mutation: str):
-    """
-    Introduce a single-point mutation by changing the residue name and
-    rotating its sidechain around the Cα-Cβ bond axis by 120°.
 
-    mutation format: <chain><residueNumber><newAA>, e.g. "A141D" or "B91D"
+BACKBONE_ATOMS = ("N", "CA", "C", "O")
+SIDECHAIN_ROTATION_DEG = 120.0
 
-    FIX: Changed from global Z-axis rotation to local Cα-Cβ axis rotation
-    FIX: Uses more realistic 120° rotation angle for sidechain reorientation
-    FIX: Now handles missing Cβ atoms (e.g., glycine) gracefully
+
+def parse_mutation(mutation: str) -> tuple[str, int, str]:
+    """
+    Split "<chain><residueNumber><newAA>" (e.g. "A141D") into
+    (chain ID, residue number, new one-letter amino acid).
     """
-    # Parse chain, position, and new amino acid
     new_aa = mutation[-1].upper()
     rest = mutation[:-1]
 
@@ -31,6 +32,46 @@ def model_mutation(pdb_path: str, mutation: str):
             f"Invalid mutation string: "
             f"couldn't parse res. number from {rest!r}"
         )
+    return chain_id, pos, new_aa
+
+
+def rotated_sidechain(residue) -> list:
+    """
+    Return [(atom, new_coord), ...] for the side-chain atoms beyond Cβ
+    rotated by 120° around the Cα-Cβ axis. Empty without Cβ (glycine).
+    """
+    # importing Bio.PDB is slow; result_cache only needs ALGORITHM_VERSION
+    from Bio.PDB.vectors import Vector, rotaxis
+
+    ca_coord = Vector(residue["CA"].get_coord())
+    if "CB" not in residue:
+        return []
+    axis = (Vector(residue["CB"].get_coord()) - ca_coord).normalized()
+    rotation = rotaxis(np.deg2rad(SIDECHAIN_ROTATION_DEG), axis)
+    origin = ca_coord.get_array()
+
+    moved = [atom for atom in residue
+             if atom.get_id() not in BACKBONE_ATOMS + ("CB",)]
+    if not moved:
+        return []
+    coords = np.array([atom.get_coord() for atom in moved]) - origin
+    rotated = coords @ rotation.T + origin
+    return list(zip(moved, rotated))
+
+
+@timed("mutate")
+def model_mutation(pdb_path: str, mutation: str):
+    """
+    Introduce a single-point mutation by changing the residue name and
+    rotating its sidechain around the Cα-Cβ bond axis by 120°.
+
+    mutation format: <chain><residueNumber><newAA>, e.g. "A141D" or "B91D"
+
+    FIX: Changed from global Z-axis rotation to local Cα-Cβ axis rotation
+    FIX: Uses more realistic 120° rotation angle for sidechain reorientation
+    FIX: Now handles missing Cβ atoms (e.g., glycine) gracefully
+    """
+    chain_id, pos, new_aa = parse_mutation(mutation)
 
     struct = parse_structure(pdb_path)
     mutation_found = False
@@ -50,47 +91,13 @@ def model_mutation(pdb_path: str, mutation: str):
         except KeyError:
             raise ValueError(f"Invalid amino acid code: {new_aa!r}")
 
-        # Get Cα atom
-        try:
-            ca_atom = residue["CA"]
-        except KeyError:
+        if "CA" not in residue:
             raise ValueError(f"No Cα atom found for residue {chain_id}{pos}")
 
-        ca_coord = Vector(ca_atom.get_coord())
-
-        # FIX: Use Cα-Cβ axis for rotation if available
-        # If Cβ is missing (e.g., glycine), skip rotation
-        if "CB" in residue:
-            cb_atom = residue["CB"]
-            cb_coord = Vector(cb_atom.get_coord())
-
-            # Define rotation axis as Cα → Cβ vector
-            axis = (cb_coord - ca_coord).normalized()
-
-            # Rotate sidechain atoms (excluding backbone) by 120°
-            # FIX: 120° is a more realistic rotamer adjustment
-            theta = np.deg2rad(120.0)
-
-            for atom in residue:
-                atom_id = atom.get_id()
-                # Skip backbone atoms
-                if atom_id in ("N", "CA", "C", "O", "CB"):
-                    continue
-
-                atom_coord = Vector(atom.get_coord())
-                # Vector from Cα to atom
-                v = atom_coord - ca_coord
-
-                # Rotate around Cα-Cβ axis using Bio.PDB.vectors.rotaxis
-                v_rotated = v.left_multiply(rotaxis(theta, axis))
-
-                # Set new coordinates
-                new_coord = ca_coord + v_rotated
-                atom.set_coord(new_coord.get_array())
-        else:
-            # FIX: For glycine or residues
-            # without Cβ, just rename without rotation
-            pass
+        # FIX: Rotate around the local Cα-Cβ axis by 120°; residues
+        # without Cβ (e.g. glycine) are only renamed
+        for atom, new_coord in rotated_sidechain(residue):
+            atom.set_coord(new_coord)
 
         break
 
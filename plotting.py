@@ -1,43 +1,228 @@
-import matplotlib.pyplot as plt
-import matplotlib
+import os
+import hashlib
+import contextlib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING, Optional
 
-matplotlib.use('Agg')
+import numpy as np
 
+from instrumentation import count_cache, timed
 
-def plot_ca_scatter(structure, output_path: str) -> None:
-    from mpl_toolkits.mplot3d import Axes3D  # noqa: F401
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+# Bump when the look of the plots changes so cached PNGs are redrawn
+PLOT_VERSION = "1"
+# Render markers older than this were left by a worker that died
+RENDER_MARKER_STALE_SECONDS = 300.0
+
+
+def downsample(points, max_points: Optional[int]) -> np.ndarray:
+    """
+    Evenly strided subset of at most ``max_points`` rows; keeps the
+    spatial spread of the data while bounding matplotlib's work.
+    """
+    points = np.asarray(points, dtype=float)
+    if not max_points or len(points) <= max_points:
+        return points
+    idx = np.linspace(0, len(points) - 1, max_points).round().astype(int)
+    return points[idx]
+
+
+def content_key(kind: str, points, max_points: Optional[int]) -> str:
+    """Hash of everything that determines a plot's pixels."""
+    h = hashlib.sha1(f"{kind}:{PLOT_VERSION}:{max_points}".encode())
+    h.update(np.ascontiguousarray(points, dtype=np.float32).tobytes())
+    return h.hexdigest()
+
+
+def _key_path(output_path: str) -> str:
+    return output_path + ".key"
+
+
+def _marker_path(output_path: str) -> str:
+    """Exists while some process has a render of ``output_path`` queued."""
+    return output_path + ".rendering"
+
+
+def is_up_to_date(output_path: str, key: str) -> bool:
+    """True when ``output_path`` exists and was drawn from ``key``."""
+    try:
+        with open(_key_path(output_path), encoding="utf-8") as f:
+            fresh = f.read().strip() == key and os.path.exists(output_path)
+    except OSError:
+        fresh = False
+    count_cache("plots", fresh)
+    return fresh
+
+
+def _new_figure() -> "Figure":
+    """
+    Headless matplotlib figure. matplotlib is imported here, on the first
+    render, so importing this module (e.g. for PlotRenderer) stays cheap.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    return Figure()
+
+
+def _save(fig: "Figure", output_path: str, key: str) -> None:
+    tmp_path = f"{output_path}.{threading.get_ident()}.tmp"
+    fig.savefig(tmp_path, format="png")
+    os.replace(tmp_path, output_path)
+    with open(_key_path(output_path), "w", encoding="utf-8") as f:
+        f.write(key)
+
+
+def ca_coordinates(structure) -> np.ndarray:
+    return np.array([atom.get_coord() for atom in structure.get_atoms()
+                     if atom.get_id() == "CA"]).reshape(-1, 3)
 
-    xs, ys, zs = [], [], []
-    for atom in structure.get_atoms():
-        if atom.get_id() == "CA":
-            x, y, z = atom.get_coord()
-            xs.append(x)
-            ys.append(y)
-            zs.append(z)
 
-    fig = plt.figure()
+@timed("plot_ca")
+def render_ca_scatter(coords, output_path: str,
+                      max_points: Optional[int] = None,
+                      force: bool = False) -> bool:
+    """
+    Draw the Cα scatter for (N, 3) coordinates. Returns False when an
+    up-to-date image already exists and nothing was drawn.
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+    key = content_key("ca_scatter", coords, max_points)
+    if not force and is_up_to_date(output_path, key):
+        return False
+
+    xs, ys, zs = downsample(coords, max_points).T
+    # Figure objects keep no global state, so renders can run in threads
+    fig = _new_figure()
+    from mpl_toolkits.mplot3d import Axes3D  # noqa: F401
+
     ax: Axes3D = fig.add_subplot(111, projection="3d")
     ax.scatter(xs, ys, zs=zs, s=10, c="teal", alpha=0.8)
     ax.set_title("C-alpha 3D Scatter")
     ax.set_xlabel("X")
     ax.set_ylabel("Y")
     ax.set_zlabel("Z")
-    plt.tight_layout()
-    plt.savefig(output_path)
-    plt.close()
-
-
-def plot_ramachandran(angles: list, output_path: str) -> None:
-    phis = [a[0] for a in angles]
-    psis = [a[1] for a in angles]
-    plt.figure()
-    plt.scatter(phis, psis, s=5, c="darkorange", alpha=0.7)
-    plt.title("Ramachandran Plot")
-    plt.xlabel("Phi (°)")
-    plt.ylabel("Psi (°)")
-    plt.xlim(-180, 180)
-    plt.ylim(-180, 180)
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig(output_path)
-    plt.close()
+    fig.tight_layout()
+    _save(fig, output_path, key)
+    return True
+
+
+def plot_ca_scatter(structure, output_path: str,
+                    max_points: Optional[int] = None,
+                    force: bool = False) -> bool:
+    return render_ca_scatter(
+        ca_coordinates(structure), output_path, max_points, force
+    )
+
+
+@timed("plot_rama")
+def plot_ramachandran(angles: list, output_path: str,
+                      max_points: Optional[int] = None,
+                      force: bool = False) -> bool:
+    points = np.asarray(angles, dtype=float).reshape(-1, 2)
+    key = content_key("ramachandran", points, max_points)
+    if not force and is_up_to_date(output_path, key):
+        return False
+
+    phis, psis = downsample(points, max_points).T
+    fig = _new_figure()
+    ax = fig.add_subplot(111)
+    ax.scatter(phis, psis, s=5, c="darkorange", alpha=0.7)
+    ax.set_title("Ramachandran Plot")
+    ax.set_xlabel("Phi (°)")
+    ax.set_ylabel("Psi (°)")
+    ax.set_xlim(-180, 180)
+    ax.set_ylim(-180, 180)
+    ax.grid(True)
+    fig.tight_layout()
+    _save(fig, output_path, key)
+    return True
+
+
+class PlotRenderer:
+    """
+    Background pool for plot rendering. Requests for an output path that
+    is already being drawn share the pending future.
+    """
+
+    def __init__(self, max_workers: int = 1,
+                 max_points: Optional[int] = None):
+        self.max_points = max_points
+        self._pending: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="plot"
+        )
+
+    def _submit(self, func, data, output_path: str) -> Future:
+        path = os.path.abspath(output_path)
+        with self._lock:
+            future = self._pending.get(path)
+            if future is not None and not future.done():
+                return future
+            # lets other worker processes wait for this render
+            with contextlib.suppress(OSError):
+                open(_marker_path(path), "w").close()
+            future = self._executor.submit(
+                func, data, output_path, self.max_points
+            )
+            self._pending[path] = future
+        future.add_done_callback(lambda f: self._forget(path, f))
+        return future
+
+    def _forget(self, path: str, future: Future) -> None:
+        with self._lock:
+            if self._pending.get(path) is future:
+                del self._pending[path]
+                with contextlib.suppress(OSError):
+                    os.remove(_marker_path(path))
+
+    def ca_scatter(self, coords, output_path: str) -> Future:
+        return self._submit(render_ca_scatter, coords, output_path)
+
+    def ramachandran(self, angles, output_path: str) -> Future:
+        return self._submit(plot_ramachandran, angles, output_path)
+
+    def wait(self, output_path: str,
+             timeout: Optional[float] = None) -> bool:
+        """
+        Block until a pending render of ``output_path`` finishes, in this
+        process or, going by its marker file, in another one. Returns
+        False if it is still running after ``timeout``; True at once if
+        no render is pending.
+        """
+        with self._lock:
+            future = self._pending.get(os.path.abspath(output_path))
+        if future is None:
+            return self._wait_for_marker(output_path, timeout)
+        try:
+            future.result(timeout=timeout)
+        except FutureTimeoutError:
+            return False
+        except Exception:
+            pass
+        return True
+
+    @staticmethod
+    def _wait_for_marker(output_path: str,
+                         timeout: Optional[float]) -> bool:
+        marker = _marker_path(output_path)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                age = time.time() - os.stat(marker).st_mtime
+            except OSError:
+                return True
+            if age > RENDER_MARKER_STALE_SECONDS:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,155 @@
+"""
+Revalidate cached structures against RCSB and refetch revised entries.
+
+    python refresh.py                  # the IDs in PDB_LIST_PATH
+    python refresh.py --all            # every structure in CACHE_DIR
+    python refresh.py 1AKE 4HHB
+
+Downloads keep the upstream ETag and Last-Modified headers next to the
+cached file. A refresh sends conditional GETs for many IDs at once;
+unchanged entries are answered ``304 Not Modified`` without a body, so
+only revised ones are downloaded again. For those, everything derived
+from the old file is dropped: the ``OUTPUT_DIR/<ID>`` directory (served
+copies, plots and plot arrays), analysis jobs and RMSD reports naming
+the ID, its mutation results and the old structure store entry. The
+sequence index and the corpus supersede their records when the new
+version is stored.
+"""
+import os
+import sys
+import time
+import shutil
+import asyncio
+import contextlib
+import argparse
+from typing import Optional
+
+import config
+import io_utils
+
+UNCHANGED, UPDATED, MISSING, FAILED = (
+    "unchanged", "updated", "missing", "failed"
+)
+
+
+def cached_ids(cache_dir: str) -> list[str]:
+    """PDB IDs with a ``.cif`` or ``.pdb`` file in ``cache_dir``."""
+    return sorted({
+        stem.upper() for stem, ext in map(os.path.splitext,
+                                          os.listdir(cache_dir))
+        if ext.lower() in (".cif", ".pdb")
+    })
+
+
+def invalidate(pdb_id: str, old_checksum: Optional[str], output_dir: str,
+               results=None, store=None) -> None:
+    """Drop what was derived from the previous file of ``pdb_id``."""
+    from jobs import discard_jobs
+
+    pdb_id = pdb_id.upper()
+    # finished analyses link the plots and files deleted below
+    discard_jobs(os.path.join(output_dir, "_jobs"),
+                 lambda args: pdb_id in (str(a).upper() for a in args))
+    shutil.rmtree(os.path.join(output_dir, pdb_id), ignore_errors=True)
+    try:
+        names = os.listdir(output_dir)
+    except OSError:
+        names = []
+    for name in names:
+        stem = os.path.splitext(name)[0]
+        if stem.startswith("RMSD_") and pdb_id in stem.split("_")[1:]:
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(output_dir, name))
+    if results is not None:
+        results.invalidate(pdb_id)
+    if store is not None and old_checksum:
+        store.remove(old_checksum)
+
+
+async def _refresh(pdb_ids, output_dir: str, results, store,
+                   concurrency: int, backoff: float, log) -> dict:
+    import httpx
+
+    limit = asyncio.Semaphore(concurrency)
+
+    async def refresh_one(client, pdb_id: str) -> str:
+        async with limit:
+            try:
+                outcome, old_checksum = await io_utils.revalidate_async(
+                    pdb_id, client, backoff)
+            except httpx.HTTPError as e:
+                log(f"{pdb_id}: {e}")
+                return FAILED
+        if outcome == UPDATED:
+            await asyncio.to_thread(invalidate, pdb_id, old_checksum,
+                                    output_dir, results, store)
+            log(f"{pdb_id}: updated")
+        return outcome
+
+    async with httpx.AsyncClient(
+            timeout=30,
+            limits=httpx.Limits(max_connections=concurrency)) as client:
+        outcomes = await asyncio.gather(
+            *(refresh_one(client, pdb_id) for pdb_id in pdb_ids))
+    return dict(zip(pdb_ids, outcomes))
+
+
+def refresh(pdb_ids, output_dir: Optional[str] = None, results=None,
+            store=None, concurrency: Optional[int] = None,
+            backoff: float = 1.0, log=print) -> dict:
+    """
+    Revalidate the cached files of ``pdb_ids``, ``concurrency`` at a
+    time, invalidating ``output_dir``, ``results`` (a ResultCache) and
+    ``store`` (a StructureStore) for revised ones. Returns
+    ``{pdb_id: "unchanged" | "updated" | "missing" | "failed"}``.
+    """
+    pdb_ids = list(dict.fromkeys(p.upper() for p in pdb_ids))
+    return asyncio.run(_refresh(
+        pdb_ids, output_dir or config.OUTPUT_DIR, results, store,
+        concurrency or config.REFRESH_CONCURRENCY, backoff, log,
+    ))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Re-download cached structures revised upstream."
+    )
+    parser.add_argument("pdb_ids", nargs="*",
+                        help="IDs to check (default: --list)")
+    parser.add_argument("--all", action="store_true",
+                        help="check every structure in CACHE_DIR")
+    parser.add_argument("--list", default=config.PDB_LIST_PATH,
+                        help="file of IDs (default: PDB_LIST_PATH)")
+    parser.add_argument("--concurrency", type=int,
+                        default=config.REFRESH_CONCURRENCY)
+    parser.add_argument("--output-dir", default=config.OUTPUT_DIR)
+    parser.add_argument("--result-cache", default=config.RESULT_CACHE_PATH)
+    parser.add_argument("--store-dir", default=config.STRUCTURE_STORE_DIR)
+    args = parser.parse_args(argv)
+
+    from analysis import read_pdb_list
+    from result_cache import ResultCache
+    from structure_store import StructureStore
+
+    if args.pdb_ids:
+        pdb_ids = args.pdb_ids
+    elif args.all:
+        pdb_ids = cached_ids(io_utils.CACHE_DIR)
+    else:
+        pdb_ids = read_pdb_list(args.list)
+
+    started = time.perf_counter()
+    outcomes = refresh(
+        pdb_ids, args.output_dir, ResultCache(args.result_cache),
+        StructureStore(args.store_dir), args.concurrency,
+    )
+    counts = {outcome: list(outcomes.values()).count(outcome)
+              for outcome in (UPDATED, UNCHANGED, MISSING, FAILED)}
+    print(f"Checked {len(outcomes)} structures in "
+          f"{time.perf_counter() - started:.1f}s: "
+          + ", ".join(f"{n} {outcome}" for outcome, n in counts.items()))
+    return 1 if counts[FAILED] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
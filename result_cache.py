@@ -0,0 +1,183 @@
+"""Two-tier (in-process LRU + SQLite) cache for mutation metrics."""
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from mutation import ALGORITHM_VERSION
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mutation_results (
+    pdb_id TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    mutation TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    rmsd REAL NOT NULL,
+    com_shift REAL NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (pdb_id, checksum, mutation, algorithm)
+)
+"""
+
+
+class ResultCache:
+    """
+    Cache of (rmsd, com_shift) keyed by PDB ID, structure checksum,
+    mutation and algorithm version.
+
+    Lookups go to an in-process LRU first and fall back to the SQLite
+    file at ``db_path``, which is shared by every process (web workers
+    and batch runs). Each thread uses its own SQLite connection.
+    """
+
+    def __init__(self, db_path: str, maxsize: int = 4096,
+                 algorithm: str = ALGORITHM_VERSION):
+        self.db_path = db_path
+        self.maxsize = maxsize
+        self.algorithm = algorithm
+        self._lru: OrderedDict[tuple, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)),
+                    exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _key(self, pdb_id: str, checksum: str, mutation: str) -> tuple:
+        return pdb_id.upper(), checksum, mutation, self.algorithm
+
+    def _remember(self, key: tuple, value: tuple) -> None:
+        with self._lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+
+    def get(self, pdb_id: str, checksum: str,
+            mutation: str) -> Optional[tuple]:
+        """Return (rmsd, com_shift) or None."""
+        key = self._key(pdb_id, checksum, mutation)
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                return value
+
+        row = self._connect().execute(
+            "SELECT rmsd, com_shift FROM mutation_results WHERE "
+            "pdb_id = ? AND checksum = ? AND mutation = ? AND algorithm = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        value = (row[0], row[1])
+        self._remember(key, value)
+        with self._lock:
+            self.disk_hits += 1
+        return value
+
+    def put(self, pdb_id: str, checksum: str, mutation: str,
+            rmsd: float, com_shift: float) -> None:
+        key = self._key(pdb_id, checksum, mutation)
+        value = (float(rmsd), float(com_shift))
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO mutation_results "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                key + value + (time.time(),),
+            )
+        self._remember(key, value)
+
+    def get_many(self, pdb_id: str, checksum: str,
+                 mutations: list) -> dict:
+        """Return {mutation: (rmsd, com_shift)} for the cached subset."""
+        found = {}
+        missing = []
+        with self._lock:
+            for mutation in dict.fromkeys(mutations):
+                key = self._key(pdb_id, checksum, mutation)
+                value = self._lru.get(key)
+                if value is None:
+                    missing.append(mutation)
+                else:
+                    self._lru.move_to_end(key)
+                    found[mutation] = value
+            self.memory_hits += len(found)
+
+        # stay well below SQLite's bound-parameter limit
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            rows = self._connect().execute(
+                "SELECT mutation, rmsd, com_shift FROM mutation_results "
+                "WHERE pdb_id = ? AND checksum = ? AND algorithm = ? "
+                f"AND mutation IN ({', '.join('?' * len(chunk))})",
+                (pdb_id.upper(), checksum, self.algorithm, *chunk),
+            ).fetchall()
+            for mutation, rmsd, com_shift in rows:
+                found[mutation] = (rmsd, com_shift)
+                self._remember(self._key(pdb_id, checksum, mutation),
+                               (rmsd, com_shift))
+            with self._lock:
+                self.disk_hits += len(rows)
+                self.misses += len(chunk) - len(rows)
+        return found
+
+    def put_many(self, pdb_id: str, checksum: str, values: dict) -> None:
+        """Store {mutation: (rmsd, com_shift)} in one transaction."""
+        now = time.time()
+        rows = [
+            self._key(pdb_id, checksum, mutation)
+            + (float(rmsd), float(com_shift), now)
+            for mutation, (rmsd, com_shift) in values.items()
+        ]
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO mutation_results "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        for row in rows:
+            self._remember(row[:4], row[4:6])
+
+    def invalidate(self, pdb_id: str) -> int:
+        """Drop every result for ``pdb_id``; returns the rows deleted."""
+        pdb_id = pdb_id.upper()
+        with self._lock:
+            for key in [k for k in self._lru if k[0] == pdb_id]:
+                del self._lru[key]
+        conn = self._connect()
+        with conn:
+            return conn.execute(
+                "DELETE FROM mutation_results WHERE pdb_id = ?", (pdb_id,)
+            ).rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._lru),
+            }
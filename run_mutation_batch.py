@@ -1,13 +1,49 @@
 import os
 import csv
-from io_utils import download_structure, parse_structure
+import time
+import pstats
+import argparse
+import cProfile
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Optional
+
+import numpy as np
+
+import config
+from columnar_results import ParquetResultWriter
+from io_utils import download_structure, file_checksum, parse_structure
 from mutation import model_mutation
 from metrics import (
     compute_mutation_rmsd,
     compute_center_of_mass_difference
 )
+from result_cache import ResultCache
+from sharding import (
+    LEASE_SECONDS,
+    QUEUE_CHUNK_ROWS,
+    ROW_COLUMN,
+    WorkQueue,
+    merge_outputs,
+    parse_shard,
+    row_key,
+    shard_of,
+)
+from variants import VARIANT_COLUMNS, fetch_variants, map_variants
 from Bio.PDB import is_aa
 
+# Per-row stage timings written with --timing (milliseconds)
+TIMING_COLUMNS = ["parse_ms", "mutate_ms", "rmsd_ms", "com_ms"]
+PERCENTILES = (50, 95, 99)
+# Rows handed to a worker process at a time in parallel mode
+CHUNK_SIZE = 8
+# Chunks submitted per worker process ahead of the one being written
+CHUNKS_IN_FLIGHT = 2
+# Columns added to the input columns in the output
+RESULT_COLUMNS = ["chain", "mutation", "rmsd", "com_shift", "status"]
+
 
 def find_chain_for_residue(structure, residue_number):
     """
@@ -23,11 +59,397 @@ def find_chain_for_residue(structure, residue_number):
     return None
 
 
-def main():
-    PDB_ID = "1AKE"
+def _elapsed_ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+# Parsed wild type of this process: {(absolute path, checksum): structure}
+_wild_types: dict = {}
+
+
+def wild_type(wt_path: str, checksum: str, timings: dict):
+    """
+    The wild type parsed once per process and file version; mutation
+    metrics work on copies, so rows can share it. Adds ``parse_ms`` to
+    ``timings`` when it parses.
+    """
+    key = (os.path.abspath(wt_path), checksum)
+    structure = _wild_types.get(key)
+    if structure is None:
+        start = time.perf_counter()
+        structure = parse_structure(wt_path)
+        timings["parse_ms"] = _elapsed_ms(start)
+        _wild_types.clear()
+        _wild_types[key] = structure
+    return structure
+
+
+def process_row(row: dict, pdb_id: str, wt_path: str, checksum: str,
+                cache: ResultCache) -> tuple[dict, bool, dict]:
+    """
+    Evaluate one input row. Returns (output row, success, timings) where
+    timings maps TIMING_COLUMNS (and ``row_ms``) to milliseconds for the
+    stages that ran. ``rmsd`` and ``com_shift`` are floats (None on
+    failure), ``status`` is one of columnar_results.STATUS_VALUES and
+    ``error`` holds the exception message; see format_csv_row.
+    """
+    row_start = time.perf_counter()
+    timings: dict = {}
+    pos = int(row["residue_number"])
+    mut = row["mutated"]
+
+    # 3) Determine chain
+    chain = row.get("chain")
+    if not chain:
+        chain = find_chain_for_residue(
+            wild_type(wt_path, checksum, timings), pos)
+    if chain is None:
+        print(
+            f"[WARNING] Residue {pos} not found in any chain → skipped"
+        )
+        row.update({
+            "chain": "",
+            "mutation": "",
+            "rmsd": None,
+            "com_shift": None,
+            "status": "residue_not_found",
+            "error": None,
+        })
+        timings["row_ms"] = _elapsed_ms(row_start)
+        return row, False, timings
+
+    # 4) Build mutation string and compute metrics
+    mut_str = f"{chain}{pos}{mut}"
+    try:
+        cached = cache.get(pdb_id, checksum, mut_str)
+        if cached is not None:
+            rmsd, com_shift = cached
+        else:
+            wt_struct = wild_type(wt_path, checksum, timings)
+            start = time.perf_counter()
+            mut_struct = model_mutation(wt_path, mut_str)
+            timings["mutate_ms"] = _elapsed_ms(start)
+
+            start = time.perf_counter()
+            rmsd = compute_mutation_rmsd(
+                wt_struct,
+                mut_struct,
+                mut_str
+            )
+            timings["rmsd_ms"] = _elapsed_ms(start)
+
+            start = time.perf_counter()
+            com_shift = compute_center_of_mass_difference(
+                wt_struct,
+                mut_struct
+            )
+            timings["com_ms"] = _elapsed_ms(start)
+            cache.put(pdb_id, checksum, mut_str, rmsd, com_shift)
+
+        status = "success"
+        error = None
+        ok = True
+
+    except Exception as e:
+        print(f"[WARNING] Error for {mut_str}: {e}")
+        rmsd = com_shift = None
+        status = "error"
+        error = str(e)
+        ok = False
+
+    # 5) Row for the output
+    row.update({
+        "chain": chain,
+        "mutation": mut_str,
+        "rmsd": rmsd,
+        "com_shift": com_shift,
+        "status": status,
+        "error": error,
+    })
+    timings["row_ms"] = _elapsed_ms(row_start)
+    return row, ok, timings
+
+
+# State of a worker process in parallel mode (set by _init_worker)
+_worker: dict = {}
+
+
+def _init_worker(pdb_id: str, wt_path: str, checksum: str,
+                 profile_dir: Optional[str]) -> None:
+    _worker.update(
+        pdb_id=pdb_id, wt_path=wt_path, checksum=checksum,
+        profile_dir=profile_dir,
+        cache=ResultCache(config.RESULT_CACHE_PATH,
+                          maxsize=config.RESULT_CACHE_SIZE),
+    )
+
+
+def _run_chunk(args: tuple) -> list:
+    """Process one chunk of rows in a worker process."""
+    chunk_no, rows = args
+    profiler = cProfile.Profile() if _worker["profile_dir"] else None
+    if profiler:
+        profiler.enable()
+    results = [
+        process_row(row, _worker["pdb_id"], _worker["wt_path"],
+                    _worker["checksum"], _worker["cache"])
+        for row in rows
+    ]
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(os.path.join(
+            _worker["profile_dir"], f"chunk-{chunk_no:06d}.prof"
+        ))
+    return results
+
+
+def _ordered_results(executor, func, items, in_flight: int):
+    """
+    ``executor.map(func, items)`` that reads ``items`` lazily, with at
+    most ``in_flight`` of them submitted and not yet consumed.
+    """
+    pending: deque = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _chunks(rows, size: int):
+    rows = iter(rows)
+    chunk_no = 0
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk_no, chunk
+        chunk_no += 1
+
+
+def summarize(timings: list, elapsed: float) -> list[str]:
+    """Summary lines: rows/sec and per-stage percentiles."""
+    lines = [
+        f"Processed {len(timings)} rows in {elapsed:.2f}s "
+        f"({len(timings) / elapsed if elapsed else 0:.1f} rows/sec)"
+    ]
+    header = "".join(f"{f'p{p}':>10}" for p in PERCENTILES)
+    lines.append(f"{'stage (ms)':<12}{'rows':>8}{header}")
+    for column in TIMING_COLUMNS + ["row_ms"]:
+        values = [t[column] for t in timings if column in t]
+        if not values:
+            continue
+        stats = "".join(f"{v:>10.2f}"
+                        for v in np.percentile(values, PERCENTILES))
+        lines.append(f"{column:<12}{len(values):>8}{stats}")
+    return lines
+
+
+def format_csv_row(row: dict, timings: dict, timing: bool) -> dict:
+    """Row as written to the CSV output (4 decimals, short error status)."""
+    row = dict(row)
+    for column in ("rmsd", "com_shift"):
+        # FIX: Format to reasonable precision
+        row[column] = "" if row[column] is None else f"{row[column]:.4f}"
+    if row["status"] == "error":
+        # Truncate long error messages
+        row["status"] = f"error: {row['error'][:50]}"
+    if timing:
+        row.update({column: f"{timings[column]:.3f}"
+                    if column in timings else ""
+                    for column in TIMING_COLUMNS})
+    return row
+
+
+def _write_results(results, write, all_timings: list) -> tuple[int, int]:
+    """Write processed rows in input order; returns (successes, failures)."""
+    success_count = failure_count = 0
+    for row, ok, timings in results:
+        write(row, timings)
+        all_timings.append(timings)
+        if ok:
+            success_count += 1
+        else:
+            failure_count += 1
+    return success_count, failure_count
+
+
+def _csv_fieldnames(input_columns: list, timing: bool) -> list:
+    # Add new columns
+    return (
+            input_columns
+            + [c for c in RESULT_COLUMNS if c not in input_columns]
+            + (TIMING_COLUMNS if timing else [])
+    )
+
+
+def _run_file(args, pdb_id: str, evaluate, output_format: str,
+              all_timings: list) -> tuple[int, int]:
+    """Evaluate the input CSV (or one shard of it) into ``args.output``."""
+    with open(args.input, newline="") as f_in:
+        reader = csv.DictReader(f_in)
+        input_columns = list(reader.fieldnames or [])
+        rows: Iterable[dict] = reader
+        if args.shard:
+            index, count = args.shard
+            input_columns = [ROW_COLUMN] + input_columns
+            rows = ({ROW_COLUMN: n, **row} for n, row in enumerate(reader)
+                    if shard_of(row_key(pdb_id, row), count) == index)
+
+        if output_format == "parquet":
+            with ParquetResultWriter(
+                args.output, pdb_id,
+                extra_columns=[c for c in input_columns
+                               if c not in ["residue_number", "original",
+                                            "mutated"] + RESULT_COLUMNS],
+                timing_columns=TIMING_COLUMNS if args.timing else (),
+                partition=args.partition_by_pdb,
+            ) as sink:
+                return _write_results(evaluate(rows), sink.write,
+                                      all_timings)
+
+        with open(args.output, "w", newline="") as f_out:
+            writer = csv.DictWriter(
+                f_out, fieldnames=_csv_fieldnames(input_columns, args.timing),
+                extrasaction="ignore",
+            )
+            writer.writeheader()
+
+            def write(row, timings):
+                writer.writerow(format_csv_row(row, timings, args.timing))
+
+            return _write_results(evaluate(rows), write, all_timings)
+
+
+def _run_queue(queue: WorkQueue, evaluate, input_columns: list,
+               timing: bool, all_timings: list) -> tuple[int, int]:
+    """Claim and evaluate queue chunks until none are left."""
+    fieldnames = _csv_fieldnames([ROW_COLUMN] + input_columns, timing)
+    renew_every = queue.manifest["lease_seconds"] / 4
+    success_count = failure_count = 0
+    while (chunk := queue.claim()) is not None:
+        out_rows = []
+        renewed = time.monotonic()
+
+        def collect(row, timings):
+            nonlocal renewed
+            out_rows.append(format_csv_row(row, timings, timing))
+            if time.monotonic() - renewed > renew_every:
+                queue.renew(chunk)
+                renewed = time.monotonic()
+
+        successes, failures = _write_results(
+            evaluate(queue.rows(chunk)), collect, all_timings
+        )
+        queue.complete(chunk, fieldnames, out_rows)
+        success_count += successes
+        failure_count += failures
+    return success_count, failure_count
+
+
+def _merge(paths: list, input_csv: str, output_csv: str) -> None:
+    """Merge shard CSVs and/or queue directories into ``output_csv``."""
+    outputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            outputs.extend(WorkQueue(path).outputs())
+        else:
+            outputs.append(path)
+    with open(input_csv, newline="") as f:
+        n_rows = sum(1 for _ in csv.DictReader(f))
+    try:
+        merge_outputs(outputs, n_rows, output_csv)
+    except ValueError as e:
+        raise SystemExit(f"[ERROR] {e}")
+    print(f"Merged {len(outputs)} files ({n_rows} rows) into {output_csv}")
+
+
+def _write_variant_input(accessions: list, wt_path: str,
+                         path: str) -> int:
+    """Fetch, map and write UniProt variants as a batch input CSV."""
+    records = fetch_variants(accessions)
+    for accession in accessions:
+        if accession.strip().upper() not in records:
+            print(f"[WARNING] No UniProt entry for {accession}")
+    rows = map_variants(parse_structure(wt_path), records)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=VARIANT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
+
+
+def _shard_arg(text: str) -> tuple[int, int]:
+    try:
+        return parse_shard(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Evaluate a CSV of point mutations against one PDB."
+    )
+    parser.add_argument("--pdb", default="1AKE")
+    parser.add_argument("--input", default="mutations_1AKE.csv")
+    parser.add_argument("--output", default="mutation_results.csv")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes (1 = sequential)")
+    parser.add_argument("--timing", action="store_true",
+                        help="add per-row " + ", ".join(TIMING_COLUMNS)
+                        + " columns")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write a cProfile/pstats dump of the run")
+    parser.add_argument("--format", choices=["csv", "parquet"],
+                        help="output format (default: parquet if --output "
+                             "ends in .parquet, else csv)")
+    parser.add_argument("--partition-by-pdb", action="store_true",
+                        help="treat --output as a Parquet dataset directory "
+                             "with one pdb_id=<ID> partition per PDB")
+    parser.add_argument("--uniprot", nargs="+", metavar="ACCESSION",
+                        help="evaluate the natural variants of these "
+                             "UniProt entries instead of --input")
+    parser.add_argument("--variants-csv", metavar="PATH",
+                        help="where --uniprot writes the mapped variants "
+                             "(default: variants_<PDB>.csv)")
+    split = parser.add_mutually_exclusive_group()
+    split.add_argument("--shard", type=_shard_arg, metavar="I/N",
+                       help="process only shard I of N (stable hash of "
+                            "PDB ID and mutation); adds a row column")
+    split.add_argument("--queue", metavar="DIR",
+                       help="claim chunks from a work queue shared by "
+                            "several nodes; results stay in DIR")
+    split.add_argument("--merge", nargs="+", metavar="PATH",
+                       help="combine shard outputs or queue directories "
+                            "into --output in input order")
+    parser.add_argument("--chunk-rows", type=int, default=QUEUE_CHUNK_ROWS,
+                        help="rows per queue chunk (when creating a queue)")
+    parser.add_argument("--lease-seconds", type=float,
+                        default=LEASE_SECONDS,
+                        help="seconds before an unrenewed chunk lease can "
+                             "be taken over (when creating a queue)")
+    args = parser.parse_args(argv)
+    output_format = args.format or (
+        "parquet" if args.partition_by_pdb
+        or args.output.endswith(".parquet") else "csv"
+    )
+    if output_format != "csv" and (args.shard or args.queue or args.merge):
+        parser.error("--shard, --queue and --merge work with CSV output")
+
+    PDB_ID = args.pdb.upper()
+    if args.merge:
+        _merge(args.merge, args.input, args.output)
+        return
+
     OUTPUT_ROOT = "outputs"
     os.makedirs(os.path.join(OUTPUT_ROOT, PDB_ID), exist_ok=True)
 
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    started = time.perf_counter()
+
     # 1) Download and parse WT structure
     serve_name, fmt = download_structure(
         PDB_ID,
@@ -41,98 +463,94 @@ def main():
         parse_name = serve_name
     wt_path = os.path.join(OUTPUT_ROOT, PDB_ID, parse_name)
 
-    # 2) Open input CSV and create output CSV
-    input_csv = "mutations_1AKE.csv"
-    output_csv = "mutation_results.csv"
+    if args.uniprot:
+        # UniProt variants mapped onto this structure become the input
+        args.input = args.variants_csv or f"variants_{PDB_ID}.csv"
+        n_variants = _write_variant_input(args.uniprot, wt_path, args.input)
+        print(f"Mapped {n_variants} UniProt variants onto {PDB_ID} "
+              f"({args.input})")
+
+    with open(args.input, newline="") as f_in:
+        input_columns = list(csv.DictReader(f_in).fieldnames or [])
+    queue = None
+    if args.queue:
+        queue = WorkQueue(args.queue)
+        queue.create(args.input, PDB_ID, args.chunk_rows,
+                     args.lease_seconds)
+
+    # Results are shared with /api/mutation_metrics through the cache
+    cache = ResultCache(config.RESULT_CACHE_PATH,
+                        maxsize=config.RESULT_CACHE_SIZE)
+    checksum = file_checksum(wt_path)
 
     # FIX: Added counters for success/failure tracking
     success_count = 0
     failure_count = 0
+    all_timings = []
+    profile_dir = tempfile.mkdtemp(prefix="mutation-profile-") \
+        if profiler and args.workers > 1 else None
 
-    with open(input_csv, newline="") as f_in, \
-            open(output_csv, "w", newline="") as f_out:
-
-        reader = csv.DictReader(f_in)
-        # Add new columns
-        fieldnames = (
-                list(reader.fieldnames)
-                + ["chain", "mutation", "rmsd", "com_shift", "status"]
+    executor = None
+    if args.workers > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=args.workers,
+            initializer=_init_worker,
+            initargs=(PDB_ID, wt_path, checksum, profile_dir),
         )
-        writer = csv.DictWriter(f_out, fieldnames=fieldnames)
-        writer.writeheader()
 
-        for row in reader:
-            pos = int(row["residue_number"])
-            mut = row["mutated"]
-
-            # FIX: Parse WT structure fresh
-            # for each mutation to avoid coordinate drift
-            wt_struct = parse_structure(wt_path)
-
-            # 3) Determine chain
-            chain = row.get("chain")
-            if not chain:
-                chain = find_chain_for_residue(wt_struct, pos)
-            if chain is None:
-                print(
-                    f"[WARNING] Residue {pos} not found in any chain → skipped"
-                )
-                row.update({
-                    "chain": "",
-                    "mutation": "",
-                    "rmsd": "",
-                    "com_shift": "",
-                    "status": "residue_not_found"
-                })
-                writer.writerow(row)
-                failure_count += 1
-                continue
-
-            # 4) Build mutation string and compute metrics
-            mut_str = f"{chain}{pos}{mut}"
-            try:
-                # FIX: Each mutation operates on fresh WT structure
-                mut_struct = model_mutation(wt_path, mut_str)
-
-                rmsd = compute_mutation_rmsd(
-                    wt_struct,
-                    mut_struct,
-                    mut_str
-                )
-                com_shift = compute_center_of_mass_difference(
-                    wt_struct,
-                    mut_struct
-                )
-
-                # FIX: Format to reasonable precision
-                rmsd_str = f"{rmsd:.4f}"
-                com_shift_str = f"{com_shift:.4f}"
-                status = "success"
-                success_count += 1
-
-            except Exception as e:
-                print(f"[WARNING] Error for {mut_str}: {e}")
-                rmsd_str = ""
-                com_shift_str = ""
-                # Truncate long error messages
-                status = f"error: {str(e)[:50]}"
-                failure_count += 1
-
-            # 5) Write to CSV
-            row.update({
-                "chain": chain,
-                "mutation": mut_str,
-                "rmsd": rmsd_str,
-                "com_shift": com_shift_str,
-                "status": status
-            })
-            writer.writerow(row)
+    def evaluate(rows):
+        if executor is not None:
+            # bounded read-ahead keeps memory flat for any input size
+            chunks = _ordered_results(
+                executor, _run_chunk, _chunks(rows, CHUNK_SIZE),
+                CHUNKS_IN_FLIGHT * args.workers,
+            )
+            return (result for chunk in chunks for result in chunk)
+        return (process_row(row, PDB_ID, wt_path, checksum, cache)
+                for row in rows)
+
+    try:
+        if queue is not None:
+            success_count, failure_count = _run_queue(
+                queue, evaluate, input_columns, args.timing, all_timings
+            )
+        else:
+            success_count, failure_count = _run_file(
+                args, PDB_ID, evaluate, output_format, all_timings
+            )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - started
+    if profiler:
+        profiler.disable()
+        stats = pstats.Stats(profiler)
+        if profile_dir:
+            # worker processes profile their own chunks
+            for name in sorted(os.listdir(profile_dir)):
+                stats.add(os.path.join(profile_dir, name))
+                os.remove(os.path.join(profile_dir, name))
+            os.rmdir(profile_dir)
+        stats.dump_stats(args.profile)
 
     # FIX: Print summary statistics
-    print(f"\nDone! Results saved to {output_csv}")
+    if queue is not None:
+        done, total = queue.progress()
+        print(f"\nDone! {done}/{total} chunks of {args.queue} finished; "
+              f"combine them with --merge {args.queue}")
+    else:
+        print(f"\nDone! Results saved to {args.output}")
     print(f"Successfully processed: {success_count} mutations")
     print(f"Failed: {failure_count} mutations")
     print(f"Total: {success_count + failure_count} mutations")
+    if args.workers == 1:
+        print(f"Result cache hit ratio: {cache.stats()['hit_ratio']:.1%}")
+    print()
+    print("\n".join(summarize(all_timings, elapsed)))
+    if args.profile:
+        print(f"Profile written to {args.profile} "
+              f"(python -m pstats {args.profile})")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,332 @@
+"""
+Persistent k-mer index over the chain sequences of cached structures.
+
+Every chain sequence is split into overlapping ``KMER_LENGTH``-residue
+words stored in an inverted index (word -> chains) in SQLite, shared by
+all processes like the result cache. Exact motif search intersects the
+posting lists of the motif's words and confirms the few candidates by
+substring search; similarity search ranks chains by the number of words
+they share with the query. Neither needs to parse a structure.
+
+The web app adds each newly stored structure (StructureStore ``on_add``);
+``python sequence_index.py build`` indexes everything already in
+``CACHE_DIR`` and the structure store, skipping files indexed before.
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+from collections import Counter
+from typing import Optional
+
+import config
+
+KMER_LENGTH = 5
+# Bound on SQL parameters per query (SQLite's historic limit is 999)
+_PARAMS_PER_QUERY = 900
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS chains (
+        id INTEGER PRIMARY KEY,
+        pdb_id TEXT NOT NULL,
+        chain TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        sequence TEXT NOT NULL,
+        n_kmers INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS chains_pdb ON chains (pdb_id)",
+    "CREATE INDEX IF NOT EXISTS chains_checksum ON chains (checksum)",
+    """
+    CREATE TABLE IF NOT EXISTS kmers (
+        kmer TEXT NOT NULL,
+        chain_id INTEGER NOT NULL,
+        PRIMARY KEY (kmer, chain_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS kmers_chain ON kmers (chain_id)",
+    # checksums already indexed, including structures without chains
+    """
+    CREATE TABLE IF NOT EXISTS structures (
+        checksum TEXT PRIMARY KEY,
+        pdb_id TEXT NOT NULL,
+        indexed REAL NOT NULL
+    )
+    """,
+]
+
+
+def kmers(sequence: str, k: int = KMER_LENGTH) -> set:
+    return {sequence[i:i + k] for i in range(len(sequence) - k + 1)}
+
+
+def _chunks(items: list, size: int = _PARAMS_PER_QUERY):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SequenceIndex:
+    """
+    k-mer index in the SQLite file at ``db_path``. Each thread uses its
+    own connection; any number of processes may read and add.
+    """
+
+    def __init__(self, db_path: str, k: int = KMER_LENGTH):
+        self.db_path = db_path
+        self.k = k
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)),
+                    exist_ok=True)
+        with self._connect() as conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def has(self, checksum: str) -> bool:
+        return self._connect().execute(
+            "SELECT 1 FROM structures WHERE checksum = ?", (checksum,)
+        ).fetchone() is not None
+
+    def add(self, pdb_id: str, checksum: str, sequences: dict) -> bool:
+        """
+        Index ``{chain: sequence}`` of one structure file, replacing
+        older versions of the same PDB ID. Returns False if this
+        checksum was already indexed.
+        """
+        pdb_id = pdb_id.upper()
+        conn = self._connect()
+        with conn:
+            # take the write lock first so concurrent adders serialise
+            conn.execute("BEGIN IMMEDIATE")
+            if self.has(checksum):
+                return False
+            stale = [row[0] for row in conn.execute(
+                "SELECT id FROM chains WHERE pdb_id = ?", (pdb_id,))
+            ] if pdb_id else []
+            for ids in _chunks(stale):
+                marks = ",".join("?" * len(ids))
+                conn.execute(
+                    f"DELETE FROM kmers WHERE chain_id IN ({marks})", ids)
+                conn.execute(f"DELETE FROM chains WHERE id IN ({marks})", ids)
+            if pdb_id:
+                conn.execute("DELETE FROM structures WHERE pdb_id = ?",
+                             (pdb_id,))
+            for chain, sequence in sorted(sequences.items()):
+                words = kmers(sequence, self.k)
+                chain_id = conn.execute(
+                    "INSERT INTO chains (pdb_id, chain, checksum, sequence,"
+                    " n_kmers) VALUES (?, ?, ?, ?, ?)",
+                    (pdb_id, chain, checksum, sequence, len(words)),
+                ).lastrowid
+                conn.executemany(
+                    "INSERT OR IGNORE INTO kmers VALUES (?, ?)",
+                    ((word, chain_id) for word in words),
+                )
+            conn.execute("INSERT INTO structures VALUES (?, ?, ?)",
+                         (checksum, pdb_id, time.time()))
+        return True
+
+    def add_arrays(self, arrays) -> None:
+        """StructureStore ``on_add`` hook: index a newly stored structure."""
+        try:
+            self.add(arrays.pdb_id, arrays.meta["checksum"],
+                     arrays.sequences)
+        except sqlite3.Error as e:
+            # the index is an optimisation; never fail the analysis
+            print(f"Warning: could not index {arrays.pdb_id}: {e}")
+
+    def build(self, cache_dir: str, store=None, log=print) -> int:
+        """
+        Index the structure store and every ``.cif``/``.pdb`` file in
+        ``cache_dir`` not indexed yet. Files whose checksum is in the
+        store are not parsed. Returns the number of structures added.
+        """
+        from explorer import get_chain_sequences
+        from io_utils import file_checksum, parse_structure
+
+        added = 0
+        if store is not None:
+            for meta in store.entries():
+                if not self.has(meta["checksum"]):
+                    added += self.add(meta.get("pdb_id") or "",
+                                      meta["checksum"], meta["sequences"])
+        for name in sorted(os.listdir(cache_dir)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in (".cif", ".pdb"):
+                continue
+            path = os.path.join(cache_dir, name)
+            checksum = file_checksum(path)
+            if self.has(checksum):
+                continue
+            stored = store.load(checksum) if store is not None else None
+            try:
+                sequences = stored.sequences if stored is not None \
+                    else get_chain_sequences(parse_structure(path))
+            except Exception as e:
+                log(f"Skipping {name}: {e}")
+                continue
+            added += self.add(stem, checksum, sequences)
+        return added
+
+    def _chains(self, ids) -> dict:
+        rows = {}
+        conn = self._connect()
+        for chunk in _chunks(list(ids)):
+            marks = ",".join("?" * len(chunk))
+            for row in conn.execute(
+                    "SELECT id, pdb_id, chain, sequence, n_kmers FROM chains "
+                    f"WHERE id IN ({marks})", chunk):
+                rows[row[0]] = row[1:]
+        return rows
+
+    def search_motif(self, motif: str, limit: int = 100) -> list[dict]:
+        """
+        Chains containing ``motif`` exactly, with the 0-based offsets of
+        every occurrence in the chain sequence.
+        """
+        motif = motif.upper()
+        conn = self._connect()
+        if len(motif) < self.k:
+            # too short for the index: scan the stored sequences
+            candidates = [row[0] for row in conn.execute(
+                "SELECT id FROM chains WHERE instr(sequence, ?) > 0",
+                (motif,))]
+        else:
+            ids: Optional[set] = None
+            for word in kmers(motif, self.k):
+                postings = {row[0] for row in conn.execute(
+                    "SELECT chain_id FROM kmers WHERE kmer = ?", (word,))}
+                ids = postings if ids is None else ids & postings
+                if not ids:
+                    return []
+            candidates = sorted(ids or ())
+        matches = []
+        chains = self._chains(candidates)
+        for chain_id in candidates:
+            pdb_id, chain, sequence, _ = chains[chain_id]
+            offsets = [i for i in range(len(sequence) - len(motif) + 1)
+                       if sequence.startswith(motif, i)]
+            if offsets:
+                matches.append({"pdb_id": pdb_id, "chain": chain,
+                                "offsets": offsets})
+        matches.sort(key=lambda m: (m["pdb_id"], m["chain"]))
+        return matches[:limit]
+
+    def search_similar(self, sequence: str, limit: int = 10,
+                       min_shared: int = 2) -> list[dict]:
+        """
+        Chains ranked by the Jaccard similarity of their k-mer sets with
+        ``sequence``: candidates for close homologs, to be confirmed by
+        alignment.
+        """
+        words = sorted(kmers(sequence.upper(), self.k))
+        shared: Counter = Counter()
+        conn = self._connect()
+        for chunk in _chunks(words):
+            marks = ",".join("?" * len(chunk))
+            shared.update(row[0] for row in conn.execute(
+                f"SELECT chain_id FROM kmers WHERE kmer IN ({marks})",
+                chunk))
+        hits = [(chain_id, n) for chain_id, n in shared.items()
+                if n >= min_shared]
+        chains = self._chains(chain_id for chain_id, _ in hits)
+        ranked = []
+        for chain_id, n in hits:
+            pdb_id, chain, _, n_kmers = chains[chain_id]
+            ranked.append({
+                "pdb_id": pdb_id,
+                "chain": chain,
+                "shared_kmers": n,
+                "score": round(n / (len(words) + n_kmers - n), 4),
+            })
+        ranked.sort(key=lambda r: (-r["score"], r["pdb_id"], r["chain"]))
+        return ranked[:limit]
+
+    def sequence_of(self, pdb_id: str, chain: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT sequence FROM chains WHERE pdb_id = ? AND chain = ?",
+            (pdb_id.upper(), chain),
+        ).fetchone()
+        return row[0] if row else None
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        return {
+            "structures": conn.execute(
+                "SELECT COUNT(*) FROM structures").fetchone()[0],
+            "chains": conn.execute(
+                "SELECT COUNT(*) FROM chains").fetchone()[0],
+            "kmer_length": self.k,
+        }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Search chain sequences of cached structures."
+    )
+    parser.add_argument("--index", default=config.SEQUENCE_INDEX_PATH,
+                        help="index file (default: SEQUENCE_INDEX_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="index cached structures")
+    build.add_argument("--cache-dir", default=config.CACHE_DIR)
+    build.add_argument("--store-dir", default=config.STRUCTURE_STORE_DIR)
+    motif = commands.add_parser("motif", help="exact motif search")
+    motif.add_argument("sequence")
+    similar = commands.add_parser("similar",
+                                  help="rank chains by shared k-mers")
+    similar.add_argument("sequence",
+                         help="query sequence, or PDB:CHAIN of an "
+                              "indexed chain")
+    for sub in (motif, similar):
+        sub.add_argument("--limit", type=int, default=20)
+    commands.add_parser("stats", help="index size")
+    args = parser.parse_args(argv)
+
+    index = SequenceIndex(args.index)
+    if args.command == "build":
+        from structure_store import StructureStore
+
+        started = time.perf_counter()
+        added = index.build(args.cache_dir, StructureStore(args.store_dir))
+        print(f"Indexed {added} new structures in "
+              f"{time.perf_counter() - started:.1f}s; {index.stats()}")
+        return 0
+    if args.command == "stats":
+        print(index.stats())
+        return 0
+
+    query = args.sequence
+    if ":" in query:
+        pdb_id, chain = query.split(":", 1)
+        query = index.sequence_of(pdb_id, chain) or ""
+        if not query:
+            print(f"{args.sequence} is not in the index")
+            return 1
+    started = time.perf_counter()
+    if args.command == "motif":
+        results = index.search_motif(query, args.limit)
+    else:
+        results = index.search_similar(query, args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    for result in results:
+        details = (result["offsets"] if args.command == "motif"
+                   else f"score {result['score']:.3f} "
+                        f"({result['shared_kmers']} shared)")
+        print(f"{result['pdb_id']}:{result['chain']}\t{details}")
+    print(f"{len(results)} results in {elapsed:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
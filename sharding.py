@@ -0,0 +1,292 @@
+"""
+Splitting mutation batches across machines.
+
+Two ways to divide one input CSV between nodes:
+
+* ``shard_of``: static partitioning. Every node reads the whole input and
+  keeps the rows whose stable hash of (PDB ID, mutation) falls in its
+  shard, so ``--shard i/N`` on N nodes covers every row exactly once.
+* ``WorkQueue``: a directory on shared storage. The first node splits the
+  input into numbered chunk files; nodes then claim chunks by creating
+  lease files with ``O_EXCL``, renew them while working and publish each
+  chunk's results with an atomic rename. A lease that is not renewed for
+  ``lease_seconds`` (a crashed or stalled node) can be taken over.
+
+Output rows carry the input ``row`` number, which ``merge_outputs`` uses
+to restore input order and to check that no row is missing or repeated.
+"""
+import os
+import csv
+import glob
+import json
+import time
+import shutil
+import socket
+import hashlib
+from itertools import islice
+from typing import Iterable, Optional
+
+ROW_COLUMN = "row"
+# Default chunk size and lease length of a new work queue
+QUEUE_CHUNK_ROWS = 500
+LEASE_SECONDS = 300.0
+
+
+def parse_shard(text: str) -> tuple[int, int]:
+    """"2/8" -> (2, 8); shards are numbered from 0."""
+    index, sep, count = text.partition("/")
+    try:
+        shard = int(index), int(count)
+    except ValueError:
+        shard = (-1, 0)
+    if not sep or not 0 <= shard[0] < shard[1]:
+        raise ValueError(f"expected i/N with 0 <= i < N, got {text!r}")
+    return shard
+
+
+def row_key(pdb_id: str, row: dict) -> str:
+    """Identity of an input row: PDB ID plus the requested mutation."""
+    return (f"{pdb_id.upper()}:{row.get('chain') or ''}"
+            f"{row['residue_number']}{row['mutated']}")
+
+
+def shard_of(key: str, count: int) -> int:
+    """Shard of ``key``; the same on every machine and Python version."""
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def node_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _write_csv_atomic(path: str, fieldnames: list, rows: Iterable) -> None:
+    tmp_path = os.path.join(os.path.dirname(path),
+                            f".{os.path.basename(path)}.{node_id()}")
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames,
+                                extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
+class WorkQueue:
+    """
+    Chunks of one input CSV shared by several nodes through ``root``::
+
+        root/manifest.json          input checksum, PDB ID, chunk count
+        root/tasks/chunk-NNNNNN.csv input rows (with their row numbers)
+        root/leases/chunk-NNNNNN    claimed; mtime is the last renewal
+        root/done/chunk-NNNNNN.csv  results
+
+    Lease expiry compares file mtimes with the local clock, so the nodes'
+    clocks need to agree to well within ``lease_seconds``.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.node = node_id()
+        self.manifest: dict = {}
+        for name in ("leases", "done"):
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    def _path(self, kind: str, chunk: int) -> str:
+        suffix = "" if kind == "leases" else ".csv"
+        return os.path.join(self.root, kind, f"chunk-{chunk:06d}{suffix}")
+
+    def create(self, input_csv: str, pdb_id: str,
+               chunk_rows: int = QUEUE_CHUNK_ROWS,
+               lease_seconds: float = LEASE_SECONDS) -> dict:
+        """
+        Split ``input_csv`` into chunks unless another node already has.
+        Raises ValueError if the queue was made for a different input.
+        """
+        with open(input_csv, "rb") as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        manifest_path = os.path.join(self.root, "manifest.json")
+        if not os.path.exists(manifest_path):
+            staging = os.path.join(self.root, f".staging-{self.node}")
+            os.makedirs(staging)
+            with open(input_csv, newline="") as f:
+                reader = csv.DictReader(f)
+                fieldnames = [ROW_COLUMN] + list(reader.fieldnames or [])
+                rows = ({ROW_COLUMN: n, **row} for n, row in enumerate(reader))
+                chunks = n_rows = 0
+                while True:
+                    chunk = list(islice(rows, chunk_rows))
+                    if not chunk:
+                        break
+                    _write_csv_atomic(os.path.join(
+                        staging, f"chunk-{chunks:06d}.csv"), fieldnames, chunk)
+                    chunks += 1
+                    n_rows += len(chunk)
+            try:
+                os.rename(staging, os.path.join(self.root, "tasks"))
+                with open(os.path.join(self.root, ".manifest"), "w") as f:
+                    json.dump({
+                        "input_checksum": checksum, "pdb_id": pdb_id.upper(),
+                        "rows": n_rows, "chunks": chunks,
+                        "chunk_rows": chunk_rows,
+                        "lease_seconds": lease_seconds,
+                    }, f)
+                os.replace(os.path.join(self.root, ".manifest"),
+                           manifest_path)
+            except OSError:
+                # another node created the tasks first
+                shutil.rmtree(staging, ignore_errors=True)
+        self._wait_for_manifest(manifest_path)
+        if (self.manifest["input_checksum"] != checksum
+                or self.manifest["pdb_id"] != pdb_id.upper()):
+            raise ValueError(f"{self.root} holds a queue for a different "
+                             "input file or PDB ID")
+        return self.manifest
+
+    def _wait_for_manifest(self, path: str, timeout: float = 60.0) -> None:
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(path):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"no manifest appeared in {self.root}")
+            time.sleep(0.1)
+        self.open()
+
+    def open(self) -> dict:
+        with open(os.path.join(self.root, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        return self.manifest
+
+    def is_done(self, chunk: int) -> bool:
+        return os.path.exists(self._path("done", chunk))
+
+    def _lease_expired(self, path: str) -> bool:
+        try:
+            age = time.time() - os.stat(path).st_mtime
+        except FileNotFoundError:
+            return True
+        return age > self.manifest["lease_seconds"]
+
+    def _owner(self, path: str) -> Optional[str]:
+        """Node named in the lease file ``path``; None if there is none."""
+        try:
+            with open(path) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def claim(self) -> Optional[int]:
+        """Lease the next unfinished, unleased chunk; None when none left."""
+        for chunk in range(self.manifest["chunks"]):
+            if self.is_done(chunk):
+                continue
+            lease = self._path("leases", chunk)
+            if os.path.exists(lease):
+                if not self._lease_expired(lease):
+                    continue
+                # only one node can rename the stale lease away
+                stale = f"{lease}.expired-{self.node}"
+                try:
+                    os.rename(lease, stale)
+                except FileNotFoundError:
+                    continue
+                if not self._lease_expired(stale):
+                    # another node took the lease over after we checked
+                    # it: put its fresh lease back unless it was replaced
+                    try:
+                        os.link(stale, lease)
+                    except FileExistsError:
+                        pass
+                    os.remove(stale)
+                    continue
+                os.remove(stale)
+            try:
+                fd = os.open(lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(self.node)
+            if self._owner(lease) != self.node:
+                # a node with a stale view renamed our lease away
+                continue
+            if self.is_done(chunk):
+                # finished between the check and the claim
+                self.release(chunk)
+                continue
+            return chunk
+        return None
+
+    def renew(self, chunk: int) -> bool:
+        """
+        Push the lease expiry back; call regularly while working. False
+        if the lease was taken over by another node and is not renewed.
+        """
+        lease = self._path("leases", chunk)
+        if self._owner(lease) != self.node:
+            return False
+        os.utime(lease)
+        return True
+
+    def release(self, chunk: int) -> None:
+        """Drop the lease on ``chunk`` if this node holds it."""
+        lease = self._path("leases", chunk)
+        if self._owner(lease) != self.node:
+            return
+        try:
+            os.remove(lease)
+        except FileNotFoundError:
+            pass
+
+    def rows(self, chunk: int) -> list[dict]:
+        with open(os.path.join(self.root, "tasks",
+                               f"chunk-{chunk:06d}.csv"), newline="") as f:
+            return list(csv.DictReader(f))
+
+    def complete(self, chunk: int, fieldnames: list, rows: list) -> None:
+        """Publish a chunk's results and drop its lease."""
+        _write_csv_atomic(self._path("done", chunk), fieldnames, rows)
+        self.release(chunk)
+
+    def outputs(self) -> list[str]:
+        return sorted(glob.glob(os.path.join(self.root, "done",
+                                             "chunk-*.csv")))
+
+    def progress(self) -> tuple[int, int]:
+        """(finished chunks, total chunks)."""
+        return len(self.outputs()), self.manifest["chunks"]
+
+
+def merge_outputs(paths: list, n_rows: int,
+                  output_csv: str) -> tuple[int, list]:
+    """
+    Combine shard or queue outputs into ``output_csv`` in input order,
+    without the ``row`` column. Returns (rows written, fieldnames).
+    Raises ValueError listing the missing and duplicated row numbers.
+    """
+    rows: dict = {}
+    duplicates = []
+    fieldnames: list = []
+    for path in paths:
+        with open(path, newline="") as f:
+            reader = csv.DictReader(f)
+            if not fieldnames:
+                fieldnames = [c for c in reader.fieldnames or []
+                              if c != ROW_COLUMN]
+            for row in reader:
+                number = int(row.pop(ROW_COLUMN))
+                if number in rows:
+                    duplicates.append(number)
+                rows[number] = row
+    missing = sorted(set(range(n_rows)) - set(rows))
+    extra = sorted(n for n in rows if not 0 <= n < n_rows)
+    if missing or duplicates or extra:
+        def sample(numbers):
+            return ", ".join(map(str, numbers[:10])) + (
+                ", ..." if len(numbers) > 10 else "")
+        problems = [f"{len(numbers)} {what} (rows {sample(numbers)})"
+                    for what, numbers in (("missing", missing),
+                                          ("duplicated", sorted(duplicates)),
+                                          ("out of range", extra))
+                    if numbers]
+        raise ValueError("cannot merge: " + "; ".join(problems))
+    _write_csv_atomic(output_csv, fieldnames,
+                      (rows[n] for n in range(n_rows)))
+    return n_rows, fieldnames
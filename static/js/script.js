@@ -18,9 +18,40 @@ document.addEventListener("DOMContentLoaded", () => {
     pdb2Input.addEventListener("input", validateForm);
     validateForm();
 
-    mainForm.addEventListener("submit", () => {
+    const jobError      = document.getElementById("job-error");
+    const POLL_MS       = 1500;
+    const sleep         = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+    // Submit as a background job and poll until the result page is ready
+    mainForm.addEventListener("submit", async e => {
+      e.preventDefault();
+      jobError.style.display      = "none";
       formContainer.style.display = "none";
       spinner.style.display       = "flex";
+
+      try {
+        let resp = await fetch(mainForm.dataset.jobsUrl, {
+          method: "POST",
+          body: new FormData(mainForm)
+        });
+        let job = await resp.json();
+        if (!resp.ok) throw new Error(job.error || resp.statusText);
+
+        while (job.status === "queued" || job.status === "running") {
+          await sleep(POLL_MS);
+          resp = await fetch(job.status_url);
+          job  = await resp.json();
+          if (!resp.ok) throw new Error(job.error || resp.statusText);
+        }
+        if (job.status !== "done") throw new Error(job.error || "Analysis failed");
+        window.location.href = job.result_url;
+      } catch (err) {
+        spinner.style.display       = "none";
+        formContainer.style.display = "block";
+        jobError.textContent        = err.message;
+        jobError.style.display      = "block";
+        console.error(err);
+      }
     });
   }
 
@@ -82,7 +113,32 @@ document.addEventListener("DOMContentLoaded", () => {
     });
   });
 
-  // 3) Back-to-top
+  // 3) Cα and Ramachandran plots, loaded from the float32 data endpoints
+  async function loadColumns(url) {
+    const resp = await fetch(url);
+    if (!resp.ok) throw new Error(resp.statusText);
+    const [rows, cols] = resp.headers.get("X-Array-Shape").split(",").map(Number);
+    const flat    = new Float32Array(await resp.arrayBuffer());
+    const columns = Array.from({ length: cols }, () => new Array(rows));
+    for (let r = 0; r < rows; r++) {
+      for (let c = 0; c < cols; c++) columns[c][r] = flat[r * cols + c];
+    }
+    return columns;
+  }
+
+  document.querySelectorAll("[data-ca-url]").forEach(el => {
+    loadColumns(el.dataset.caUrl)
+      .then(([x, y, z]) => Plotly.newPlot(el, [{ x, y, z, mode: "markers", type: "scatter3d" }]))
+      .catch(err => console.error(err));
+  });
+  document.querySelectorAll("[data-rama-url]").forEach(el => {
+    loadColumns(el.dataset.ramaUrl)
+      .then(([x, y]) => Plotly.newPlot(el, [{ x, y, mode: "markers", type: "scatter" }],
+                                       { xaxis: { title: "Phi" }, yaxis: { title: "Psi" } }))
+      .catch(err => console.error(err));
+  });
+
+  // 4) Back-to-top
   const backBtn = document.getElementById("backToTop");
   if (backBtn) {
     window.addEventListener("scroll", () => {
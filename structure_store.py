@@ -0,0 +1,228 @@
+"""
+Array representations of parsed structures, shared between processes.
+
+Each structure is stored once as a directory of ``.npy`` files named by
+the checksum of its coordinate file. Readers attach with
+``np.load(mmap_mode="r")``, so every gunicorn worker maps the same page
+cache pages instead of holding its own parsed copy, and a structure
+written by one worker is immediately usable by all others.
+"""
+import os
+import json
+import shutil
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+
+from instrumentation import count_cache
+from io_utils import file_checksum, parse_structure
+
+# Bump when the stored arrays change meaning so old entries are ignored
+STORE_VERSION = "3"
+
+ATOM_ARRAYS = ("coords", "masses", "atom_names", "elements",
+               "atom_residue")
+RESIDUE_ARRAYS = ("res_model", "res_chain", "res_seq", "res_is_aa",
+                  "res_letter")
+BACKBONE_ARRAYS = ("n", "ca", "c", "cb", "gamma", "accepted", "links")
+
+
+class StructureArrays:
+    """
+    Read-only arrays for one structure, in Biopython iteration order:
+    per atom ``coords`` (float32), ``masses``, ``atom_names``,
+    ``elements`` and ``atom_residue`` (index of its residue); per
+    residue ``res_model``, ``res_chain``, ``res_seq``, ``res_is_aa`` and
+    ``res_letter`` (one-letter code, "X" if unknown);
+    ``backbone`` in the layout of dihedrals.backbone_arrays.
+    """
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.coords = arrays["coords"]
+        self.masses = arrays["masses"]
+        self.atom_names = arrays["atom_names"]
+        self.elements = arrays["elements"]
+        self.atom_residue = arrays["atom_residue"]
+        self.res_model = arrays["res_model"]
+        self.res_chain = arrays["res_chain"]
+        self.res_seq = arrays["res_seq"]
+        self.res_is_aa = arrays["res_is_aa"]
+        self.res_letter = arrays["res_letter"]
+        self.backbone = {name: arrays[name] for name in BACKBONE_ARRAYS}
+        self.backbone["chain"] = self.res_chain
+        self.backbone["resseq"] = self.res_seq
+        self.meta = meta
+
+    @property
+    def pdb_id(self) -> str:
+        return self.meta.get("pdb_id", "")
+
+    @property
+    def sequences(self) -> dict:
+        return self.meta["sequences"]
+
+
+def build_arrays(structure, pdb_id: str = "") -> tuple[dict, dict]:
+    """Flatten a Biopython structure into (arrays, metadata)."""
+    from Bio.PDB import is_aa
+    from Bio.SeqUtils import seq1
+    from dihedrals import backbone_arrays
+    from explorer import get_chain_sequences
+    from metrics import get_atomic_mass
+
+    coords, masses, names, elements, atom_residue = [], [], [], [], []
+    res_model: list[int] = []
+    res_is_aa: list[bool] = []
+    res_letter: list[str] = []
+    for model_index, model in enumerate(structure):
+        for chain in model:
+            for residue in chain:
+                residue_index = len(res_model)
+                res_model.append(model_index)
+                res_is_aa.append(is_aa(residue))
+                res_letter.append(seq1(residue.get_resname()) or "X")
+                for atom in residue.get_atoms():
+                    element = getattr(atom, "element", "C")
+                    coords.append(atom.get_coord())
+                    masses.append(get_atomic_mass(element))
+                    names.append(atom.get_id())
+                    elements.append(element)
+                    atom_residue.append(residue_index)
+
+    backbone = backbone_arrays(structure, chi1=True)
+    arrays = {
+        "coords": np.array(coords, dtype=np.float32).reshape(-1, 3),
+        "masses": np.array(masses, dtype=np.float64),
+        "atom_names": np.array(names, dtype=str),
+        "elements": np.array(elements, dtype=str),
+        "atom_residue": np.array(atom_residue, dtype=np.int32),
+        "res_model": np.array(res_model, dtype=np.int32),
+        "res_chain": np.array(backbone["chain"].tolist(), dtype=str),
+        "res_seq": backbone["resseq"].astype(np.int64),
+        "res_is_aa": np.array(res_is_aa, dtype=bool),
+        "res_letter": np.array(res_letter, dtype="U1"),
+    }
+    arrays.update({name: backbone[name] for name in BACKBONE_ARRAYS})
+    meta = {
+        "version": STORE_VERSION,
+        "pdb_id": pdb_id,
+        "n_atoms": len(coords),
+        "n_residues": len(res_model),
+        "sequences": get_chain_sequences(structure),
+    }
+    return arrays, meta
+
+
+class StructureStore:
+    """
+    Directory of structure arrays keyed by coordinate file checksum.
+
+    Entries are written to a private temporary directory and renamed
+    into place, so concurrent writers never expose partial entries and
+    readers need no locking. ``entries()`` is the index of what is stored.
+    ``on_add`` is called with each structure this store instance adds.
+    """
+
+    def __init__(self, root: str,
+                 on_add: Optional[Callable[[StructureArrays], None]] = None):
+        self.root = os.path.join(root, f"v{STORE_VERSION}")
+        self.on_add = on_add
+        self._loaded: dict[str, StructureArrays] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _entry_dir(self, checksum: str) -> str:
+        return os.path.join(self.root, checksum)
+
+    def load(self, checksum: str) -> Optional[StructureArrays]:
+        """Attach to a stored entry, or None if there is none."""
+        with self._lock:
+            cached = self._loaded.get(checksum)
+        if cached is not None:
+            return cached
+        entry_dir = self._entry_dir(checksum)
+        try:
+            with open(os.path.join(entry_dir, "meta.json"),
+                      encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = {
+                name: np.load(os.path.join(entry_dir, f"{name}.npy"),
+                              mmap_mode="r")
+                for name in ATOM_ARRAYS + RESIDUE_ARRAYS + BACKBONE_ARRAYS
+            }
+        except (OSError, ValueError):
+            return None
+        structure = StructureArrays(arrays, meta)
+        with self._lock:
+            return self._loaded.setdefault(checksum, structure)
+
+    def add(self, structure, checksum: str,
+            pdb_id: str = "") -> StructureArrays:
+        """Store a parsed structure (if not stored yet) and attach to it."""
+        existing = self.load(checksum)
+        if existing is not None:
+            return existing
+        arrays, meta = build_arrays(structure, pdb_id)
+        meta["checksum"] = checksum
+        tmp_dir = self._entry_dir(
+            f".{checksum}.{os.getpid()}.{threading.get_ident()}"
+        )
+        os.makedirs(tmp_dir, exist_ok=True)
+        try:
+            for name, values in arrays.items():
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+            with open(os.path.join(tmp_dir, "meta.json"), "w",
+                      encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.rename(tmp_dir, self._entry_dir(checksum))
+        except OSError:
+            # another process stored the same checksum first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        stored = self.load(checksum)
+        if stored is None:
+            raise OSError(f"Could not store structure arrays for {checksum}")
+        if self.on_add is not None:
+            self.on_add(stored)
+        return stored
+
+    def get(self, path: str, pdb_id: str = "",
+            parse: Callable = parse_structure) -> StructureArrays:
+        """Arrays for the structure file at ``path``, parsing on a miss."""
+        checksum = file_checksum(path)
+        stored = self.load(checksum)
+        count_cache("structure_store", stored is not None)
+        if stored is None:
+            stored = self.add(parse(path), checksum, pdb_id)
+        return stored
+
+    def remove(self, checksum: str) -> bool:
+        """
+        Delete an entry; processes that attached to it keep their
+        mappings. Returns False if there was none.
+        """
+        with self._lock:
+            self._loaded.pop(checksum, None)
+        tmp_dir = self._entry_dir(
+            f".{checksum}.{os.getpid()}.{threading.get_ident()}.removed"
+        )
+        try:
+            os.rename(self._entry_dir(checksum), tmp_dir)
+        except OSError:
+            return False
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return True
+
+    def entries(self) -> list[dict]:
+        """Metadata of every stored structure."""
+        entries = []
+        for name in sorted(os.listdir(self.root)):
+            if name.startswith("."):
+                continue
+            try:
+                with open(os.path.join(self.root, name, "meta.json"),
+                          encoding="utf-8") as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return entries
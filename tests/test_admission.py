@@ -0,0 +1,157 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+from admission import (  # noqa: E402
+    ADMISSIONS,
+    AdmissionController,
+    Gate,
+    OverloadedError,
+    estimate_atoms,
+    parse_limits,
+    structure_cost,
+)
+from app import create_app  # noqa: E402
+from test_app import PDB_FIXTURE  # noqa: E402
+
+
+def test_parse_limits_and_cost():
+    assert parse_limits("analyze=4, mutation=8,") == {
+        "analyze": 4, "mutation": 8}
+    assert parse_limits("") == {}
+    with pytest.raises(ValueError):
+        parse_limits("analyze")
+    assert structure_cost(None) == 1
+    assert structure_cost(25000, atoms_per_unit=10000) == 3
+
+
+def test_estimate_atoms_without_store(tmp_path):
+    path = tmp_path / "x.pdb"
+    path.write_text(PDB_FIXTURE)
+    assert estimate_atoms(str(path)) == len(PDB_FIXTURE) // 80
+    assert estimate_atoms(str(tmp_path / "missing.pdb")) is None
+
+
+def test_gate_queues_in_order_and_sheds():
+    gate = Gate("test", capacity=2, max_queue=1, max_wait=5.0)
+    first = gate.acquire(2)  # fills the budget
+    admitted = []
+
+    def waiter():
+        with gate.admit(1):
+            admitted.append(time.monotonic())
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    while gate.queue_depth == 0:
+        time.sleep(0.001)
+    with pytest.raises(OverloadedError) as shed:
+        gate.acquire(1)
+    assert shed.value.reason == "queue_full"
+    assert shed.value.retry_after == 5
+    gate.release(first)
+    thread.join()
+    assert admitted and gate.in_flight == 0
+
+    # more than the whole budget runs alone instead of never
+    assert gate.acquire(50) == 2
+    quick = Gate("test", capacity=1, max_queue=4, max_wait=0.05)
+    quick.acquire()
+    with pytest.raises(OverloadedError, match="timeout"):
+        quick.acquire()
+    assert quick.queue_depth == 0
+
+
+def test_unguarded_endpoints_are_admitted():
+    controller = AdmissionController({"analyze": 0})
+    with controller.admit("analyze", 100), controller.admit("other"):
+        pass
+    assert controller.gates == {}
+
+
+@pytest.fixture
+def overload_server(monkeypatch, tmp_path):
+    """Live app whose mutations each take 0.2 s, two at a time."""
+    import analysis
+    import mutation
+
+    def fake_prepare(pdb_id, out_dir):
+        # like a cache hit, never rewrite a file other requests parse
+        name = f"{pdb_id}.pdb"
+        path = os.path.join(out_dir, name)
+        if not os.path.exists(path):
+            with open(f"{path}.{threading.get_ident()}", "w") as f:
+                f.write(PDB_FIXTURE)
+            os.replace(f"{path}.{threading.get_ident()}", path)
+        return name, "pdb", name
+
+    real_model_mutation = mutation.model_mutation
+
+    def slow_model_mutation(path, mutation_code):
+        time.sleep(0.2)
+        return real_model_mutation(path, mutation_code)
+
+    monkeypatch.setattr(analysis, "prepare_structure", fake_prepare)
+    monkeypatch.setattr(mutation, "model_mutation", slow_model_mutation)
+    app = create_app({
+        "TESTING": True,
+        "OUTPUT_DIR": str(tmp_path),
+        "RESULT_CACHE_PATH": str(tmp_path / "results.sqlite"),
+        "STRUCTURE_STORE_DIR": str(tmp_path / "store"),
+        "SEQUENCE_INDEX_PATH": str(tmp_path / "sequences.sqlite"),
+        "CORPUS_DIR": str(tmp_path / "corpus"),
+        "ALIGNMENT_CACHE_DIR": str(tmp_path / "alignments"),
+        "ADMISSION_LIMITS": "mutation=2",
+        "ADMISSION_MAX_QUEUE": 2,
+        "ADMISSION_MAX_WAIT": 1.0,
+    })
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    app.extensions["jobs"].shutdown()
+    app.extensions["plots"].shutdown()
+
+
+def test_overload_sheds_and_bounds_tail_latency(overload_server):
+    url = overload_server
+    shed_before = ADMISSIONS.value("mutation", "queue_full")
+    # every substitution of residue A1 misses the result cache
+    targets = "CDEFGHIKLMNPQRSTVWY"
+
+    def call(target):
+        started = time.perf_counter()
+        resp = requests.get(f"{url}/api/mutation_metrics/1ABC/A1{target}",
+                            timeout=30)
+        return resp, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+        outcomes = list(pool.map(call, targets))
+    served = [t for r, t in outcomes if r.status_code == 200]
+    shed = [(r, t) for r, t in outcomes if r.status_code == 503]
+    assert len(served) + len(shed) == len(targets)
+    assert served and shed
+    assert all(r.headers["Retry-After"] == "1" for r, _ in shed)
+    # 2 running + 2 queued: an admitted request waits at most ~2 rounds
+    # of 0.2 s, and shed requests are answered at once or after the
+    # 1 s wait
+    assert np.percentile(served, 99) < 1.5
+    assert max(t for _, t in shed) < 1.5
+    assert ADMISSIONS.value("mutation", "queue_full") > shed_before
+
+    metrics = requests.get(f"{url}/metrics", timeout=30).text
+    assert ('protein_explorer_admission_queue_depth{endpoint="mutation"} 0'
+            in metrics)
+    assert ('protein_explorer_admission_in_flight_cost{endpoint="mutation"}'
+            ' 0' in metrics)
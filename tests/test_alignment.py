@@ -0,0 +1,138 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from Bio.SeqUtils import seq3
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+from alignment import AlignmentCache, align  # noqa: E402
+from metrics import compare_structures, superposition_rmsd  # noqa: E402
+
+SEQUENCE = "MKTAYIAKQRQISFVKSHFSRQLEERLGLIEVQ"
+
+
+def helix(n):
+    t = np.arange(n) * np.radians(100)
+    return np.column_stack([2.3 * np.cos(t), 2.3 * np.sin(t),
+                            1.5 * np.arange(n)])
+
+
+def write_ca_pdb(path, chains):
+    """``chains``: [(chain ID, first residue number, sequence, coords)]."""
+    lines = []
+    serial = 1
+    for chain, first, sequence, coords in chains:
+        for n, (aa, (x, y, z)) in enumerate(zip(sequence, coords)):
+            lines.append(
+                f"ATOM  {serial:5d}  CA  {seq3(aa).upper()} "
+                f"{chain}{first + n:4d}"
+                f"    {x:8.3f}{y:8.3f}{z:8.3f}  1.00  0.00           C"
+            )
+            serial += 1
+        lines.append("TER")
+    lines.append("END")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_align_handles_offsets_and_gaps():
+    pairs = align("MKTAYIAKQR", "GGMKTAYAKQR")
+    assert pairs[:5].tolist() == [[0, 2], [1, 3], [2, 4], [3, 5], [4, 6]]
+    assert pairs[-1].tolist() == [9, 10]
+    assert len(pairs) == 9  # I at index 5 is deleted
+    assert len(align("", "MKT")) == 0
+
+
+def test_cache_reuses_alignments_in_both_orders(tmp_path):
+    cache = AlignmentCache(str(tmp_path))
+    forward = cache.align("MKTAYIAKQR", "GGMKTAYAKQR")
+    stored = list(tmp_path.glob("*/*.npy"))
+    assert len(stored) == 1
+    backward = cache.align("GGMKTAYAKQR", "MKTAYIAKQR")
+    assert backward.tolist() == forward[:, ::-1].tolist()
+    assert list(tmp_path.glob("*/*.npy")) == stored
+
+
+def test_superposition_rmsd_ignores_rigid_motion():
+    coords = helix(20)
+    angle = np.radians(40)
+    rotation = np.array([[np.cos(angle), -np.sin(angle), 0],
+                         [np.sin(angle), np.cos(angle), 0], [0, 0, 1]])
+    moved = coords @ rotation.T + [5.0, -3.0, 2.0]
+    assert superposition_rmsd(coords, moved) == pytest.approx(0, abs=1e-6)
+    noisy = moved + np.random.default_rng(0).normal(0, 0.5, moved.shape)
+    assert superposition_rmsd(coords, noisy) > 0.3
+
+
+def test_compare_renumbered_homolog(tmp_path):
+    coords = helix(len(SEQUENCE))
+    path1 = write_ca_pdb(tmp_path / "wt.pdb",
+                         [("A", 1, SEQUENCE, coords)])
+    # other chain ID and numbering, two N-terminal residues missing and
+    # two substitutions: exact ID matching finds no pairs here
+    homolog = SEQUENCE[2:10] + "W" + SEQUENCE[11:20] + "A" + SEQUENCE[21:]
+    path2 = write_ca_pdb(tmp_path / "homolog.pdb",
+                         [("B", 101, homolog, coords[2:] + 10.0)])
+    cache = AlignmentCache(str(tmp_path / "alignments"))
+
+    rmsd = compare_structures(path1, path2, str(tmp_path), cache)
+    assert rmsd == pytest.approx(0, abs=1e-3)
+    report = (tmp_path / "RMSD_wt_homolog.txt").read_text(encoding="utf-8")
+    assert f"over {len(homolog)} aligned" in report
+
+
+def test_compare_skips_unrelated_chains(tmp_path):
+    coords = helix(len(SEQUENCE))
+    unrelated = "GGGGGGGGGGWWWWWWWWWW"
+    path1 = write_ca_pdb(tmp_path / "a.pdb", [
+        ("A", 1, SEQUENCE, coords),
+        ("B", 1, unrelated, helix(20) + 30.0),
+    ])
+    path2 = write_ca_pdb(tmp_path / "b.pdb", [
+        ("A", 1, SEQUENCE, coords),
+        ("B", 1, "KLKLKLKLKLKLKLKLKLKL", helix(20) * 3.0),
+    ])
+    cache = AlignmentCache(str(tmp_path / "alignments"))
+    assert compare_structures(path1, path2, str(tmp_path), cache) \
+        == pytest.approx(0, abs=1e-3)
+
+
+def test_store_arrays_give_the_same_chains_and_rmsd(tmp_path, monkeypatch):
+    import metrics
+    from alignment import chain_ca
+    from benchmarks.synthetic import write_synthetic
+    from io_utils import parse_structure
+    from structure_store import StructureStore
+
+    store = StructureStore(str(tmp_path / "store"))
+    path = str(tmp_path / "1abc.cif")
+    write_synthetic(path, n_atoms=600, n_chains=2, n_models=2)
+    parsed = chain_ca(parse_structure(path))
+    assert len(parsed) == 2
+    from_store = chain_ca(store.get(path, "1ABC"))
+    assert list(from_store) == list(parsed)
+    for chain_id, (sequence, coords) in parsed.items():
+        assert from_store[chain_id][0] == sequence
+        assert np.allclose(from_store[chain_id][1], coords)
+
+    coords = helix(len(SEQUENCE))
+    path1 = write_ca_pdb(tmp_path / "wt.pdb", [("A", 1, SEQUENCE, coords)])
+    path2 = write_ca_pdb(tmp_path / "moved.pdb",
+                         [("A", 5, SEQUENCE[3:], coords[3:] * 1.1)])
+    cache = AlignmentCache(str(tmp_path / "alignments"))
+    expected = compare_structures(path1, path2, str(tmp_path), cache)
+    for p in (path1, path2):
+        store.get(p, os.path.basename(p))
+
+    def parse(path):
+        raise AssertionError("stored structures are not parsed again")
+
+    monkeypatch.setattr(metrics, "parse_structure", parse)
+    assert compare_structures(path1, path2, str(tmp_path), cache,
+                              store) == pytest.approx(expected)
+    assert expected > 0.1
@@ -1,6 +1,18 @@
+import gc
+import io
+import os
+import sys
+import gzip
+import json
+import time
+import subprocess
+
+import numpy as np
 import pytest
+import app as app_module
 from app import create_app
 import io_utils
+import mutation
 
 
 @pytest.fixture
@@ -43,3 +55,390 @@ def test_post_valid_but_nonexistent_pdb(monkeypatch, client):
     )
     assert resp.status_code == 200
     assert "Failed to download PDB ZZZZ" in resp.get_data(as_text=True)
+
+
+PDB_FIXTURE = """\
+ATOM      1  N   ALA A   1       0.000   0.000   0.000  1.00  0.00           N
+ATOM      2  CA  ALA A   1       1.458   0.000   0.000  1.00  0.00           C
+ATOM      3  C   ALA A   1       2.009   1.420   0.000  1.00  0.00           C
+ATOM      4  O   ALA A   1       1.251   2.390   0.000  1.00  0.00           O
+TER
+END
+"""
+
+
+@pytest.fixture
+def local_app(monkeypatch, tmp_path):
+    """App writing to tmp_path whose downloads come from PDB_FIXTURE."""
+    import analysis
+
+    def fake_prepare(pdb_id, out_dir):
+        name = f"{pdb_id}.pdb"
+        with open(os.path.join(out_dir, name), "w") as f:
+            f.write(PDB_FIXTURE)
+        return name, "pdb", name
+
+    monkeypatch.setattr(analysis, "prepare_structure", fake_prepare)
+    app = create_app({
+        "TESTING": True,
+        "OUTPUT_DIR": str(tmp_path),
+        "RESULT_CACHE_PATH": str(tmp_path / "results.sqlite"),
+        "STRUCTURE_STORE_DIR": str(tmp_path / "store"),
+        "SEQUENCE_INDEX_PATH": str(tmp_path / "sequences.sqlite"),
+        "CORPUS_DIR": str(tmp_path / "corpus"),
+        "ALIGNMENT_CACHE_DIR": str(tmp_path / "alignments"),
+    })
+    yield app
+    app.extensions["jobs"].shutdown()
+    app.extensions["plots"].shutdown()
+
+
+def wait_for_job(client, status_url, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        payload = client.get(status_url).get_json()
+        if payload["status"] not in ("queued", "running"):
+            return payload
+        time.sleep(0.05)
+    raise AssertionError("job did not finish")
+
+
+def test_png_requests_wait_only_for_pending_renders(local_app, tmp_path):
+    local_app.config["PLOT_WAIT_SECONDS"] = 3
+    client = local_app.test_client()
+    out_dir = tmp_path / "1ABC"
+    out_dir.mkdir()
+    # drawn before plots had a .key sidecar
+    (out_dir / "old.png").write_bytes(b"\x89PNG old")
+
+    started = time.monotonic()
+    assert client.get("/outputs/1ABC/nothere.png").status_code == 404
+    old = client.get("/outputs/1ABC/old.png")
+    assert old.status_code == 200 and old.data == b"\x89PNG old"
+    assert time.monotonic() - started < 1
+
+    # another worker is still rendering it
+    (out_dir / "busy.png.rendering").touch()
+    assert client.get("/outputs/1ABC/busy.png").status_code == 503
+
+
+def test_job_submit_poll_and_result(local_app):
+    client = local_app.test_client()
+    resp = client.post("/api/jobs", data={"pdb_id1": "1abc"})
+    assert resp.status_code == 202
+    job = resp.get_json()
+    assert job["status"] in ("queued", "running", "done")
+
+    done = wait_for_job(client, job["status_url"])
+    assert done["status"] == "done"
+    page = client.get(done["result_url"])
+    assert page.status_code == 200
+    assert "Analysis Results: 1ABC" in page.get_data(as_text=True)
+
+    # plots render in the background and are served once ready
+    png = client.get("/outputs/1ABC/1ABC_ca_scatter.png")
+    assert png.status_code == 200
+    assert png.data.startswith(b"\x89PNG")
+
+    # same input reuses the finished job instead of recomputing
+    again = client.post("/api/jobs", data={"pdb_id1": "1ABC"})
+    assert again.get_json()["job_id"] == job["job_id"]
+    assert again.get_json()["status"] == "done"
+
+
+def test_job_result_survives_restart(local_app, tmp_path):
+    client = local_app.test_client()
+    job = client.post("/api/jobs", data={"pdb_id1": "1ABC"}).get_json()
+    wait_for_job(client, job["status_url"])
+
+    fresh = create_app({
+        "TESTING": True,
+        "OUTPUT_DIR": str(tmp_path),
+        "RESULT_CACHE_PATH": str(tmp_path / "results.sqlite"),
+        "STRUCTURE_STORE_DIR": str(tmp_path / "store"),
+        "SEQUENCE_INDEX_PATH": str(tmp_path / "sequences.sqlite"),
+        "CORPUS_DIR": str(tmp_path / "corpus"),
+        "ALIGNMENT_CACHE_DIR": str(tmp_path / "alignments"),
+    })
+    status = fresh.test_client().get(job["status_url"]).get_json()
+    assert status["status"] == "done"
+    fresh.extensions["jobs"].shutdown()
+
+
+def test_job_invalid_and_unknown(local_app):
+    client = local_app.test_client()
+    resp = client.post("/api/jobs", data={"pdb_id1": "ABC"})
+    assert resp.status_code == 400
+    assert client.get("/api/jobs/deadbeef").status_code == 404
+
+
+def test_mutation_metrics_cached(local_app, monkeypatch):
+    client = local_app.test_client()
+    first = client.get("/api/mutation_metrics/1ABC/A1C")
+    assert first.status_code == 200
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached result should be reused")
+
+    monkeypatch.setattr(mutation, "model_mutation", fail)
+    second = client.get("/api/mutation_metrics/1ABC/A1C")
+    assert second.get_json() == first.get_json()
+
+    stats = client.get("/api/cache_stats").get_json()["mutation_metrics"]
+    assert stats["memory_hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_mutation_metrics_served_from_batch_results(
+        local_app, monkeypatch, tmp_path):
+    # a batch run writes results for the same file content
+    path = tmp_path / "1ABC.pdb"
+    path.write_text(PDB_FIXTURE)
+    local_app.extensions["result_cache"].put(
+        "1ABC", io_utils.file_checksum(str(path)), "A1G", 1.23456, 0.5
+    )
+    fresh = create_app({
+        "TESTING": True,
+        "OUTPUT_DIR": str(tmp_path),
+        "RESULT_CACHE_PATH": str(tmp_path / "results.sqlite"),
+        "STRUCTURE_STORE_DIR": str(tmp_path / "store"),
+        "SEQUENCE_INDEX_PATH": str(tmp_path / "sequences.sqlite"),
+        "CORPUS_DIR": str(tmp_path / "corpus"),
+        "ALIGNMENT_CACHE_DIR": str(tmp_path / "alignments"),
+    })
+    monkeypatch.setattr(mutation, "model_mutation", None)
+    payload = fresh.test_client().get(
+        "/api/mutation_metrics/1ABC/A1G"
+    ).get_json()
+    assert payload["rmsd"] == 1.235
+    stats = fresh.extensions["result_cache"].stats()
+    assert stats["disk_hits"] == 1
+    fresh.extensions["jobs"].shutdown()
+
+
+def test_bulk_mutation_metrics_json(local_app):
+    client = local_app.test_client()
+    resp = client.post(
+        "/api/mutation_metrics/1ABC",
+        json=["A1C", "A1G", "A7C", {"residue_number": 1, "mutated": "W"}],
+    )
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/x-ndjson"
+    records = [json.loads(line) for line in resp.data.splitlines()]
+    assert [r["index"] for r in records] == [0, 1, 2, 3]
+    assert records[0]["status"] == "success"
+    assert records[2]["status"].startswith("error: Residue A7")
+    assert records[3]["mutation"] == "A1W"
+
+    # results were written to the cache shared with the single endpoint
+    single = client.get("/api/mutation_metrics/1ABC/A1C").get_json()
+    assert single["rmsd"] == round(records[0]["rmsd"], 3)
+    stats = local_app.extensions["result_cache"].stats()
+    assert stats["memory_hits"] == 1
+
+
+def test_bulk_mutation_metrics_csv_upload(local_app):
+    client = local_app.test_client()
+    csv_text = (
+        "residue_number,original,mutated,category\n"
+        "1,A,C,test\n"
+        "5,A,C,test\n"
+    )
+    resp = client.post(
+        "/api/mutation_metrics/1ABC",
+        data={"file": (io.BytesIO(csv_text.encode()), "m.csv")},
+        content_type="multipart/form-data",
+    )
+    records = [json.loads(line) for line in resp.data.splitlines()]
+    assert records[0]["mutation"] == "A1C"
+    assert records[0]["category"] == "test"
+    assert records[1]["status"] == "residue_not_found"
+
+
+def test_bulk_mutation_metrics_bad_input(local_app):
+    client = local_app.test_client()
+    resp = client.post("/api/mutation_metrics/1ABC", json={"x": 1})
+    assert resp.status_code == 400
+
+
+def test_structure_data_endpoints(local_app, tmp_path):
+    import analysis
+
+    coords = np.arange(300, dtype=np.float32).reshape(100, 3) / 7
+    analysis.save_arrays(str(tmp_path), "1ABC", "sum1", coords,
+                         [(-60.0, -45.0), (-120.0, 130.0)])
+    client = local_app.test_client()
+
+    resp = client.get("/api/structure/1abc/ca")
+    assert resp.status_code == 200
+    assert resp.headers["X-Array-Shape"] == "100,3"
+    values = np.frombuffer(resp.data, dtype="<f4").reshape(100, 3)
+    assert np.array_equal(values, coords)
+
+    etag = resp.headers["ETag"]
+    again = client.get("/api/structure/1ABC/ca",
+                       headers={"If-None-Match": etag})
+    assert again.status_code == 304 and not again.data
+
+    lod = client.get("/api/structure/1ABC/ca?lod=10")
+    assert lod.headers["X-Array-Shape"] == "10,3"
+    assert lod.headers["ETag"] != etag
+    for bad in ("-3", "abc", "1.5", ""):
+        resp = client.get(f"/api/structure/1ABC/ca?lod={bad}")
+        assert resp.status_code == 400, bad
+        assert "lod" in resp.get_json()["error"]
+
+    js = client.get("/api/structure/1ABC/dihedrals?format=json",
+                    headers={"Accept-Encoding": "gzip"})
+    assert js.headers["Content-Encoding"] == "gzip"
+    payload = json.loads(gzip.decompress(js.data))
+    assert payload == {"columns": ["phi", "psi"],
+                       "phi": [-60.0, -120.0], "psi": [-45.0, 130.0]}
+
+    assert client.get("/api/structure/1ABC/bonds").status_code == 404
+
+
+def test_result_page_loads_plot_data_async(local_app):
+    client = local_app.test_client()
+    job = client.post("/api/jobs", data={"pdb_id1": "1ABC"}).get_json()
+    done = wait_for_job(client, job["status_url"])
+    html = client.get(done["result_url"]).get_data(as_text=True)
+    assert 'data-ca-url="/api/structure/1ABC/ca' in html
+    assert "scatter3d" not in html
+    data = client.get("/api/structure/1ABC/ca")
+    assert data.headers["X-Array-Shape"] == "1,3"
+
+
+def test_serve_file_repeat_visits_transfer_few_bytes(local_app, tmp_path):
+    from benchmarks.synthetic import synthetic_cif
+
+    out_dir = tmp_path / "1ABC"
+    out_dir.mkdir()
+    raw = synthetic_cif(n_atoms=2000).encode()
+    (out_dir / "1ABC.cif").write_bytes(raw)
+    (out_dir / "1ABC.cif.gz").write_bytes(gzip.compress(raw))
+    client = local_app.test_client()
+    url = "/outputs/1ABC/1ABC.cif"
+
+    transferred = []
+    first = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(first.data) == raw
+    assert first.headers["Last-Modified"]
+    transferred.append(len(first.data))
+
+    for _ in range(3):
+        repeat = client.get(url, headers={
+            "Accept-Encoding": "gzip",
+            "If-None-Match": first.headers["ETag"],
+        })
+        assert repeat.status_code == 304
+        transferred.append(len(repeat.data))
+    assert transferred[0] < len(raw) / 3
+    assert transferred[1:] == [0, 0, 0]
+
+    plain = client.get(url)
+    assert "Content-Encoding" not in plain.headers
+    assert plain.data == raw
+    assert "Accept-Encoding" in plain.headers["Vary"]
+
+    part = client.get(url, headers={"Range": "bytes=0-99"})
+    assert part.status_code == 206
+    assert part.data == raw[:100]
+
+
+def test_serve_file_versioned_urls_are_immutable(local_app, tmp_path):
+    out_dir = tmp_path / "1ABC"
+    out_dir.mkdir()
+    (out_dir / "1ABC.pdb").write_text(PDB_FIXTURE)
+    client = local_app.test_client()
+    version = io_utils.file_checksum(str(out_dir / "1ABC.pdb"))[:16]
+
+    versioned = client.get(f"/outputs/1ABC/1ABC.pdb?v={version}")
+    cache_control = versioned.headers["Cache-Control"]
+    assert "immutable" in cache_control and "max-age=31536000" in cache_control
+
+    stale = client.get("/outputs/1ABC/1ABC.pdb?v=0000")
+    assert "no-cache" in stale.headers["Cache-Control"]
+    assert client.get("/outputs/1ABC/missing.pdb").status_code == 404
+
+
+def test_import_app_defers_heavy_dependencies():
+    code = (
+        "import sys, app; "
+        "print(sorted(m for m in ('matplotlib', 'Bio.PDB', 'requests') "
+        "if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        check=True,
+    ).stdout
+    assert out.strip() == "[]"
+
+
+def test_preloaded_structures_are_reused(local_app, monkeypatch, tmp_path):
+    pdb_list = tmp_path / "pdb_list.txt"
+    pdb_list.write_text("1abc   # fixture\n\n# comment only\n")
+    preloaded = create_app({
+        "TESTING": True,
+        "OUTPUT_DIR": str(tmp_path),
+        "RESULT_CACHE_PATH": str(tmp_path / "results.sqlite"),
+        "STRUCTURE_STORE_DIR": str(tmp_path / "store"),
+        "SEQUENCE_INDEX_PATH": str(tmp_path / "sequences.sqlite"),
+        "CORPUS_DIR": str(tmp_path / "corpus"),
+        "ALIGNMENT_CACHE_DIR": str(tmp_path / "alignments"),
+        "PRELOAD_STRUCTURES": True,
+        "PDB_LIST_PATH": str(pdb_list),
+    })
+    gc.unfreeze()
+    structures = preloaded.extensions["structures"]
+    assert list(structures) == [str(tmp_path / "1ABC" / "1ABC.pdb")]
+
+    def fail(path):
+        raise AssertionError("preloaded structure should be reused")
+
+    monkeypatch.setattr(app_module, "parse_structure", fail)
+    payload = preloaded.test_client().get("/api/metrics/1ABC").get_json()
+    assert payload["total_residues"] == 1
+
+
+def test_server_timing_and_prometheus_metrics(local_app):
+    client = local_app.test_client()
+    resp = client.get("/api/metrics/1ABC")
+    assert resp.status_code == 200
+    stages = dict(
+        part.split(";dur=")
+        for part in resp.headers["Server-Timing"].split(", ")
+    )
+    assert {"parse", "count_residues", "center_of_mass",
+            "total"} <= set(stages)
+    assert float(stages["total"]) >= float(stages["parse"])
+
+    client.get("/api/mutation_metrics/1ABC/A1C")
+    client.get("/api/mutation_metrics/1ABC/A1C")
+    body = client.get("/metrics").get_data(as_text=True)
+    assert ("# TYPE protein_explorer_stage_duration_seconds histogram"
+            in body)
+    assert ('protein_explorer_stage_duration_seconds_bucket'
+            '{stage="parse",le="+Inf"}') in body
+    assert ('protein_explorer_request_duration_seconds_count'
+            '{endpoint="api_metrics"}') in body
+    assert ('protein_explorer_result_cache_lookups_total'
+            '{result="memory_hits"} 1') in body
+
+
+def test_sequence_search_indexes_parsed_structures(local_app):
+    client = local_app.test_client()
+    assert client.get("/api/search?seq=A1C").status_code == 400
+    assert client.get("/api/search").status_code == 400
+
+    client.get("/api/metrics/1ABC")  # stored structures are indexed
+    payload = client.get("/api/search?seq=mktay").get_json()
+    assert payload["query"] == "MKTAY"
+    assert payload["matches"] == payload["similar"] == []
+    assert payload["index"]["structures"] == 1
+    assert local_app.extensions["sequence_index"].sequence_of(
+        "1ABC", "A") is not None
+    assert local_app.extensions["corpus"].pdb_ids() == ["1ABC"]
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+import io_utils  # noqa: E402
+from asgi import create_asgi_app  # noqa: E402
+from benchmarks.loadtest import AsgiServer, pdb_ids  # noqa: E402
+from benchmarks.rcsb_standin import StandInServer  # noqa: E402
+
+LATENCY = 0.5
+
+
+@pytest.fixture
+def standin():
+    with StandInServer(latency=LATENCY, n_atoms=300) as server:
+        yield server
+
+
+@pytest.fixture
+def serve(standin, tmp_path, monkeypatch):
+    """Start the ASGI app (one view thread) against the stand-in."""
+    cache_dir = tmp_path / "cifs"
+    cache_dir.mkdir()
+    monkeypatch.setattr(io_utils, "RCSB_BASE_URL", standin.base_url)
+    monkeypatch.setattr(io_utils, "CACHE_DIR", str(cache_dir))
+    servers = []
+
+    def start():
+        app = create_asgi_app({
+            "TESTING": True,
+            "OUTPUT_DIR": str(tmp_path / "outputs"),
+            "RESULT_CACHE_PATH": str(tmp_path / "results.sqlite"),
+            "STRUCTURE_STORE_DIR": str(tmp_path / "store"),
+            "SEQUENCE_INDEX_PATH": str(tmp_path / "sequences.sqlite"),
+            "CORPUS_DIR": str(tmp_path / "corpus"),
+            "ALIGNMENT_CACHE_DIR": str(tmp_path / "alignments"),
+        }, cpu_workers=1, retry_backoff=0.01)
+        servers.append(AsgiServer(app).start())
+        return servers[-1].url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def get_all(urls):
+    with ThreadPoolExecutor(max_workers=len(urls)) as pool:
+        return list(pool.map(lambda url: requests.get(url, timeout=60),
+                             urls))
+
+
+def test_cold_downloads_overlap(serve, standin):
+    url = serve()
+    ids = pdb_ids("7", 8)
+    started = time.perf_counter()
+    responses = get_all([f"{url}/api/metrics/{i}" for i in ids])
+    elapsed = time.perf_counter() - started
+
+    assert [r.status_code for r in responses] == [200] * len(ids)
+    assert {r.json()["pdb_id"] for r in responses} == set(ids)
+    # one view thread: serial downloads would take len(ids) * LATENCY
+    assert elapsed < len(ids) * LATENCY / 2
+    assert standin.stats["requests"] == len(ids)
+
+
+def test_concurrent_requests_share_one_download(serve, standin):
+    url = serve()
+    responses = get_all([f"{url}/api/mutation_metrics/7ABC/A2G"] * 4)
+    assert [r.status_code for r in responses] == [200] * 4
+    assert standin.stats["requests"] == 1
+
+
+def test_failed_download_is_reported_without_a_view_thread(
+        serve, standin, monkeypatch):
+    url = serve()
+    monkeypatch.setattr(io_utils, "RCSB_BASE_URL", standin.base_url + "/x")
+    resp = requests.get(f"{url}/api/metrics/7NON", timeout=60)
+    assert resp.status_code == 404
+    assert "Failed to download PDB 7NON" in resp.json()["error"]
+    assert requests.get(f"{url}/api/metrics/bad!",
+                        timeout=60).status_code in (400, 404)
+
+
+def test_form_post_prefetches(serve, standin):
+    url = serve()
+    resp = requests.post(url + "/", data={"pdb_id1": "7frm"}, timeout=60)
+    assert resp.status_code == 200
+    assert "Analysis Results: 7FRM" in resp.text
+    assert standin.stats["requests"] == 1
@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+import io_utils  # noqa: E402
+from benchmarks.loadtest import Workload, pdb_ids  # noqa: E402
+from benchmarks.rcsb_standin import StandInServer  # noqa: E402
+from benchmarks.suite import compare, run_suite  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_suite_runs_on_small_structure():
+    current = run_suite([400], repeat=1, log=lambda line: None)
+    assert set(current["results"]) == {
+        f"{name}@400" for name in (
+            "parse", "center_of_mass", "ca_extraction", "phi_psi",
+            "pairwise_rmsd", "pairwise_rmsd_warm", "single_mutation",
+            "batch_throughput",
+        )
+    }
+    assert current["results"]["batch_throughput@400"]["rows_per_sec"] > 0
+    assert current["meta"]["python"]
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {"results": {"a@1": {"seconds": 1.0},
+                            "b@1": {"seconds": 1.0},
+                            "tiny@1": {"seconds": 0.0001}}}
+    current = {"results": {"a@1": {"seconds": 1.2},
+                           "b@1": {"seconds": 1.3},
+                           "tiny@1": {"seconds": 0.001},
+                           "new@1": {"seconds": 5.0}}}
+    rows = {r["benchmark"]: r for r in compare(current, baseline, 0.25)}
+    assert set(rows) == {"a@1", "b@1", "tiny@1"}
+    assert not rows["a@1"]["regression"]
+    assert rows["b@1"]["regression"]
+    assert not rows["tiny@1"]["regression"]  # below the noise floor
+
+
+def test_download_retries_through_standin_failures(tmp_path, monkeypatch):
+    with StandInServer(fail_first=1, n_atoms=200) as standin:
+        monkeypatch.setattr(io_utils, "RCSB_BASE_URL", standin.base_url)
+        monkeypatch.setattr(io_utils, "CACHE_DIR", str(tmp_path))
+        path = io_utils.download_cif("1ABC", str(tmp_path / "out"))
+        assert standin.stats["failures"] == 1
+        assert standin.stats["requests"] == 2
+    structure = io_utils.parse_structure(path)
+    assert sum(1 for _ in structure.get_atoms()) > 0
+
+
+def test_workload_mixes_warm_and_cold_ids():
+    warm = pdb_ids("8", 3)
+    assert warm == ["8000", "8001", "8002"]
+    workload = Workload({"metrics": 1}, warm, cold_fraction=0.5, seed=1)
+    ids = [workload.next()[2].rsplit("/", 1)[1] for _ in range(50)]
+    cold = [i for i in ids if i not in warm]
+    assert 0 < len(cold) < 50
+    assert len(set(cold)) == len(cold)
+
+
+def test_loadtest_runs_end_to_end(tmp_path):
+    report_path = tmp_path / "report.json"
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.loadtest", "--requests", "12",
+         "--concurrency", "3", "--warm-ids", "2", "--atoms", "300",
+         "--cold-fraction", "0.25", "--failure-rate", "0.1",
+         "--output", str(report_path)],
+        cwd=ROOT, check=True, capture_output=True, timeout=300,
+    )
+    report = json.loads(report_path.read_text())
+    assert report["overall"]["requests"] == 12
+    assert report["overall"]["errors"] == 0
+    assert report["overall"]["p99_ms"] >= report["overall"]["p50_ms"]
+    assert report["standin"]["requests"] > 0
@@ -0,0 +1,163 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+import corpus  # noqa: E402
+from corpus import INDEX_DTYPE, Corpus  # noqa: E402
+from benchmarks.synthetic import write_synthetic  # noqa: E402
+from io_utils import parse_structure  # noqa: E402
+from metrics import get_atomic_mass  # noqa: E402
+from structure_store import StructureStore  # noqa: E402
+
+
+def first_model_metrics(path):
+    """(centre of mass, Cα count, radius of gyration) from Biopython."""
+    from Bio.PDB import is_aa
+
+    model = next(parse_structure(path).get_models())
+    atoms = list(model.get_atoms())
+    coords = np.array([a.get_coord() for a in atoms], dtype=np.float64)
+    masses = np.array([get_atomic_mass(a.element) for a in atoms])
+    com = np.average(coords, axis=0, weights=masses)
+    rg = np.sqrt(np.average(((coords - com) ** 2).sum(axis=1),
+                            weights=masses))
+    n_ca = sum(a.get_id() == "CA" and is_aa(a.get_parent()) for a in atoms)
+    return com, n_ca, rg
+
+
+@pytest.fixture
+def structures(tmp_path):
+    cache = tmp_path / "cifs"
+    cache.mkdir()
+    sizes = {"1AAA": 300, "2BBB": 1200, "3CCC": 5000, "4DDD": 320}
+    for i, (pdb_id, n_atoms) in enumerate(sizes.items()):
+        ext = ".pdb" if i % 2 else ".cif"
+        write_synthetic(str(cache / f"{pdb_id.lower()}{ext}"),
+                        n_atoms=n_atoms, n_chains=1 + i % 3, n_models=2)
+    return cache
+
+
+@pytest.mark.parametrize("chunk_atoms", [1 << 22, 1000])
+def test_metrics_match_biopython(tmp_path, structures, monkeypatch,
+                                 chunk_atoms):
+    monkeypatch.setattr(corpus, "CHUNK_ATOMS", chunk_atoms)
+    store = StructureStore(str(tmp_path / "store"))
+    c = Corpus(str(tmp_path / "corpus"))
+    assert c.build(str(structures), store) == 4
+    assert c.pdb_ids() == ["1AAA", "2BBB", "3CCC", "4DDD"]
+
+    coms, counts, radii = (c.centers_of_mass(), c.ca_counts(),
+                           c.radii_of_gyration())
+    for name in os.listdir(structures):
+        pdb_id = name.split(".")[0].upper()
+        com, n_ca, rg = first_model_metrics(str(structures / name))
+        assert np.allclose(coms[pdb_id], com, atol=1e-3)
+        assert counts[pdb_id] == n_ca
+        assert radii[pdb_id] == pytest.approx(rg, abs=1e-3)
+
+    one = c.structure("2BBB")
+    assert len(one["coords"]) == c.entry("2BBB")["n_atoms"]
+    assert one["is_ca"].sum() == counts["2BBB"]
+    assert one["atom_residue"].max() < len(one["residues"])
+
+
+def test_nearest_ranks_similar_structures(tmp_path, structures):
+    c = Corpus(str(tmp_path / "corpus"))
+    c.build(str(structures), StructureStore(str(tmp_path / "store")))
+
+    ranked = c.nearest("1aaa")
+    assert [r["pdb_id"] for r in ranked][:1] == ["4DDD"]
+    assert [r["pdb_id"] for r in ranked][-1] == "3CCC"
+    assert len(c.nearest("1AAA", limit=1)) == 1
+
+
+def test_incremental_adds_and_readers(tmp_path, structures):
+    root = str(tmp_path / "corpus")
+    reader = Corpus(root)
+    assert len(reader) == 0 and reader.ca_counts() == {}
+
+    corpus_writer = Corpus(root)
+    store = StructureStore(str(tmp_path / "store"),
+                           on_add=corpus_writer.add_arrays)
+    store.get(str(structures / "1aaa.cif"), "1AAA")
+    assert reader.pdb_ids() == ["1AAA"]
+    first = reader.ca_counts()
+
+    # the same file again is skipped; other structures are appended
+    assert corpus_writer.build(str(structures), store) == 3
+    assert len(reader) == 4
+    assert reader.ca_counts()["1AAA"] == first["1AAA"]
+
+    # a changed file supersedes the older record of its PDB ID
+    write_synthetic(str(structures / "1aaa.cif"), n_atoms=2000)
+    assert corpus_writer.build(str(structures), store) == 1
+    stats = reader.stats()
+    assert stats["structures"] == 4 and stats["records"] == 5
+    assert reader.ca_counts()["1AAA"] > first["1AAA"]
+    assert reader.ca_counts()["1AAA"] == first_model_metrics(
+        str(structures / "1aaa.cif"))[1]
+
+
+def test_partial_write_is_discarded(tmp_path, structures):
+    root = tmp_path / "corpus"
+    c = Corpus(str(root))
+    c.build(str(structures), StructureStore(str(tmp_path / "store")))
+    expected = c.radii_of_gyration()
+
+    # a writer that died mid-append leaves data without an index record
+    # and possibly a torn index record
+    with open(root / "coords.f32", "ab") as f:
+        f.write(b"\x00" * 120)
+    with open(root / "index.bin", "ab") as f:
+        f.write(b"\x00" * (INDEX_DTYPE.itemsize // 2))
+    assert Corpus(str(root)).radii_of_gyration() == expected
+
+    write_synthetic(str(structures / "5eee.cif"), n_atoms=800)
+    c.build(str(structures), StructureStore(str(tmp_path / "store")))
+    fresh = Corpus(str(root))
+    assert fresh.pdb_ids()[-1] == "5EEE"
+    assert fresh.ca_counts()["5EEE"] == first_model_metrics(
+        str(structures / "5eee.cif"))[1]
+    assert {k: v for k, v in fresh.radii_of_gyration().items()
+            if k != "5EEE"} == expected
+
+
+def test_cli(tmp_path, structures, capsys):
+    args = ["--corpus", str(tmp_path / "corpus")]
+    assert corpus.main(args + ["build", "--cache-dir", str(structures),
+                               "--store-dir", str(tmp_path / "store")]) == 0
+    assert "Added 4 structures" in capsys.readouterr().out
+
+    assert corpus.main(args + ["ca"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split("\t")[0] for line in lines] == [
+        "1AAA", "2BBB", "3CCC", "4DDD"]
+
+    assert corpus.main(args + ["com"]) == 0
+    assert len(capsys.readouterr().out.splitlines()[0].split("\t")) == 4
+
+    assert corpus.main(args + ["nearest", "1AAA", "--limit", "2"]) == 0
+    assert capsys.readouterr().out.startswith("4DDD\t")
+    assert corpus.main(args + ["nearest", "9ZZZ"]) == 1
+
+
+def test_app_and_corpus_work_without_fcntl(tmp_path):
+    # as on Windows: the lock module is only imported by writers
+    code = (
+        "import sys; sys.modules['fcntl'] = None; "
+        "import app; from corpus import Corpus; "
+        f"print(len(Corpus({str(tmp_path / 'corpus')!r})))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        check=True,
+    ).stdout
+    assert out.strip() == "0"
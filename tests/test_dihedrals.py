@@ -0,0 +1,54 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+from benchmarks.bench_phi_psi import ppbuilder_phi_psi  # noqa: E402
+from benchmarks.synthetic import write_synthetic  # noqa: E402
+from dihedrals import compute_backbone_dihedrals  # noqa: E402
+from explorer import get_phi_psi  # noqa: E402
+from io_utils import parse_structure  # noqa: E402
+from test_explorer import PDB_CONTENT1, write_pdb  # noqa: E402
+
+
+def test_phi_psi_matches_ppbuilder_on_fixture(tmp_path):
+    struct = parse_structure(write_pdb(PDB_CONTENT1, tmp_path, "p.pdb"))
+    assert get_phi_psi(struct) == ppbuilder_phi_psi(struct)
+
+
+@pytest.mark.parametrize("name", ["multi.pdb", "multi.cif"])
+def test_phi_psi_matches_ppbuilder_multichain(tmp_path, name):
+    path = write_synthetic(
+        str(tmp_path / name), n_atoms=3000, n_chains=3, n_models=2,
+        break_every=20,
+    )
+    struct = parse_structure(path)
+    new = get_phi_psi(struct)
+    ref = ppbuilder_phi_psi(struct)
+    assert len(new) == len(ref) > 0
+    assert np.allclose(new, ref, atol=1e-6)
+
+
+def test_peptide_breaks_and_optional_angles(tmp_path):
+    path = write_synthetic(
+        str(tmp_path / "b.pdb"), n_atoms=300, break_every=10
+    )
+    result = compute_backbone_dihedrals(
+        parse_structure(path), omega=True, chi1=True
+    )
+    phi, psi = result["phi"], result["psi"]
+    # residue 11 starts a new segment: no phi there, no psi before it
+    assert np.isnan(phi[10]) and np.isnan(psi[9])
+    assert np.isnan(phi[0]) and np.isnan(psi[-1])
+    assert np.allclose(phi[1:9], -57.0, atol=0.1)
+    assert np.allclose(psi[1:9], -47.0, atol=0.1)
+    assert np.allclose(np.abs(result["omega"][:9]), 180.0, atol=0.1)
+    # ALA (index 0) and GLY (index 3) have no chi1, SER (index 1) does
+    chi1 = result["chi1"]
+    assert np.isnan(chi1[0]) and np.isnan(chi1[3])
+    assert chi1[1] == pytest.approx(-60.0, abs=0.1)
@@ -78,21 +78,13 @@ def test_plot_and_mutation(tmp_path):
     assert isinstance(rmsd, float)
 
 
-def test_fetch_uniprot_variants(monkeypatch):
-    class FakeResp:
-        def __init__(self, data):
-            self._data = data
-
-        def json(self):
-            return self._data
-
-        def raise_for_status(self):
-            pass
-
-    def fake_get(url, timeout=10):
-        return FakeResp({'features': [{'type': 'VARIANT', 'location': {
-            'start': 1}, 'description': 'mut'}]})
-
-    monkeypatch.setattr('requests.get', fake_get)
-    variants = fetch_uniprot_variants('P01234')
+def test_fetch_uniprot_variants(monkeypatch, tmp_path):
+    import config
+    from benchmarks.uniprot_standin import UniProtStandIn, make_entry
+
+    entry = make_entry('P01234', 'MKV', [(1, 'M', 'V')])
+    monkeypatch.setattr(config, 'VARIANT_CACHE_DIR', str(tmp_path))
+    with UniProtStandIn({'P01234': entry}) as standin:
+        monkeypatch.setattr(config, 'UNIPROT_BASE_URL', standin.base_url)
+        variants = fetch_uniprot_variants('P01234')
     assert variants and variants[0]['position'] == 1
@@ -0,0 +1,49 @@
+import os
+import sys
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+import instrumentation  # noqa: E402
+from instrumentation import Histogram, timed  # noqa: E402
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = Histogram("t_seconds", "Test.", "stage", buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        hist.observe("parse", seconds)
+    lines = hist.render()
+    assert 't_seconds_bucket{stage="parse",le="0.1"} 2' in lines
+    assert 't_seconds_bucket{stage="parse",le="1.0"} 3' in lines
+    assert 't_seconds_bucket{stage="parse",le="+Inf"} 4' in lines
+    assert 't_seconds_count{stage="parse"} 4' in lines
+    assert 't_seconds_sum{stage="parse"} 3.650000' in lines
+
+
+def test_timed_collects_request_timings():
+    @timed("unit_stage")
+    def work(x):
+        return x * 2
+
+    token = instrumentation.start_request()
+    assert work(2) == 4 and work(3) == 6
+    timings = instrumentation.end_request(token)
+    seconds, calls = timings["unit_stage"]
+    assert calls == 2 and seconds >= 0
+    header = instrumentation.server_timing(timings, total=0.5)
+    assert header.startswith("unit_stage;dur=")
+    assert header.endswith("total;dur=500.0")
+
+
+def test_disabled_records_nothing(monkeypatch):
+    monkeypatch.setattr(instrumentation, "enabled", False)
+
+    @timed("disabled_stage")
+    def work():
+        return 1
+
+    token = instrumentation.start_request()
+    work()
+    assert instrumentation.end_request(token) == {}
+    assert "disabled_stage" not in instrumentation.render_metrics()
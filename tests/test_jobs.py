@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+from jobs import JobQueue  # noqa: E402
+
+
+def wait_until(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+def test_other_workers_see_queued_and_running_jobs(tmp_path):
+    release = threading.Event()
+    calls = []
+
+    def work(name):
+        calls.append(name)
+        release.wait(10)
+        return {"name": name}
+
+    # two worker processes sharing the job store
+    accepting = JobQueue(work, str(tmp_path), max_workers=1)
+    other = JobQueue(work, str(tmp_path), max_workers=1)
+    try:
+        job = accepting.submit("1ABC")
+        wait_until(lambda: other.get(job.id).status == "running")
+        assert other.submit("1ABC").status == "running"
+
+        release.set()
+        wait_until(lambda: other.get(job.id).status == "done")
+        assert other.get(job.id).result == {"name": "1ABC"}
+        assert calls == ["1ABC"]
+    finally:
+        release.set()
+        accepting.shutdown()
+        other.shutdown()
+
+
+def test_abandoned_and_failed_jobs_are_rerun(tmp_path):
+    queue = JobQueue(lambda name: {"name": name}, str(tmp_path),
+                     stale_after=60)
+    job_id = queue.job_id("1ABC")
+    # left "running" by a worker that died long ago
+    with open(tmp_path / f"{job_id}.json", "w", encoding="utf-8") as f:
+        json.dump({"args": ["1ABC"], "status": "running",
+                   "updated": time.time() - 120}, f)
+    assert queue.get(job_id).status == "failed"
+    job = queue.submit("1ABC")
+    wait_until(lambda: queue.get(job_id).status == "done")
+    assert JobQueue(None, str(tmp_path)).get(job_id).result == {
+        "name": "1ABC"}
+
+    failing = JobQueue(lambda name: 1 / 0, str(tmp_path / "failing"))
+    job = failing.submit("2ABC")
+    wait_until(lambda: not job.pending)
+    stored = JobQueue(None, str(tmp_path / "failing")).get(job.id)
+    assert stored.status == "failed" and "division" in stored.error
+    queue.shutdown()
+    failing.shutdown()
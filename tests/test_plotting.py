@@ -0,0 +1,98 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+from plotting import (  # noqa: E402
+    PlotRenderer,
+    downsample,
+    plot_ramachandran,
+    render_ca_scatter,
+)
+
+
+def test_plots_are_content_keyed(tmp_path):
+    png = str(tmp_path / "ca.png")
+    coords = np.random.default_rng(0).normal(size=(50, 3))
+    assert render_ca_scatter(coords, png) is True
+    mtime = os.stat(png).st_mtime_ns
+    # same data: nothing is drawn
+    assert render_ca_scatter(coords, png) is False
+    assert os.stat(png).st_mtime_ns == mtime
+    # changed data or options: redrawn
+    assert render_ca_scatter(coords + 1.0, png) is True
+    assert render_ca_scatter(coords + 1.0, png, max_points=10) is True
+    assert render_ca_scatter(coords + 1.0, png, max_points=10,
+                             force=True) is True
+
+
+def test_downsample_bounds_points():
+    points = np.arange(3000).reshape(1000, 3)
+    sampled = downsample(points, 100)
+    assert sampled.shape == (100, 3)
+    assert (sampled[0] == points[0]).all()
+    assert (sampled[-1] == points[-1]).all()
+    assert downsample(points, None).shape == (1000, 3)
+
+
+def test_renderer_runs_in_background(tmp_path):
+    renderer = PlotRenderer(max_workers=2, max_points=500)
+    angles = [(-60.0, -45.0)] * 2000
+    rama = str(tmp_path / "rama.png")
+    first = renderer.ramachandran(angles, rama)
+    second = renderer.ramachandran(angles, rama)
+    assert first is second or second.result() is False
+    assert renderer.wait(rama, timeout=30)
+    assert os.path.getsize(rama) > 0
+    # up to date now, so a fresh submission draws nothing
+    assert renderer.ramachandran(angles, rama).result() is False
+    assert plot_ramachandran(angles, rama, max_points=500) is False
+    renderer.shutdown()
+
+
+def test_wait_only_blocks_on_pending_renders(tmp_path):
+    import threading
+    import time
+
+    renderer = PlotRenderer()
+    png = str(tmp_path / "ca.png")
+    marker = png + ".rendering"
+    # nothing is rendering: no waiting, whether or not the file exists
+    started = time.monotonic()
+    assert renderer.wait(png, timeout=5)
+    assert time.monotonic() - started < 1
+
+    # queued by another worker process, which leaves a marker file
+    open(marker, "w").close()
+    assert not renderer.wait(png, timeout=0.2)
+    coords = np.random.default_rng(0).normal(size=(50, 3))
+
+    def other_worker():
+        render_ca_scatter(coords, png)
+        os.remove(marker)
+
+    other = threading.Timer(0.3, other_worker)
+    other.start()
+    assert renderer.wait(png, timeout=30)
+    assert os.path.exists(png)
+    other.join()
+
+    # the marker of a worker that died is ignored once stale
+    open(marker, "w").close()
+    os.utime(marker, (0, 0))
+    assert renderer.wait(png, timeout=5)
+
+    # renders in this process mark the path until they finish
+    os.remove(marker)
+    future = renderer.ca_scatter(coords + 1.0, png)
+    assert os.path.exists(marker) or future.done()
+    assert renderer.wait(png, timeout=30) and future.result() is True
+    deadline = time.monotonic() + 5
+    while os.path.exists(marker):  # removed by the done callback
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    renderer.shutdown()
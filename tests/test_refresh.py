@@ -0,0 +1,159 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+import io_utils  # noqa: E402
+import refresh  # noqa: E402
+from app import create_app  # noqa: E402
+from benchmarks.rcsb_standin import StandInServer  # noqa: E402
+from test_app import wait_for_job  # noqa: E402
+
+IDS = ["7AAA", "7BBB", "7CCC"]
+
+
+@pytest.fixture
+def cached(tmp_path, monkeypatch):
+    """Start a stand-in and return a function caching IDS through the app."""
+    cache_dir = tmp_path / "cifs"
+    cache_dir.mkdir()
+    monkeypatch.setattr(io_utils, "CACHE_DIR", str(cache_dir))
+    servers = []
+
+    def start(**kwargs):
+        standin = StandInServer(n_atoms=300, **kwargs).start()
+        servers.append(standin)
+        monkeypatch.setattr(io_utils, "RCSB_BASE_URL", standin.base_url)
+        app = create_app({
+            "TESTING": True,
+            "OUTPUT_DIR": str(tmp_path / "outputs"),
+            "RESULT_CACHE_PATH": str(tmp_path / "results.sqlite"),
+            "STRUCTURE_STORE_DIR": str(tmp_path / "store"),
+            "SEQUENCE_INDEX_PATH": str(tmp_path / "sequences.sqlite"),
+            "CORPUS_DIR": str(tmp_path / "corpus"),
+            "ALIGNMENT_CACHE_DIR": str(tmp_path / "alignments"),
+        })
+        client = app.test_client()
+        for pdb_id in IDS:
+            assert client.get(f"/api/metrics/{pdb_id}").status_code == 200
+            assert client.get(
+                f"/api/mutation_metrics/{pdb_id}/A2G").status_code == 200
+        return standin, app
+
+    yield start
+    for standin in servers:
+        standin.stop()
+
+
+def refresh_ids(app, pdb_ids=IDS):
+    return refresh.refresh(
+        pdb_ids, app.config["OUTPUT_DIR"], app.extensions["result_cache"],
+        app.extensions["structure_store"], concurrency=4, backoff=0.01,
+        log=lambda message: None,
+    )
+
+
+def test_only_revised_entries_are_downloaded(cached):
+    standin, app = cached()
+    assert io_utils.read_validators(io_utils.cached_path("7AAA"))["etag"]
+    store, results = (app.extensions["structure_store"],
+                      app.extensions["result_cache"])
+    before = {e["pdb_id"]: e["checksum"] for e in store.entries()}
+    totals = {p: app.test_client().get(f"/api/metrics/{p}")
+              .get_json()["total_residues"] for p in IDS}
+
+    requests = standin.stats["requests"]
+    assert refresh_ids(app) == dict.fromkeys(IDS, "unchanged")
+    assert standin.stats["requests"] - requests == len(IDS)
+    assert standin.stats["not_modified"] == len(IDS)
+
+    standin.revise("7BBB")
+    assert refresh_ids(app) == {"7AAA": "unchanged", "7BBB": "updated",
+                                "7CCC": "unchanged"}
+    outputs = app.config["OUTPUT_DIR"]
+    assert not os.path.exists(os.path.join(outputs, "7BBB"))
+    assert os.path.exists(os.path.join(outputs, "7AAA", "7AAA.cif"))
+    assert store.load(before["7BBB"]) is None
+    assert store.load(before["7AAA"]) is not None
+    assert results.get("7BBB", before["7BBB"], "A2G") is None
+    assert results.get("7AAA", before["7AAA"], "A2G") is not None
+
+    # the new version is served and analysed, then revalidates as 304
+    client = app.test_client()
+    payload = client.get("/api/metrics/7BBB").get_json()
+    assert payload["total_residues"] > totals["7BBB"]
+    assert client.get("/api/metrics/7AAA").get_json()["total_residues"] \
+        == totals["7AAA"]
+    assert refresh_ids(app, ["7BBB"]) == {"7BBB": "unchanged"}
+
+
+def test_without_validators_content_is_compared(cached):
+    standin, app = cached(validators=False)
+    assert io_utils.read_validators(io_utils.cached_path("7AAA")) == {}
+
+    standin.revise("7CCC")
+    assert refresh_ids(app) == {"7AAA": "unchanged", "7BBB": "unchanged",
+                                "7CCC": "updated"}
+    assert standin.stats["not_modified"] == 0
+    assert os.path.exists(
+        os.path.join(app.config["OUTPUT_DIR"], "7AAA", "7AAA.cif"))
+
+
+def test_missing_and_failed_entries(cached):
+    standin, app = cached()
+    standin.fail_first = 100
+    outcomes = refresh.refresh(["7aaa", "9ZZZ"], app.config["OUTPUT_DIR"],
+                               backoff=0.001, log=lambda message: None)
+    assert outcomes == {"7AAA": "failed", "9ZZZ": "missing"}
+    # nothing was invalidated for the failed check
+    assert os.path.exists(
+        os.path.join(app.config["OUTPUT_DIR"], "7AAA", "7AAA.cif"))
+
+
+def test_cli_refreshes_the_whole_cache(cached, tmp_path, capsys):
+    standin, app = cached()
+    standin.revise("7AAA")
+    args = ["--all", "--output-dir", app.config["OUTPUT_DIR"],
+            "--result-cache", app.config["RESULT_CACHE_PATH"],
+            "--store-dir", app.config["STRUCTURE_STORE_DIR"]]
+    assert refresh.cached_ids(io_utils.CACHE_DIR) == IDS
+    assert refresh.main(args) == 0
+    out = capsys.readouterr().out
+    assert "7AAA: updated" in out
+    assert "1 updated, 2 unchanged, 0 missing, 0 failed" in out
+
+    list_path = tmp_path / "ids.txt"
+    list_path.write_text("7BBB  # comment\n")
+    assert refresh.main(["--list", str(list_path)] + args[1:]) == 0
+    assert "1 unchanged" in capsys.readouterr().out
+
+
+def test_resubmitted_job_uses_the_revised_entry(cached):
+    standin, app = cached()
+    client = app.test_client()
+    form = {"pdb_id1": "7AAA", "pdb_id2": "7BBB"}
+    job = client.post("/api/jobs", data=form).get_json()
+    done = wait_for_job(client, job["status_url"])
+    assert done["status"] == "done"
+    outputs = app.config["OUTPUT_DIR"]
+    assert os.path.exists(os.path.join(outputs, "RMSD_7AAA_7BBB.txt"))
+    old_page = client.get(done["result_url"]).get_data(as_text=True)
+
+    standin.revise("7BBB")
+    assert refresh_ids(app, ["7BBB"]) == {"7BBB": "updated"}
+    assert not os.path.exists(os.path.join(outputs, "RMSD_7AAA_7BBB.txt"))
+    # the finished job is gone, so the same input runs again
+    again = client.post("/api/jobs", data=form).get_json()
+    assert again["job_id"] == job["job_id"]
+    assert again["status"] in ("queued", "running")
+    done = wait_for_job(client, again["status_url"])
+    assert done["status"] == "done"
+    assert client.get(done["result_url"]).get_data(as_text=True) \
+        != old_page
+    png = client.get("/outputs/7BBB/7BBB_ca_scatter.png")
+    assert png.status_code == 200
+    app.extensions["jobs"].shutdown()
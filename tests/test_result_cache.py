@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+from result_cache import ResultCache  # noqa: E402
+
+
+def test_lru_and_disk_tiers(tmp_path):
+    db = str(tmp_path / "r.sqlite")
+    cache = ResultCache(db, maxsize=1)
+    assert cache.get("1ake", "abc", "A13A") is None
+    cache.put("1ake", "abc", "A13A", 2.84461234, 0.0025)
+    cache.put("1AKE", "abc", "A36A", 4.4566, 0.0063)
+
+    # A13A was evicted from the LRU but is still on disk
+    assert cache.get("1AKE", "abc", "A13A") == (2.84461234, 0.0025)
+    assert cache.get("1AKE", "abc", "A13A") == (2.84461234, 0.0025)
+    stats = cache.stats()
+    assert (stats["misses"], stats["disk_hits"], stats["memory_hits"]) \
+        == (1, 1, 1)
+    assert stats["memory_entries"] == 1
+
+    # another process sees the same entries
+    other = ResultCache(db)
+    assert other.get("1AKE", "abc", "A36A") == (4.4566, 0.0063)
+
+
+def test_checksum_and_algorithm_are_part_of_key(tmp_path):
+    db = str(tmp_path / "r.sqlite")
+    ResultCache(db).put("1AKE", "abc", "A13A", 1.0, 2.0)
+    assert ResultCache(db).get("1AKE", "def", "A13A") is None
+    assert ResultCache(db, algorithm="next").get(
+        "1AKE", "abc", "A13A"
+    ) is None
@@ -0,0 +1,167 @@
+import os
+import csv
+import sys
+import pstats
+
+import pytest
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+import config  # noqa: E402
+import run_mutation_batch  # noqa: E402
+from benchmarks.synthetic import write_synthetic  # noqa: E402
+from columnar_results import read_results  # noqa: E402
+from visualize_mutation_metrics import PLOT_COLUMNS, load_results  # noqa
+
+
+@pytest.fixture
+def batch_dir(monkeypatch, tmp_path):
+    def fake_download(pdb_id, out_dir):
+        write_synthetic(os.path.join(out_dir, "SYNT.pdb"), n_atoms=200)
+        return "SYNT.pdb", "pdb"
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, "RESULT_CACHE_PATH",
+                        str(tmp_path / "results.sqlite"))
+    monkeypatch.setattr(run_mutation_batch, "download_structure",
+                        fake_download)
+    with open("in.csv", "w") as f:
+        f.write("residue_number,original,mutated,category\n")
+        for pos in (2, 3, 4, 999):
+            f.write(f"{pos},X,A,test\n")
+    return tmp_path
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_timing_columns_and_profile(batch_dir, capsys, workers):
+    run_mutation_batch.main([
+        "--pdb", "SYNT", "--input", "in.csv", "--output", "out.csv",
+        "--timing", "--profile", "run.prof", "--workers", workers,
+    ])
+    with open("out.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["status"] for r in rows] == ["success"] * 3 + [
+        "residue_not_found"]
+    for column in run_mutation_batch.TIMING_COLUMNS[1:]:
+        assert all(float(r[column]) >= 0 for r in rows[:3])
+    assert rows[3]["mutate_ms"] == ""
+    # the wild type is parsed by the first row only
+    assert float(rows[0]["parse_ms"]) >= 0
+    assert [r["parse_ms"] for r in rows[1:]] == [""] * 3
+
+    out = capsys.readouterr().out
+    assert "rows/sec" in out and "p95" in out
+    stats = pstats.Stats("run.prof")
+    assert any(func[2] == "process_row" for func in stats.stats)
+
+
+def test_partitioned_parquet_output(batch_dir):
+    for pdb_id in ("SYNT", "1234"):
+        run_mutation_batch.main([
+            "--pdb", pdb_id, "--input", "in.csv", "--output", "results",
+            "--partition-by-pdb", "--timing",
+        ])
+    assert sorted(os.listdir("results")) == ["pdb_id=1234", "pdb_id=SYNT"]
+
+    full = read_results("results", pdb_id="1234")
+    assert full["residue_number"].tolist() == [2, 3, 4, 999]
+    assert full["status"].tolist()[-1] == "residue_not_found"
+    assert full["rmsd"].dtype == "float64" and full["rmsd"].isna().iloc[-1]
+    assert full["category"].tolist() == ["test"] * 4
+    assert (full["mutate_ms"].iloc[:3] >= 0).all()
+
+    plotted = load_results("results", pdb_id="synt")
+    assert list(plotted.columns) == PLOT_COLUMNS
+    assert plotted["residue_number"].tolist() == [2, 3, 4]
+    # full precision, unlike the 4-decimal CSV
+    assert plotted["rmsd"].tolist() == full["rmsd"].iloc[:3].tolist()
+
+
+def test_shards_merge_back_to_unsharded_output(batch_dir, capsys):
+    with open("in.csv", "a") as f:
+        for pos in range(5, 12):
+            f.write(f"{pos},X,A,test\n")
+    run_mutation_batch.main(["--pdb", "SYNT", "--input", "in.csv",
+                             "--output", "all.csv"])
+    for shard in ("0/3", "1/3", "2/3"):
+        run_mutation_batch.main([
+            "--pdb", "SYNT", "--input", "in.csv", "--shard", shard,
+            "--output", f"shard{shard[0]}.csv", "--workers", "2",
+        ])
+    with open("shard0.csv", newline="") as f:
+        assert next(csv.reader(f))[0] == "row"
+
+    shards = ["shard0.csv", "shard1.csv", "shard2.csv"]
+    run_mutation_batch.main(["--merge", *shards, "--input", "in.csv",
+                             "--output", "merged.csv"])
+    with open("all.csv") as expected, open("merged.csv") as merged:
+        assert merged.read() == expected.read()
+
+    with pytest.raises(SystemExit, match="missing"):
+        run_mutation_batch.main(["--merge", *shards[:2], "--input",
+                                 "in.csv", "--output", "merged.csv"])
+
+
+def test_uniprot_variants_as_batch_input(batch_dir, monkeypatch):
+    from benchmarks.uniprot_standin import UniProtStandIn, make_entry
+    from io_utils import parse_structure
+    from variants import chain_residues
+
+    write_synthetic("wt.pdb", n_atoms=200)
+    residues = chain_residues(parse_structure("wt.pdb"))["A"]
+    sequence = "M" + "".join(residues[n] for n in sorted(residues))
+    entry = make_entry("P00001", sequence, [
+        (pos + 1, residues[pos], "A" if residues[pos] != "A" else "G")
+        for pos in (2, 3, 4)
+    ])
+    monkeypatch.setattr(config, "VARIANT_CACHE_DIR", str(batch_dir / "up"))
+    with UniProtStandIn({"P00001": entry}) as standin:
+        monkeypatch.setattr(config, "UNIPROT_BASE_URL", standin.base_url)
+        run_mutation_batch.main(["--pdb", "SYNT", "--uniprot", "P00001",
+                                 "--output", "out.csv"])
+    with open("variants_SYNT.csv", newline="") as f:
+        assert len(list(csv.DictReader(f))) == 3
+    with open("out.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["mutation"][:2] for r in rows] == ["A2", "A3", "A4"]
+    assert {r["status"] for r in rows} == {"success"}
+    assert rows[0]["accession"] == "P00001"
+    assert rows[0]["uniprot_position"] == "3"
+    assert list(rows[0]).count("chain") == 1
+
+
+def test_wild_type_is_parsed_once_per_file_version(batch_dir, monkeypatch):
+    parses = []
+    parse = run_mutation_batch.parse_structure
+    monkeypatch.setattr(run_mutation_batch, "parse_structure",
+                        lambda path: parses.append(path) or parse(path))
+    run_mutation_batch.main(["--pdb", "SYNT", "--input", "in.csv",
+                             "--output", "out.csv"])
+    assert len(parses) == 1
+    # cache hits need no parse at all
+    run_mutation_batch._wild_types.clear()
+    with open("chains.csv", "w") as f:
+        f.write("residue_number,original,mutated,chain\n2,X,A,A\n")
+    run_mutation_batch.main(["--pdb", "SYNT", "--input", "chains.csv",
+                             "--output", "hits.csv"])
+    assert len(parses) == 1
+
+
+def test_parallel_reads_ahead_a_bounded_number_of_chunks():
+    from concurrent.futures import ThreadPoolExecutor
+
+    pulled = []
+
+    def items():
+        for n in range(100):
+            pulled.append(n)
+            yield n
+
+    with ThreadPoolExecutor(2) as executor:
+        results = run_mutation_batch._ordered_results(
+            executor, lambda n: n * n, items(), in_flight=4)
+        assert next(results) == 0
+        assert len(pulled) == 4
+        assert list(results) == [n * n for n in range(1, 100)]
@@ -0,0 +1,110 @@
+import os
+import sys
+import random
+import time
+
+import pytest
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+import sequence_index  # noqa: E402
+from sequence_index import SequenceIndex  # noqa: E402
+from benchmarks.synthetic import write_synthetic  # noqa: E402
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SequenceIndex(str(tmp_path / "index.sqlite"))
+
+
+def random_sequence(rng, length):
+    return "".join(rng.choice(AMINO_ACIDS) for _ in range(length))
+
+
+def test_add_replaces_older_versions(index):
+    assert index.add("1abc", "sum1", {"A": "MKTAYIAKQR", "B": "GGSGG"})
+    assert not index.add("1ABC", "sum1", {"A": "MKTAYIAKQR"})
+    assert index.has("sum1")
+    assert index.sequence_of("1abc", "B") == "GGSGG"
+
+    assert index.add("1ABC", "sum2", {"A": "WWWWWW"})
+    assert not index.has("sum1")
+    assert index.sequence_of("1ABC", "B") is None
+    assert index.stats() == {"structures": 1, "chains": 1, "kmer_length": 5}
+
+
+def test_motif_search(index):
+    index.add("1AAA", "a", {"A": "MKTAYIAKQRMKTAY", "B": "QQQQQQQQ"})
+    index.add("2BBB", "b", {"A": "PPPMKTAYPPP"})
+
+    assert index.search_motif("mktay") == [
+        {"pdb_id": "1AAA", "chain": "A", "offsets": [0, 10]},
+        {"pdb_id": "2BBB", "chain": "A", "offsets": [3]},
+    ]
+    assert index.search_motif("MKTAYIAK") == [
+        {"pdb_id": "1AAA", "chain": "A", "offsets": [0]},
+    ]
+    # shorter than a k-mer: answered by scanning
+    assert [m["pdb_id"] for m in index.search_motif("QQ")] == ["1AAA"]
+    assert index.search_motif("WWWWW") == []
+    assert len(index.search_motif("MKTAY", limit=1)) == 1
+
+
+def test_similar_ranks_close_sequences_first(index):
+    rng = random.Random(1)
+    query = random_sequence(rng, 120)
+    close = query[:60] + "W" + query[61:]
+    distant = query[:30] + random_sequence(rng, 90)
+    index.add("1CLO", "c", {"A": close})
+    index.add("2DIS", "d", {"A": distant})
+    index.add("3UNR", "u", {"A": random_sequence(rng, 120)})
+
+    ranked = index.search_similar(query)
+    assert [r["pdb_id"] for r in ranked[:2]] == ["1CLO", "2DIS"]
+    assert ranked[0]["score"] > ranked[1]["score"]
+    assert ranked[0]["shared_kmers"] == 116 - 5
+
+
+def test_build_indexes_cache_dir_once(index, tmp_path):
+    cache_dir = tmp_path / "cifs"
+    cache_dir.mkdir()
+    write_synthetic(str(cache_dir / "1SYN.cif"), n_atoms=200)
+    (cache_dir / "notes.txt").write_text("not a structure")
+    (cache_dir / "2BAD.cif").write_text("garbage")
+
+    assert index.build(str(cache_dir), log=lambda message: None) == 1
+    assert index.build(str(cache_dir), log=lambda message: None) == 0
+    sequence = index.sequence_of("1SYN", "A")
+    assert sequence
+    assert index.search_motif(sequence[:8])[0]["pdb_id"] == "1SYN"
+
+
+def test_cli(index, tmp_path, capsys):
+    index.add("1AAA", "a", {"A": "MKTAYIAKQRMKTAY"})
+    args = ["--index", index.db_path]
+    assert sequence_index.main(args + ["motif", "KTAYI"]) == 0
+    assert "1AAA:A\t[1]" in capsys.readouterr().out
+    assert sequence_index.main(args + ["similar", "1AAA:A"]) == 0
+    assert "score 1.000" in capsys.readouterr().out
+    assert sequence_index.main(args + ["similar", "9XXX:A"]) == 1
+
+
+def test_search_is_fast_on_many_chains(index):
+    rng = random.Random(0)
+    chains = {f"{n:04d}": random_sequence(rng, 250) for n in range(3000)}
+    for n in range(0, 3000, 100):
+        index.add(f"P{n:03d}", str(n),
+                  {c: chains[c] for c in list(chains)[n:n + 100]})
+    target = chains["1234"]
+
+    started = time.perf_counter()
+    matches = index.search_motif(target[100:115])
+    similar = index.search_similar(target)
+    elapsed = time.perf_counter() - started
+    assert [m["chain"] for m in matches] == ["1234"]
+    assert similar[0]["chain"] == "1234"
+    assert elapsed < 2.0
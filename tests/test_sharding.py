@@ -0,0 +1,155 @@
+import os
+import csv
+import sys
+import subprocess
+
+import pytest
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+import io_utils  # noqa: E402
+import run_mutation_batch  # noqa: E402
+from benchmarks.rcsb_standin import StandInServer  # noqa: E402
+from sharding import (  # noqa: E402
+    WorkQueue,
+    merge_outputs,
+    parse_shard,
+    row_key,
+    shard_of,
+)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _write_input(path, positions):
+    with open(path, "w") as f:
+        f.write("residue_number,original,mutated,category\n")
+        for pos in positions:
+            f.write(f"{pos},X,A,test\n")
+
+
+def test_parse_shard_and_stable_hash():
+    assert parse_shard("2/8") == (2, 8)
+    for bad in ("8/8", "-1/2", "1", "a/b"):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+    key = row_key("1ake", {"residue_number": "13", "mutated": "A"})
+    assert key == "1AKE:13A"
+    # fixed value: must not change between runs or machines
+    assert shard_of(key, 1000) == shard_of("1AKE:13A", 1000) == 502
+    assert {shard_of(f"1AKE:{n}A", 4) for n in range(100)} == {0, 1, 2, 3}
+
+
+def test_queue_leases_expire_and_merge_checks_rows(tmp_path):
+    _write_input(tmp_path / "in.csv", range(1, 11))
+    first, second = WorkQueue(str(tmp_path / "q")), WorkQueue(
+        str(tmp_path / "q"))
+    first.create(str(tmp_path / "in.csv"), "1ake", chunk_rows=3,
+                 lease_seconds=30)
+    manifest = second.create(str(tmp_path / "in.csv"), "1AKE")
+    assert manifest["chunks"] == 4 and manifest["rows"] == 10
+    with pytest.raises(ValueError):
+        WorkQueue(str(tmp_path / "q")).create(str(tmp_path / "in.csv"),
+                                              "4AKE")
+
+    assert first.claim() == 0
+    assert second.claim() == 1
+    # first node stalls: its lease on chunk 0 is not renewed in time
+    lease = os.path.join(tmp_path, "q", "leases", "chunk-000000")
+    os.utime(lease, (0, 0))
+    assert second.claim() == 0
+
+    fieldnames = ["row", "residue_number", "status"]
+    for chunk in range(4):
+        rows = [dict(r, status="success") for r in second.rows(chunk)]
+        second.complete(chunk, fieldnames, rows)
+    assert second.claim() is None
+    assert second.progress() == (4, 4)
+
+    n, _ = merge_outputs(second.outputs(), 10, str(tmp_path / "m.csv"))
+    with open(tmp_path / "m.csv", newline="") as f:
+        merged = list(csv.DictReader(f))
+    assert n == 10 and "row" not in merged[0]
+    assert [r["residue_number"] for r in merged] == [
+        str(p) for p in range(1, 11)]
+
+    with pytest.raises(ValueError, match="1 missing .*rows 10"):
+        merge_outputs(second.outputs(), 11, str(tmp_path / "m.csv"))
+    with pytest.raises(ValueError, match="3 duplicated"):
+        merge_outputs(second.outputs()[:2] + second.outputs()[1:], 10,
+                      str(tmp_path / "m.csv"))
+
+
+def test_leases_are_only_taken_over_and_dropped_by_their_owner(tmp_path):
+    _write_input(tmp_path / "in.csv", range(1, 5))
+    root = str(tmp_path / "q")
+    first, second, third = WorkQueue(root), WorkQueue(root), WorkQueue(root)
+    for n, queue in enumerate((first, second, third)):
+        queue.node = f"node-{n}"
+    first.create(str(tmp_path / "in.csv"), "1AKE", chunk_rows=2,
+                 lease_seconds=30)
+    for queue in (second, third):
+        queue.open()
+    lease = os.path.join(root, "leases", "chunk-000000")
+
+    assert first.claim() == 0
+    os.utime(lease, (0, 0))
+    assert second.claim() == 0
+    # the first node lost its lease: it may neither renew nor drop it
+    assert not first.renew(0)
+    first.release(0)
+    assert open(lease).read() == "node-1"
+    assert second.renew(0)
+
+    # a node that saw the expired lease before the second node took it
+    # over must not rename the fresh lease away
+    third._lease_expired = lambda path: path == lease
+    assert third.claim() == 1
+    assert open(lease).read() == "node-1"
+    assert sorted(os.listdir(os.path.join(root, "leases"))) == [
+        "chunk-000000", "chunk-000001"]
+
+    second.release(0)
+    assert not os.path.exists(lease)
+
+
+def test_local_processes_share_a_queue(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("cache")
+    _write_input("in.csv", list(range(2, 14)) + [999])
+    with StandInServer(n_atoms=300) as standin:
+        monkeypatch.setattr(io_utils, "RCSB_BASE_URL", standin.base_url)
+        monkeypatch.setattr(io_utils, "CACHE_DIR", str(tmp_path / "cache"))
+        # download once up front; the nodes then find it in the cache
+        io_utils.download_structure("SYNT", os.path.join("outputs", "SYNT"))
+
+        nodes = [
+            subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, "run_mutation_batch.py"),
+                 "--pdb", "SYNT", "--input", "in.csv", "--queue", "queue",
+                 "--chunk-rows", "2"],
+                env=dict(os.environ, RCSB_BASE_URL=standin.base_url,
+                         CACHE_DIR=str(tmp_path / "cache"),
+                         RESULT_CACHE_PATH=str(tmp_path / f"r{n}.sqlite")),
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            )
+            for n in range(3)
+        ]
+        for node in nodes:
+            out, _ = node.communicate(timeout=300)
+            assert node.returncode == 0, out.decode()
+
+        run_mutation_batch.main(["--pdb", "SYNT", "--input", "in.csv",
+                                 "--output", "single.csv"])
+    run_mutation_batch.main(["--merge", "queue", "--input", "in.csv",
+                             "--output", "merged.csv"])
+
+    with open("single.csv", newline="") as f:
+        single = list(csv.DictReader(f))
+    with open("merged.csv", newline="") as f:
+        merged = list(csv.DictReader(f))
+    assert merged == single
+    assert merged[-1]["status"] == "residue_not_found"
+    assert len(os.listdir(os.path.join("queue", "leases"))) == 0
@@ -0,0 +1,80 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+from benchmarks.synthetic import write_synthetic  # noqa: E402
+from explorer import (  # noqa: E402
+    count_residues,
+    get_ca_coordinates,
+    get_chain_sequences,
+    get_phi_psi,
+)
+from io_utils import parse_structure  # noqa: E402
+from metrics import compute_center_of_mass  # noqa: E402
+from structure_store import StructureStore  # noqa: E402
+from test_explorer import PDB_CONTENT1, write_pdb  # noqa: E402
+
+
+@pytest.mark.parametrize("name", ["multi.pdb", "multi.cif"])
+def test_metrics_on_stored_arrays_match_biopython(tmp_path, name):
+    path = write_synthetic(
+        str(tmp_path / name), n_atoms=2000, n_chains=3, n_models=2,
+        break_every=15,
+    )
+    struct = parse_structure(path)
+    stored = StructureStore(str(tmp_path / "store")).get(path, "MULT")
+
+    assert count_residues(stored) == count_residues(struct)
+    assert get_chain_sequences(stored) == get_chain_sequences(struct)
+    assert get_ca_coordinates(stored) == get_ca_coordinates(struct)
+    assert get_phi_psi(stored) == get_phi_psi(struct)
+    assert np.array_equal(compute_center_of_mass(stored),
+                          compute_center_of_mass(struct))
+
+
+def test_other_workers_attach_without_parsing(tmp_path):
+    path = write_pdb(PDB_CONTENT1, tmp_path, "1abc.pdb")
+    StructureStore(str(tmp_path)).get(path, "1ABC")
+
+    def fail(path):
+        raise AssertionError("stored arrays should be reused")
+
+    # a second process sees the same files and maps them read-only
+    other = StructureStore(str(tmp_path))
+    stored = other.get(path, parse=fail)
+    assert isinstance(stored.coords, np.memmap)
+    assert not stored.coords.flags.writeable
+    assert count_residues(stored) == (1, {"A": 1})
+    assert [e["pdb_id"] for e in other.entries()] == ["1ABC"]
+
+
+def test_concurrent_writers_keep_one_entry(tmp_path):
+    path = write_pdb(PDB_CONTENT1, tmp_path, "1abc.pdb")
+    struct = parse_structure(path)
+    first, second = StructureStore(str(tmp_path)), StructureStore(
+        str(tmp_path))
+    a = first.add(struct, "abc", "1ABC")
+    b = second.add(struct, "abc", "1ABC")
+    assert np.array_equal(a.coords, b.coords)
+    assert os.listdir(first.root) == ["abc"]
+
+
+def test_checksum_memo_keeps_one_entry_per_file(tmp_path):
+    import io_utils
+
+    path = tmp_path / "1abc.pdb"
+    digests = set()
+    entries = len(io_utils._CHECKSUMS)
+    for n in range(5):
+        path.write_text(f"REMARK {n}\n")
+        os.utime(path, ns=(n, n))
+        digests.add(io_utils.file_checksum(str(path)))
+        assert io_utils.file_checksum(str(path)) in digests
+    assert len(digests) == 5
+    assert len(io_utils._CHECKSUMS) == entries + 1
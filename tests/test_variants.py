@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+import variants  # noqa: E402
+from benchmarks.synthetic import write_synthetic  # noqa: E402
+from benchmarks.uniprot_standin import UniProtStandIn, make_entry  # noqa
+from io_utils import parse_structure  # noqa: E402
+
+
+@pytest.fixture
+def structure(tmp_path):
+    path = write_synthetic(str(tmp_path / "wt.pdb"), n_atoms=200)
+    return parse_structure(path)
+
+
+def _entry_for(structure, accession="P00001", prefix="MSG"):
+    """Entry whose sequence is chain A preceded by ``prefix``."""
+    residues = variants.chain_residues(structure)["A"]
+    sequence = prefix + "".join(residues[n] for n in sorted(residues))
+    offset = len(prefix) - min(residues) + 1
+    wt2 = residues[2]
+    return make_entry(accession, sequence, [
+        (2 + offset, wt2, "A" if wt2 != "A" else "G"),  # maps to A2
+        (3 + offset, "W" if residues[3] != "W" else "Y", "A"),  # wrong WT
+        (1, "M", "A"),  # in the prefix, not in the structure
+    ]), offset
+
+
+def test_parse_entry_keeps_single_residue_substitutions():
+    entry = make_entry("P1", "MKV", [(2, "K", "E"), (3, "V", "*")])
+    entry["features"].append({"type": "Chain", "location": {
+        "start": {"value": 1}, "end": {"value": 3}}})
+    record = variants.parse_entry(entry)
+    assert record["sequence"] == "MKV"
+    assert record["variants"] == [
+        {"position": 2, "original": "K", "mutated": "E", "id": "VAR_000000"}]
+
+
+def test_map_variants_uses_offset_and_checks_wild_type(structure):
+    entry, offset = _entry_for(structure)
+    record = variants.parse_entry(entry)
+    residues = variants.chain_residues(structure)["A"]
+    assert variants.residue_offset(record["sequence"], residues) == offset
+    assert variants.residue_offset("W" * 50, residues) is None
+
+    rows = variants.map_variants(structure, {"P00001": record})
+    assert [(r["chain"], r["residue_number"], r["uniprot_position"])
+            for r in rows] == [("A", 2, 2 + offset)]
+    assert rows[0]["accession"] == "P00001"
+
+
+def test_fetch_caches_and_revalidates(tmp_path, structure):
+    entry, _ = _entry_for(structure)
+    cache_dir = str(tmp_path / "uniprot")
+    with UniProtStandIn({"P00001": entry}, latency=0.05) as standin:
+        def fetch(accessions, ttl):
+            return variants.fetch_variants(
+                accessions, base_url=standin.base_url, cache_dir=cache_dir,
+                ttl=ttl, max_concurrency=3)
+
+        many = [f"Q{n:05d}" for n in range(12)]
+        records = fetch(["P00001", "p00001 "] + many, ttl=3600)
+        assert set(records) == {"P00001", *many}
+        assert standin.stats["requests"] == 13
+        assert 1 < standin.stats["max_in_flight"] <= 3
+
+        # fresh: served from disk without a request
+        assert fetch(["P00001"], ttl=3600)["P00001"] == records["P00001"]
+        assert standin.stats["requests"] == 13
+
+        # expired: revalidated with the stored ETag and answered by a 304
+        assert fetch(["P00001"], ttl=0)["P00001"]["variants"] == \
+            records["P00001"]["variants"]
+        assert standin.stats["requests"] == 14
+        assert standin.stats["not_modified"] == 1
+
+        # endpoint failing: the stale entry is still used
+        stale = variants.fetch_variants(
+            ["P00001"], base_url=standin.base_url + "/gone",
+            cache_dir=cache_dir, ttl=0)
+        assert stale["P00001"]["variants"] == records["P00001"]["variants"]
+    with open(os.path.join(cache_dir, "P00001.json")) as f:
+        assert json.load(f)["etag"] == '"v1"'
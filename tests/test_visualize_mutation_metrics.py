@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(
+    0,
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+)
+import visualize_mutation_metrics as viz  # noqa: E402
+
+
+def _results(n_positions, pdb_ids=("1AKE",)):
+    rows = [
+        {"pdb_id": pdb_id, "residue_number": pos, "original": "K",
+         "mutated": aa, "chain": chain, "rmsd": pos / 10,
+         "com_shift": 0.01, "status": "success"}
+        for pdb_id in pdb_ids
+        for chain in ("A", "B")
+        for pos in range(1, n_positions + 1)
+        for aa in ("A", "W")
+    ]
+    return pd.DataFrame(rows)
+
+
+def test_make_labels_is_vectorized_and_handles_missing_chain():
+    df = pd.DataFrame({"residue_number": [13, 36], "original": ["K", "R"],
+                       "mutated": ["A", "A"], "chain": ["A", None]})
+    assert viz.make_labels(df).tolist() == ["AK13A", "R36A"]
+    assert viz.make_labels(df.drop(columns="chain")).tolist() == [
+        "K13A", "R36A"]
+
+
+def test_heatmap_grids_place_values_by_position_and_substitution():
+    df = pd.DataFrame({"residue_number": [5, 7, 7], "original": "K",
+                       "mutated": ["A", "W", "Z"], "chain": "A",
+                       "rmsd": [1.0, 2.0, 3.0]})
+    aas, grids = viz.heatmap_grids(df, "rmsd")
+    assert aas[-1] == "Z"  # non-standard letters are appended
+    first, grid = grids["A"]
+    assert first == 5 and grid.shape == (21, 3)
+    assert grid[aas.index("A"), 0] == 1.0
+    assert grid[aas.index("W"), 2] == 2.0
+    assert np.isnan(grid[:, 1]).all()
+
+
+def test_heatmap_grids_skip_failed_rows(tmp_path):
+    df = _results(4)
+    failed = {"pdb_id": "1AKE", "residue_number": 999, "original": "K",
+              "mutated": "A", "chain": "", "rmsd": None, "com_shift": None,
+              "status": "residue_not_found"}
+    path = tmp_path / "results.csv"
+    pd.concat([df, pd.DataFrame([failed])]).to_csv(path, index=False)
+    aas, grids = viz.heatmap_grids(viz.load_results(str(path)), "rmsd")
+    assert sorted(grids) == ["A", "B"]
+    assert grids["A"][1].shape == (len(aas), 4)
+
+
+def test_main_renders_heatmaps_per_pdb_in_parallel(tmp_path):
+    path = tmp_path / "results.csv"
+    _results(60, pdb_ids=("1AKE", "4AKE")).to_csv(path, index=False)
+    written = viz.main(str(path), str(tmp_path / "plots"), workers=2)
+    assert sorted(os.path.basename(p) for p in written) == [
+        f"{pdb}_{stem}_heatmap.png" for pdb in ("1AKE", "4AKE")
+        for stem in ("mutation_com_shift", "mutation_rmsd")
+    ]
+    assert all(os.path.getsize(p) > 0 for p in written)
+
+
+def test_small_inputs_keep_bar_plots(tmp_path):
+    df = _results(3).drop(columns="pdb_id")
+    df.to_csv(tmp_path / "results.csv", index=False)
+    written = viz.main(str(tmp_path / "results.csv"), str(tmp_path))
+    assert sorted(os.path.basename(p) for p in written) == [
+        "mutation_com_shift.png", "mutation_rmsd.png"]
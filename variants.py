@@ -0,0 +1,243 @@
+"""
+Bulk retrieval of UniProt variants, mapped onto structure residues.
+
+Entries are fetched from ``config.UNIPROT_BASE_URL`` by a bounded thread
+pool sharing one keep-alive session, and cached on disk as one small JSON
+file per accession (sequence plus single-residue variants, not the full
+entry). A cached entry younger than the TTL is used as is; an older one
+is revalidated with ``If-None-Match``/``If-Modified-Since`` so unchanged
+entries cost a 304 and no download. If UniProt cannot be reached, stale
+entries are still returned.
+
+UniProt positions are mapped onto PDB residue numbers per chain by the
+residue-number offset that best explains the chain's sequence.
+"""
+import os
+import json
+import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import config
+from instrumentation import count_cache
+
+VARIANT_FEATURE_TYPES = ("Natural variant",)
+AMINO_ACIDS = set("ACDEFGHIKLMNPQRSTVWY")
+# Seed length and minimum identity for matching a chain to a sequence
+SEED_LENGTH = 5
+MIN_IDENTITY = 0.9
+VARIANT_COLUMNS = ["residue_number", "original", "mutated", "chain",
+                   "accession", "uniprot_position", "variant_id"]
+
+
+def _position(location: dict, end: str) -> Optional[int]:
+    value = location.get(end)
+    if isinstance(value, dict):
+        value = value.get("value")
+    return value if isinstance(value, int) else None
+
+
+def parse_entry(entry: dict) -> dict:
+    """Sequence and single-residue substitutions of a UniProtKB entry."""
+    variants = []
+    for feature in entry.get("features", []):
+        if feature.get("type") not in VARIANT_FEATURE_TYPES:
+            continue
+        location = feature.get("location", {})
+        start = _position(location, "start")
+        if start is None or _position(location, "end") not in (start, None):
+            continue
+        alternative = feature.get("alternativeSequence", {})
+        original = alternative.get("originalSequence", "")
+        for mutated in alternative.get("alternativeSequences", []):
+            if len(original) == 1 and mutated in AMINO_ACIDS:
+                variants.append({
+                    "position": start,
+                    "original": original,
+                    "mutated": mutated,
+                    "id": feature.get("featureId", ""),
+                })
+    return {
+        "accession": entry.get("primaryAccession", ""),
+        "sequence": entry.get("sequence", {}).get("value", ""),
+        "variants": variants,
+    }
+
+
+class VariantCache:
+    """Parsed UniProt entries on disk, one JSON file per accession."""
+
+    def __init__(self, root: str, ttl: float):
+        self.root = root
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, accession: str) -> str:
+        return os.path.join(self.root, f"{accession}.json")
+
+    def get(self, accession: str) -> Optional[dict]:
+        try:
+            with open(self._path(accession), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, record: dict) -> bool:
+        return time.time() - record["fetched_at"] < self.ttl
+
+    def put(self, accession: str, record: dict) -> None:
+        path = self._path(accession)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+
+def _fetch_one(accession: str, cache: VariantCache, session,
+               base_url: str) -> Optional[dict]:
+    import requests
+
+    cached = cache.get(accession)
+    if cached is not None and cache.is_fresh(cached):
+        count_cache("uniprot", True)
+        return cached
+    headers = {}
+    if cached is not None:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        resp = session.get(f"{base_url}/{accession}.json", headers=headers,
+                           timeout=30)
+        if resp.status_code == 304 and cached is not None:
+            count_cache("uniprot", True)
+            cached["fetched_at"] = time.time()
+            cache.put(accession, cached)
+            return cached
+        resp.raise_for_status()
+        record = parse_entry(resp.json())
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Warning: Failed to fetch UniProt entry {accession}: {e}")
+        return cached
+    count_cache("uniprot", False)
+    record.update(
+        accession=record["accession"] or accession,
+        fetched_at=time.time(),
+        etag=resp.headers.get("ETag"),
+        last_modified=resp.headers.get("Last-Modified"),
+    )
+    cache.put(accession, record)
+    return record
+
+
+def fetch_variants(accessions, base_url: Optional[str] = None,
+                   cache_dir: Optional[str] = None,
+                   ttl: Optional[float] = None,
+                   max_concurrency: Optional[int] = None) -> dict:
+    """
+    ``{accession: {"sequence", "variants", ...}}`` for every accession
+    that could be fetched or was cached; failures are skipped with a
+    warning. At most ``max_concurrency`` requests are in flight at once.
+    """
+    from io_utils import _get_session
+
+    base_url = (base_url or config.UNIPROT_BASE_URL).rstrip("/")
+    cache = VariantCache(cache_dir or config.VARIANT_CACHE_DIR,
+                         config.VARIANT_CACHE_TTL if ttl is None else ttl)
+    workers = max_concurrency or config.UNIPROT_MAX_CONCURRENCY
+    unique = list(dict.fromkeys(a.strip().upper() for a in accessions
+                                if a.strip()))
+    session = _get_session(pool_size=workers)
+    with session, ThreadPoolExecutor(max_workers=workers) as pool:
+        records = pool.map(
+            lambda a: _fetch_one(a, cache, session, base_url), unique
+        )
+        return {a: r for a, r in zip(unique, records) if r is not None}
+
+
+def chain_residues(structure) -> dict:
+    """``{chain: {residue number: one-letter code}}`` of the first model."""
+    from Bio.PDB import is_aa
+    from Bio.SeqUtils import seq1
+
+    residues: dict = {}
+    model = next(structure.get_models())
+    for chain in model:
+        numbered = {
+            res.id[1]: seq1(res.get_resname())
+            for res in chain
+            if is_aa(res) and res.id[0] == " " and res.id[2] == " "
+        }
+        if numbered:
+            residues[chain.id] = numbered
+    return residues
+
+
+def residue_offset(sequence: str, residues: dict,
+                   min_identity: float = MIN_IDENTITY) -> Optional[int]:
+    """
+    Offset with ``UniProt position = residue number + offset`` for one
+    chain, or None if no offset matches ``min_identity`` of the chain's
+    residues. Candidates come from exact k-mer matches of runs of
+    consecutively numbered residues.
+    """
+    seeds: dict = {}
+    for i in range(len(sequence) - SEED_LENGTH + 1):
+        seeds.setdefault(sequence[i:i + SEED_LENGTH], []).append(i + 1)
+    numbers = sorted(residues)
+    candidates: Counter = Counter()
+    for i in range(len(numbers) - SEED_LENGTH + 1):
+        window = numbers[i:i + SEED_LENGTH]
+        if window[-1] - window[0] != SEED_LENGTH - 1:
+            continue
+        kmer = "".join(residues[n] for n in window)
+        for position in seeds.get(kmer, ()):
+            candidates[position - window[0]] += 1
+
+    best, best_identity = None, 0.0
+    for offset, _ in candidates.most_common(5):
+        matches = sum(
+            1 for n, aa in residues.items()
+            if 0 < n + offset <= len(sequence)
+            and sequence[n + offset - 1] == aa
+        )
+        identity = matches / len(residues)
+        if identity > best_identity:
+            best, best_identity = offset, identity
+    return best if best_identity >= min_identity else None
+
+
+def map_variants(structure, records: dict) -> list[dict]:
+    """
+    Batch input rows (``VARIANT_COLUMNS``) for every variant whose
+    position maps onto a chain residue with the expected wild type.
+    """
+    residues = chain_residues(structure)
+    rows = []
+    seen = set()
+    for accession, record in sorted(records.items()):
+        for chain, numbered in sorted(residues.items()):
+            offset = residue_offset(record["sequence"], numbered)
+            if offset is None:
+                continue
+            for variant in record["variants"]:
+                number = variant["position"] - offset
+                key = (chain, number, variant["mutated"])
+                if numbered.get(number) != variant["original"] \
+                        or key in seen:
+                    continue
+                seen.add(key)
+                rows.append({
+                    "residue_number": number,
+                    "original": variant["original"],
+                    "mutated": variant["mutated"],
+                    "chain": chain,
+                    "accession": accession,
+                    "uniprot_position": variant["position"],
+                    "variant_id": variant["id"],
+                })
+    rows.sort(key=lambda r: (r["chain"], r["residue_number"], r["mutated"]))
+    return rows
@@ -1,25 +1,45 @@
 """
 Визуализация результатов пакетного расчёта мутаций:
- - строит два барплота: RMSD и смещение COM по каждой мутации
+ - барплоты RMSD и смещения COM по каждой мутации (для небольших наборов)
+ - тепловые карты «позиция остатка × замена» по цепям (для больших)
 """
 import os
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from columnar_results import is_parquet, read_results
 
-def plot_metrics(df, col, title, ylabel, out_file):
-    # сортировка по позиции для стабильного порядка
-    df = df.sort_values(["residue_number"], kind="mergesort").copy()
+# столбцы, которые нужны для графиков (проекция при чтении Parquet)
+PLOT_COLUMNS = ["pdb_id", "residue_number", "original", "mutated", "chain",
+                "rmsd", "com_shift"]
+# (столбец, заголовок, подпись оси, имя файла)
+METRICS = [
+    ("rmsd", "RMSD for single-point mutations", "RMSD (Å)",
+     "mutation_rmsd"),
+    ("com_shift", "Center-of-mass shift for mutations", "ΔCOM (Å)",
+     "mutation_com_shift"),
+]
+AMINO_ACIDS = list("ACDEFGHIKLMNPQRSTVWY")
+# больше мутаций барплот не вмещает; --kind auto переключается на heatmap
+BAR_MAX_ROWS = 200
 
-    # читаемые подписи: <orig><pos><mut>, с цепью при необходимости
-    def make_label(r):
-        chain = (str(r.get("chain") or "")).strip()
-        pos = int(r["residue_number"])
-        return f"{chain}{r['original']}{pos}{r['mutated']}" \
-            if chain else f"{r['original']}{pos}{r['mutated']}"
 
-    df["label"] = df.apply(make_label, axis=1)
+def make_labels(df):
+    """Подписи <chain><orig><pos><mut> для всех строк сразу."""
+    chain = (df["chain"].fillna("").astype(str).str.strip()
+             if "chain" in df else "")
+    return (chain + df["original"].astype(str)
+            + df["residue_number"].astype(int).astype(str)
+            + df["mutated"].astype(str))
+
+
+def plot_metrics(df, col, title, ylabel, out_file):
+    # сортировка по позиции для стабильного порядка
+    df = df.sort_values(["residue_number"], kind="mergesort")
 
     # X как индексы, чтобы подписи не «съезжали»
     x = range(len(df))
@@ -27,7 +47,7 @@ def plot_metrics(df, col, title, ylabel, out_file):
 
     plt.figure(figsize=(11, 6))
     plt.bar(x, y, alpha=0.8)
-    plt.xticks(x, df["label"], rotation=45, ha="right")
+    plt.xticks(x, make_labels(df), rotation=45, ha="right")
     plt.title(title)
     plt.xlabel("Mutation")
     plt.ylabel(ylabel)
@@ -37,33 +57,116 @@ def plot_metrics(df, col, title, ylabel, out_file):
     print(f"Saved plot: {out_file}")
 
 
-def main(input_csv, out_dir="plots"):
-    os.makedirs(out_dir, exist_ok=True)
-    df = pd.read_csv(input_csv)
-
-    # RMSD
-    plot_metrics(
-        df,
-        "rmsd",
-        title="RMSD for single-point mutations",
-        ylabel="RMSD (Å)",
-        out_file=os.path.join(
-            out_dir,
-            "mutation_rmsd.png"
-        )
-    )
+def heatmap_grids(df, col):
+    """
+    Возвращает (aa, {chain: (first_residue, grid)}), где grid[i, j] —
+    значение для замены на aa[i] в остатке first_residue + j (NaN, если
+    такой мутации нет). Неуспешные строки (без цепи и значений)
+    отбрасываются, чтобы не давать пустую панель.
+    """
+    if "status" in df:
+        df = df[df["status"] == "success"]
+    mutated = df["mutated"].astype(str)
+    aas = AMINO_ACIDS + sorted(set(mutated.unique()) - set(AMINO_ACIDS))
+    rows = pd.Index(aas).get_indexer(mutated)
+    positions = df["residue_number"].to_numpy(dtype=np.int64)
+    values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+    chains = (df["chain"].fillna("").astype(str).str.strip()
+              if "chain" in df else pd.Series("", index=df.index))
+
+    grids = {}
+    for chain, idx in sorted(chains.groupby(chains).indices.items()):
+        first = positions[idx].min()
+        grid = np.full((len(aas), positions[idx].max() - first + 1), np.nan)
+        grid[rows[idx], positions[idx] - first] = values[idx]
+        grids[chain] = (int(first), grid)
+    return aas, grids
+
+
+def plot_heatmap(df, col, title, label, out_file):
+    aas, grids = heatmap_grids(df, col)
+    if not grids:
+        print(f"No rows to plot for {out_file}")
+        return
+    vmax = max((np.nanmax(grid) for _, grid in grids.values()
+                if not np.isnan(grid).all()), default=None)
 
-    # COM shift
-    plot_metrics(
-        df,
-        "com_shift",
-        title="Center-of-mass shift for mutations",
-        ylabel="ΔCOM (Å)",
-        out_file=os.path.join(
-            out_dir,
-            "mutation_com_shift.png"
+    fig, axes = plt.subplots(len(grids), 1, squeeze=False,
+                             figsize=(14, 1.5 + 3 * len(grids)),
+                             constrained_layout=True)
+    for ax, (chain, (first, grid)) in zip(axes[:, 0], grids.items()):
+        image = ax.imshow(
+            np.ma.masked_invalid(grid), aspect="auto",
+            interpolation="nearest", cmap="viridis", vmin=0, vmax=vmax,
+            extent=(first - 0.5, first + grid.shape[1] - 0.5,
+                    len(aas) - 0.5, -0.5),
         )
-    )
+        ax.set_yticks(range(len(aas)))
+        ax.set_yticklabels(aas, fontsize=7)
+        ax.set_ylabel(f"Chain {chain}" if chain else "Substitution")
+    axes[-1, 0].set_xlabel("Residue number")
+    fig.colorbar(image, ax=axes[:, 0].tolist(), label=label)
+    fig.suptitle(title)
+    fig.savefig(out_file, dpi=150)
+    plt.close(fig)
+    print(f"Saved plot: {out_file}")
+
+
+def _render(task):
+    kind, df, col, title, label, out_file = task
+    plot = plot_heatmap if kind == "heatmap" else plot_metrics
+    plot(df, col, title, label, out_file)
+    return out_file
+
+
+def load_results(path, pdb_id=None):
+    """
+    CSV читается целиком; из Parquet (файла или каталога с разбиением
+    pdb_id=<ID>) читаются только нужные столбцы и только успешные строки
+    выбранного PDB ID, фильтр применяется при чтении.
+    """
+    if is_parquet(path):
+        return read_results(path, columns=PLOT_COLUMNS, pdb_id=pdb_id,
+                            status="success")
+    df = pd.read_csv(path)
+    if pdb_id is not None and "pdb_id" in df:
+        df = df[df["pdb_id"] == pdb_id.upper()]
+    return df
+
+
+def plot_tasks(df, out_dir, kind="auto"):
+    """Графики для каждого PDB ID и каждой метрики."""
+    if "pdb_id" in df and df["pdb_id"].nunique() > 0:
+        groups = [(str(pdb), group) for pdb, group
+                  in df.groupby(df["pdb_id"].astype(str), sort=True)]
+    else:
+        groups = [("", df)]
+    tasks = []
+    for pdb, group in groups:
+        group_kind = kind
+        if kind == "auto":
+            group_kind = "heatmap" if len(group) > BAR_MAX_ROWS else "bar"
+        prefix = f"{pdb}_" if pdb else ""
+        suffix = "_heatmap" if group_kind == "heatmap" else ""
+        for col, title, label, stem in METRICS:
+            tasks.append((
+                group_kind, group, col,
+                f"{pdb} {title}" if pdb else title, label,
+                os.path.join(out_dir, f"{prefix}{stem}{suffix}.png"),
+            ))
+    return tasks
+
+
+def main(input_csv, out_dir="plots", pdb_id=None, kind="auto", workers=1):
+    os.makedirs(out_dir, exist_ok=True)
+    df = load_results(input_csv, pdb_id)
+    tasks = plot_tasks(df, out_dir, kind)
+
+    # графики независимы: при workers > 1 рисуем в отдельных процессах
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_render, tasks))
+    return [_render(task) for task in tasks]
 
 
 if __name__ == "__main__":
@@ -75,7 +178,7 @@ if __name__ == "__main__":
         nargs="?",
         default="mutation_results.csv",
         help=(
-            "CSV с результатами run_mutation_batch.py "
+            "CSV или Parquet с результатами run_mutation_batch.py "
             "(по умолчанию mutation_results.csv)"
         )
     )
@@ -84,6 +187,25 @@ if __name__ == "__main__":
         default="plots",
         help="куда сохранять графики"
     )
+    p.add_argument(
+        "--pdb",
+        help="только этот PDB ID (для каталога с разбиением по pdb_id)"
+    )
+    p.add_argument(
+        "--kind",
+        choices=["auto", "bar", "heatmap"],
+        default="auto",
+        help=(
+            f"тип графика; auto — heatmap при более чем {BAR_MAX_ROWS} "
+            "мутациях"
+        )
+    )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="процессов для параллельной отрисовки"
+    )
     args = p.parse_args()
 
-    main(args.input_csv, args.out_dir)
+    main(args.input_csv, args.out_dir, args.pdb, args.kind, args.workers)